@@ -0,0 +1,87 @@
+"""
+UNResolutionProcessor: ClauseSchema.py
+
+    compact in-memory types for the clause data (the final frame no longer keeps every column as python objects)
+    - clause/context_clause: arrow-backed strings (pandas' own string dtype when pyarrow isn't installed)
+    - clauseID int32, resID/year uint16, day uint8, month categorical (calendar order)
+    - normalized layout: split_resolutions gives one row per res (resID, year, month, day) plus the clauses keyed on
+      resID, join_resolutions puts them back together
+    - memory_report: bytes per column (strings counted in full), for sizing worker nodes
+    # NOTE: pyarrow (optional) dependency
+
+"""
+import numpy as np
+import pandas as pd
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October',
+          'November', 'December']
+RESOLUTION_COLUMNS = ['resID', 'year', 'month', 'day']
+STRING_COLUMNS = ['clause', 'context_clause']
+INTEGER_TYPES = {'clauseID': np.int32, 'resID': np.uint16, 'year': np.uint16, 'day': np.uint8,
+                 'near_dup_cluster': np.int32, 'ordinal': np.int32}
+
+def string_dtype():
+    # arrow-backed strings when pyarrow is there ('string[pyarrow]'), pandas' python-backed 'string' otherwise
+    try:
+        return pd.StringDtype('pyarrow')
+    except ImportError:
+        return pd.StringDtype()
+
+def month_dtype(values=()):
+    # calendar-ordered month names, plus anything else seen (e.g. '' when a date wasn't found) so nothing turns into NaN
+    extra = sorted({value for value in values if value not in MONTHS}, key=str)
+    return pd.CategoricalDtype(MONTHS + extra)
+
+def typed_column(name, values):
+    # values (list/array/Series) as the compact type of column name, other columns are left as they are
+    if name in STRING_COLUMNS:
+        return pd.array(values, dtype=string_dtype())
+    if name in INTEGER_TYPES:
+        values = np.asarray(values)
+        integer_type = INTEGER_TYPES[name]
+        if len(values) and (values.min() < np.iinfo(integer_type).min or values.max() > np.iinfo(integer_type).max):
+            return values.astype(np.int64) # out of range for the compact type, keep it whole
+        return values.astype(integer_type)
+    if name == 'month':
+        values = pd.Series(values) if not isinstance(values, pd.Series) else values
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            return values.array
+        return pd.Categorical(values, dtype=month_dtype(values.unique()))
+    return values
+
+def compact(df):
+    # df with the known columns converted in place of the old ones (columns with missing values are left alone)
+    converted = {}
+    for column in df.columns:
+        if column in STRING_COLUMNS or ((column in INTEGER_TYPES or column == 'month') and not df[column].isna().any()):
+            converted[column] = typed_column(column, df[column])
+    return df.assign(**converted) if converted else df
+
+def split_resolutions(df):
+    # (resolutions, clauses): one row per res with its date, and the rest of df without the date columns
+    resolutions = df[RESOLUTION_COLUMNS].drop_duplicates('resID').reset_index(drop=True)
+    clauses = df.drop(columns=[column for column in RESOLUTION_COLUMNS if column != 'resID'])
+    return resolutions, clauses
+
+def join_resolutions(resolutions, clauses, columns=None):
+    # the flat frame back from split_resolutions (columns: their order, the date columns go after resID by default)
+    df = clauses.merge(resolutions, on='resID', how='left', sort=False)
+    if columns is None:
+        columns = list(clauses.columns)
+        position = columns.index('resID') + 1
+        columns[position:position] = [column for column in RESOLUTION_COLUMNS if column != 'resID']
+    return df[columns]
+
+def memory_report(df):
+    # {column: bytes} with the total under 'total' (deep, so python string objects are counted in full)
+    usage = df.memory_usage(deep=True, index=True)
+    report = {column: int(size) for column, size in usage.items()}
+    report['total'] = int(usage.sum())
+    return report
+
+def format_memory_report(report):
+    # 'total X MB (column Y MB, ...)', biggest columns first
+    columns = sorted(((column, size) for column, size in report.items() if column not in ('total', 'Index')),
+                     key=lambda item: item[1], reverse=True)
+    return (f"{report['total'] / 1e6:.1f} MB ("
+            + ', '.join(f"{column} {size / 1e6:.1f} MB" for column, size in columns) + ")")
@@ -0,0 +1,239 @@
+"""
+UNResolutionProcessor: ClauseStore.py
+
+    optional persistent store of the processed data (SQLite, one file, 'UNResolutionData/clauses.sqlite' by default)
+    - resolutions: one row per res (date, a digest of its clauses, when it was last written)
+    - clauses: keyed by resID + the clause's position in its res as extracted (ordinal, see
+      ReadAndProcessPDFs.process_all_files(ordinals=True)), with its context if it has one
+    - clauses_fts: FTS5 full-text index over the clause text, kept in step with the clauses table by triggers
+    each run upserts into it: a res whose clauses haven't changed is skipped, a changed one only rewrites the clauses
+    that differ (and drops the ones no longer there), so the index is only touched where something changed
+    (the ordinal is taken before the clean-up, so a clause dropped as a duplicate of another res's clause doesn't shift
+    the rest of its res)
+    search takes FTS5 queries: words ('sanctions Libya'), phrases ('"remain seized"'), prefixes ('disarm*'), AND/OR/NOT;
+    words FTS5 can't take bare (Secretary-General, Côte d'Ivoire, S/RES/1970) are searched as phrases;
+    the results come back as a frame (e.g. for createSubsetToAnnotate.sample_frame)
+
+    run: python ClauseStore.py [database] "<query>" [--phrase] [--limit N]  (or python ClauseStore.py [database] --stats)
+    # NOTE: needs an sqlite3 build with FTS5 (standard in the python.org/homebrew builds)
+
+"""
+import os
+import re
+import sys
+import sqlite3
+import hashlib
+from datetime import datetime
+import pandas as pd
+
+DEFAULT_PATH = os.path.join('UNResolutionData', 'clauses.sqlite')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resolutions (
+    resID INTEGER PRIMARY KEY,
+    year INTEGER,
+    month TEXT,
+    day INTEGER,
+    digest TEXT,
+    clause_count INTEGER,
+    updated TEXT
+);
+CREATE TABLE IF NOT EXISTS clauses (
+    id INTEGER PRIMARY KEY,
+    resID INTEGER NOT NULL REFERENCES resolutions(resID) ON DELETE CASCADE,
+    ordinal INTEGER NOT NULL,
+    clause TEXT NOT NULL,
+    context_clause TEXT,
+    UNIQUE (resID, ordinal)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS clauses_fts USING fts5(
+    clause, content='clauses', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS clauses_ai AFTER INSERT ON clauses BEGIN
+    INSERT INTO clauses_fts(rowid, clause) VALUES (new.id, new.clause);
+END;
+CREATE TRIGGER IF NOT EXISTS clauses_ad AFTER DELETE ON clauses BEGIN
+    INSERT INTO clauses_fts(clauses_fts, rowid, clause) VALUES ('delete', old.id, old.clause);
+END;
+CREATE TRIGGER IF NOT EXISTS clauses_au AFTER UPDATE OF clause ON clauses BEGIN
+    INSERT INTO clauses_fts(clauses_fts, rowid, clause) VALUES ('delete', old.id, old.clause);
+    INSERT INTO clauses_fts(rowid, clause) VALUES (new.id, new.clause);
+END;
+"""
+
+def clauses_digest(clauses, contexts, ordinals):
+    # fingerprint of a res's clauses (their context and ordinals), to skip unchanged ones without comparing row by row
+    digest = hashlib.sha1()
+    for clause, context, ordinal in zip(clauses, contexts, ordinals):
+        digest.update(f"{ordinal}\x1f{clause}\x1f{'' if context is None else context}\x1e".encode('utf-8'))
+    return digest.hexdigest()
+
+def phrase_query(text):
+    # text as one FTS5 phrase (quotes doubled), so punctuation and operator words in it are taken literally
+    return '"' + text.replace('"', '""') + '"'
+
+def quote_barewords(query):
+    # query with every bare word holding more than letters/digits/_ quoted as a phrase ('Secretary-General',
+    # "d'Ivoire", 'S/RES/1970'), leaving quoted phrases, AND/OR/NOT, parentheses and prefix stars ('disarm*') alone
+    parts = []
+    for phrase, word in re.findall(r'("(?:[^"]|"")*"?)|([^\s()"]+|[()])', query):
+        if phrase:
+            parts.append(phrase if len(phrase) > 1 and phrase.endswith('"') else phrase + '"')
+        elif re.fullmatch(r'[()]|\w+\*?', word):
+            parts.append(word)
+        else:
+            parts.append(phrase_query(word))
+    return ' '.join(parts)
+
+def match_queries(query, phrase=False):
+    # what to hand FTS5 MATCH, in order: the query as written, then with its odd words quoted
+    if phrase:
+        return [phrase_query(query)]
+    return list(dict.fromkeys([query, quote_barewords(query)]))
+
+class ClauseStore:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL') # readers (analysts) aren't blocked by a run writing
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('PRAGMA foreign_keys=ON')
+        try:
+            self.connection.executescript(SCHEMA)
+        except sqlite3.OperationalError as e:
+            self.connection.close()
+            raise RuntimeError(f"could not set up the clause store (is this sqlite3 built with FTS5?): {e}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def upsert(self, df, clause_col='clause', clause_id_col='clauseID', doc_id_col='resID', context_col='context_clause',
+               ordinal_col='ordinal'):
+        # writes df's resolutions into the store (res not in df are left alone), returns counts of what happened
+        # ordinal_col: the clauses' extraction ordinals; a frame without one (e.g. read back from the .csv) is keyed by
+        # position in its res instead, which shifts whenever the clean-up drops an earlier clause
+        counts = {'resolutions_unchanged': 0, 'resolutions_written': 0, 'clauses_written': 0, 'clauses_removed': 0}
+        has_context = context_col in df.columns
+        has_ordinals = ordinal_col in df.columns
+        df = df.sort_values([doc_id_col, ordinal_col if has_ordinals else clause_id_col], kind='stable')
+        known = dict(self.connection.execute('SELECT resID, digest FROM resolutions'))
+        now = datetime.now().isoformat(timespec='seconds')
+
+        with self.connection:
+            for resID, res_df in df.groupby(doc_id_col, sort=False):
+                resID = int(resID)
+                clauses = res_df[clause_col].tolist()
+                contexts = res_df[context_col].tolist() if has_context else [None] * len(clauses)
+                ordinals = [int(ordinal) for ordinal in res_df[ordinal_col]] if has_ordinals else list(range(len(clauses)))
+                digest = clauses_digest(clauses, contexts, ordinals)
+                if known.get(resID) == digest:
+                    counts['resolutions_unchanged'] += 1
+                    continue
+
+                first = res_df.iloc[0]
+                self.connection.execute(
+                    """INSERT INTO resolutions (resID, year, month, day, digest, clause_count, updated)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT(resID) DO UPDATE SET year = excluded.year, month = excluded.month, day = excluded.day,
+                           digest = excluded.digest, clause_count = excluded.clause_count, updated = excluded.updated""",
+                    (resID, int(first['year']), str(first['month']), int(first['day']), digest, len(clauses), now))
+                written = self.connection.executemany(
+                    """INSERT INTO clauses (resID, ordinal, clause, context_clause) VALUES (?, ?, ?, ?)
+                       ON CONFLICT(resID, ordinal) DO UPDATE SET clause = excluded.clause, context_clause = excluded.context_clause
+                       WHERE clause IS NOT excluded.clause OR context_clause IS NOT excluded.context_clause""",
+                    [(resID, ordinal, clause, context) for ordinal, clause, context in zip(ordinals, clauses, contexts)])
+                counts['clauses_written'] += written.rowcount
+                stored = {ordinal for ordinal, in self.connection.execute('SELECT ordinal FROM clauses WHERE resID = ?', (resID,))}
+                gone = sorted(stored.difference(ordinals))
+                self.connection.executemany('DELETE FROM clauses WHERE resID = ? AND ordinal = ?',
+                                            [(resID, ordinal) for ordinal in gone])
+                counts['clauses_removed'] += len(gone)
+                counts['resolutions_written'] += 1
+        return counts
+
+    def match(self, run, query, phrase=False):
+        # run(match query) with the query as written, retried with its odd words quoted when FTS5 can't parse it
+        # (a ValueError if neither works, e.g. unbalanced parentheses)
+        for match_query in match_queries(query, phrase):
+            try:
+                return run(match_query)
+            except (sqlite3.OperationalError, pd.errors.DatabaseError) as e:
+                error = e.__cause__ or e # pandas wraps the sqlite error (with the whole statement)
+        raise ValueError(f"can't search for {query!r}: {error}")
+
+    def search(self, query, limit=50, phrase=False, years=None, resIDs=None):
+        # best matches first (bm25), with a snippet of each clause around the match ('[' and ']' mark the hits)
+        conditions, parameters = ['clauses_fts MATCH ?'], []
+        if years is not None:
+            years = list(years)
+            conditions.append(f"r.year IN ({', '.join('?' * len(years))})")
+            parameters.extend(int(year) for year in years)
+        if resIDs is not None:
+            resIDs = list(resIDs)
+            conditions.append(f"c.resID IN ({', '.join('?' * len(resIDs))})")
+            parameters.extend(int(resID) for resID in resIDs)
+        sql = f"""SELECT c.resID, r.year, r.month, r.day, c.ordinal, c.clause, c.context_clause,
+                         snippet(clauses_fts, 0, '[', ']', '...', 16) AS snippet, bm25(clauses_fts) AS rank
+                  FROM clauses_fts
+                  JOIN clauses c ON c.id = clauses_fts.rowid
+                  JOIN resolutions r ON r.resID = c.resID
+                  WHERE {' AND '.join(conditions)}
+                  ORDER BY rank"""
+        if limit is not None:
+            sql += ' LIMIT ?'
+            parameters.append(int(limit))
+        return self.match(lambda match_query: pd.read_sql_query(sql, self.connection, params=[match_query] + parameters),
+                          query, phrase)
+
+    def count(self, query, phrase=False):
+        # number of clauses matching query
+        return self.match(lambda match_query: self.connection.execute(
+            'SELECT count(*) FROM clauses_fts WHERE clauses_fts MATCH ?', (match_query,)).fetchone()[0], query, phrase)
+
+    def stats(self):
+        resolutions, first_year, last_year = self.connection.execute(
+            'SELECT count(*), min(year), max(year) FROM resolutions').fetchone()
+        clauses = self.connection.execute('SELECT count(*) FROM clauses').fetchone()[0]
+        return {'resolutions': resolutions, 'clauses': clauses, 'first_year': first_year, 'last_year': last_year,
+                'size_mb': round(os.path.getsize(self.path) / 1e6, 1)}
+
+    def rebuild_index(self):
+        # rebuilds the full-text index from the clauses table (only needed if the file was edited by hand)
+        with self.connection:
+            self.connection.execute("INSERT INTO clauses_fts(clauses_fts) VALUES ('rebuild')")
+
+    def optimize(self):
+        # merges the index segments left by many small upserts (makes queries a bit faster)
+        with self.connection:
+            self.connection.execute("INSERT INTO clauses_fts(clauses_fts) VALUES ('optimize')")
+
+def main(args):
+    path = DEFAULT_PATH
+    if args and os.path.isfile(args[0]):
+        path, args = args[0], args[1:]
+    with ClauseStore(path) as store:
+        if '--stats' in args or not args:
+            print(store.stats())
+            return
+        limit = int(args[args.index('--limit') + 1]) if '--limit' in args else 20
+        query = args[0]
+        try:
+            results = store.search(query, limit=limit, phrase='--phrase' in args)
+            count = store.count(query, phrase='--phrase' in args)
+        except ValueError as e:
+            print(f"Bad query: {e}")
+            return
+        print(f"{count} clauses match, best {len(results)}:")
+        for row in results.itertuples(index=False):
+            print(f"S/RES/{row.resID} ({row.day} {row.month} {row.year}) #{row.ordinal}: {row.snippet}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,206 @@
+"""
+UNResolutionProcessor: DocConverter.py
+
+    .doc -> .pdf conversion stage for the scrapers (older resolutions often come as word documents)
+    - downloaded .doc files are queued and converted in the background while the scrape goes on
+    - each worker keeps one LibreOffice listener alive ('unoconv --listener', own port and profile), so office is started
+      once per worker instead of once per file; queued files are handed to it in batches
+    - every unoconv call has a timeout (a hung listener is killed and restarted), every output is checked
+    - outputs are written to a scratch folder and moved over the pdf only once they exist, so a failed conversion
+      never costs the pdf already there
+    - the .doc is only deleted once its pdf exists; failures are kept in .failures (and the .doc stays for a retry)
+    # NOTE: LibreOffice dependency
+    # NOTE: unoconv dependency
+
+"""
+import os
+import time
+import queue
+import shutil
+import socket
+import tempfile
+import threading
+import subprocess
+from ProcessHelpers import animated_printer
+
+class DocConverter:
+    def __init__(self, max_workers=2, timeout=120, batch_size=8, base_port=2002, startup_timeout=60, on_done=None):
+        # timeout: seconds allowed per file (a batch gets timeout * its size)
+        # on_done: optional callback(doc_path, pdf_path, error), error is None when the conversion worked
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.base_port = base_port
+        self.startup_timeout = startup_timeout
+        self.on_done = on_done
+        self.queue = queue.Queue()
+        self.threads = []
+        self.listeners = {} # port -> Popen
+        self.profiles = {} # port -> LibreOffice user profile folder (instances sharing one lock each other out)
+        self.converted = []
+        self.failures = [] # (doc path, reason)
+        self.lock = threading.Lock()
+        self.unoconv = shutil.which('unoconv')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit(self, doc_path, pdf_path):
+        # queues doc_path to become pdf_path (unoconv names outputs after their input, so the .doc takes the pdf's name)
+        target_doc_path = os.path.splitext(pdf_path)[0] + '.doc'
+        if os.path.abspath(doc_path) != os.path.abspath(target_doc_path):
+            os.replace(doc_path, target_doc_path)
+        if not self.threads:
+            self.start_workers()
+        self.queue.put(target_doc_path)
+
+    def start_workers(self):
+        for i in range(self.max_workers):
+            thread = threading.Thread(target=self.work, args=(self.base_port + i,), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def start_listener(self, port):
+        # one long-lived office process per worker, returns once it accepts connections
+        self.stop_listener(port)
+        profile = self.profiles.setdefault(port, tempfile.mkdtemp(prefix=f'unoconv_{port}_'))
+        self.listeners[port] = subprocess.Popen([self.unoconv, '--listener', f'--port={port}', f'--user-profile={profile}'],
+                                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.listeners[port].poll() is not None:
+                raise RuntimeError(f"office listener on port {port} exited with code {self.listeners[port].returncode}")
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.25)
+        raise RuntimeError(f"office listener on port {port} did not start within {self.startup_timeout}s")
+
+    def stop_listener(self, port):
+        listener = self.listeners.pop(port, None)
+        if listener is not None and listener.poll() is None:
+            listener.terminate()
+            try:
+                listener.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                listener.kill()
+
+    def next_batch(self):
+        # blocks for one file, then takes whatever else is already queued (up to batch_size); None means stop
+        doc_path = self.queue.get()
+        if doc_path is None:
+            self.queue.put(None) # every worker needs to see it
+            return None
+        batch = [doc_path]
+        while len(batch) < self.batch_size:
+            try:
+                doc_path = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if doc_path is None:
+                self.queue.put(None) # leave the stop signal for the next round
+                break
+            batch.append(doc_path)
+        return batch
+
+    def work(self, port):
+        while True:
+            batch = self.next_batch()
+            if batch is None:
+                break
+            if self.unoconv is None:
+                for doc_path in batch:
+                    self.finish(doc_path, "unoconv not found (install LibreOffice and unoconv)")
+                continue
+            finished = set() # docs already reported, so an error later in the batch only fails the rest
+            try:
+                if port not in self.listeners or self.listeners[port].poll() is not None:
+                    self.start_listener(port)
+                self.convert_batch(port, batch, finished)
+            except Exception as e:
+                for doc_path in batch:
+                    if doc_path not in finished:
+                        self.finish(doc_path, str(e))
+        self.stop_listener(port)
+
+    def convert_batch(self, port, batch, finished):
+        # one unoconv call per folder, the pdfs end up next to their input
+        by_folder = {}
+        for doc_path in batch:
+            by_folder.setdefault(os.path.dirname(os.path.abspath(doc_path)), []).append(doc_path)
+        for folder, doc_paths in by_folder.items():
+            scratch = os.path.join(folder, f'.unoconv_{port}') # this worker's outputs, until they're known to be good
+            os.makedirs(scratch, exist_ok=True)
+            try:
+                self.convert_group(port, scratch, doc_paths, finished)
+            finally:
+                shutil.rmtree(scratch, ignore_errors=True)
+
+    def convert_group(self, port, scratch, doc_paths, finished):
+        command = [self.unoconv, f'--port={port}', '--no-launch', '-f', 'pdf', '-o', scratch + os.sep] + doc_paths
+        error = None
+        timed_out = False
+        try:
+            completed = subprocess.run(command, capture_output=True, text=True, timeout=self.timeout * len(doc_paths))
+            if completed.returncode != 0:
+                error = (completed.stderr.strip().splitlines() or [f"unoconv exited with code {completed.returncode}"])[-1]
+        except subprocess.TimeoutExpired:
+            error = f"timed out after {self.timeout * len(doc_paths)}s"
+            timed_out = True
+
+        leftover = []
+        for doc_path in doc_paths:
+            output_path = os.path.join(scratch, os.path.splitext(os.path.basename(doc_path))[0] + '.pdf')
+            if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+                os.replace(output_path, os.path.splitext(doc_path)[0] + '.pdf')
+                self.finish(doc_path, None)
+                finished.add(doc_path)
+            else:
+                leftover.append(doc_path)
+        if timed_out:
+            self.start_listener(port) # the listener is likely stuck on one of them
+        if leftover and len(doc_paths) > 1:
+            # one bad file shouldn't fail its batch, retry the rest one at a time
+            for doc_path in leftover:
+                self.convert_group(port, scratch, [doc_path], finished)
+        else:
+            for doc_path in leftover:
+                self.finish(doc_path, error or "no pdf was written")
+                finished.add(doc_path)
+
+    def finish(self, doc_path, error):
+        pdf_path = os.path.splitext(doc_path)[0] + '.pdf'
+        if error is None:
+            os.remove(doc_path) # remove the doc file only after a successful conversion
+            animated_printer.safe_print(f"Converted and saved: {pdf_path}")
+            with self.lock:
+                self.converted.append(pdf_path)
+        else:
+            animated_printer.safe_print(f"Failed to convert {doc_path} to PDF: {error}")
+            with self.lock:
+                self.failures.append((doc_path, error))
+        if self.on_done is not None:
+            try:
+                self.on_done(doc_path, pdf_path, error)
+            except Exception as e:
+                animated_printer.safe_print(f"Error after converting {doc_path}: {e}")
+
+    def close(self):
+        # waits for the queue to drain, then stops the workers and their listeners
+        if self.threads:
+            self.queue.put(None)
+            for thread in self.threads:
+                thread.join()
+            self.threads = []
+        for port in list(self.listeners):
+            self.stop_listener(port)
+        for profile in self.profiles.values():
+            shutil.rmtree(profile, ignore_errors=True)
+        self.profiles = {}
+        if self.converted or self.failures:
+            animated_printer.safe_print(f"Converted {len(self.converted)} .doc files to PDF, {len(self.failures)} failed"
+                                        + (" (the .doc files were kept)." if self.failures else "."))
@@ -0,0 +1,134 @@
+"""
+UNResolutionProcessor: ExtractionCache.py
+
+    persistent on-disk cache of extracted resolutions, so reruns only parse new or changed pdfs:
+    - entries are keyed by the pdf's content hash + the exclude_annex setting + EXTRACTOR_VERSION
+    - each entry stores the res's quasi-sentences, date and annex flag (pickled, one file per entry)
+    - size-based eviction drops the least recently used entries once the cache grows past max_bytes
+    - invalidate it from the command line: python ExtractionCache.py --clear
+    NOTE: bump EXTRACTOR_VERSION whenever a change to PDFextractor/PDFchunker/etc changes the output
+
+"""
+import os
+import hashlib
+import pickle
+import argparse
+from ProcessHelpers import animated_printer
+
+EXTRACTOR_VERSION = 2
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.extraction_cache')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024 # 512 MB
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    # sha256 of the file contents (the filename doesn't matter, the bytes do)
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ExtractionCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.total_bytes = sum(size for _, size, _ in self._entries()) # running total, so puts don't rescan
+
+    def make_key(self, file_path, exclude_annex, **settings):
+        # any extra extraction settings are folded into the key as well
+        parts = [hash_file(file_path), f"exclude_annex={bool(exclude_annex)}", f"version={EXTRACTOR_VERSION}"]
+        parts += [f"{name}={settings[name]}" for name in sorted(settings)]
+        return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.pkl")
+
+    def _entries(self):
+        # (path, size, last used) for every entry on disk
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.pkl'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def get(self, key):
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e: # truncated/corrupt entry, treat it as a miss and let it be rewritten
+            animated_printer.safe_print(f"Ignoring unreadable cache entry {path}: {e}")
+            self.misses += 1
+            return None
+        os.utime(path) # mark as recently used (for eviction)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+
+        # write to a temp file first so an interrupted run never leaves a half-written entry
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+        self.total_bytes += os.path.getsize(path) - previous_size
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        # drop least recently used entries until the cache fits in max_bytes
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self.total_bytes = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.total_bytes -= size
+
+    def clear(self):
+        # invalidate everything
+        removed = 0
+        for path, _, _ in self._entries():
+            os.remove(path)
+            removed += 1
+        self.total_bytes = 0
+        return removed
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries()), 'bytes': self.total_bytes}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or invalidate the resolution extraction cache.")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="cache directory")
+    parser.add_argument('--clear', action='store_true', help="remove every cached extraction")
+    parser.add_argument('--max-mb', type=float, help="evict least recently used entries down to this size")
+    args = parser.parse_args()
+
+    cache = ExtractionCache(args.cache_dir)
+    if args.clear:
+        print(f"Removed {cache.clear()} cached extractions from {args.cache_dir}.")
+    elif args.max_mb is not None:
+        cache.max_bytes = int(args.max_mb * 1024 * 1024)
+        cache.evict()
+        print(f"Cache trimmed to {cache.total_bytes / (1024 * 1024):.1f} MB.")
+    else:
+        stats = cache.stats()
+        print(f"{stats['entries']} cached extractions, {stats['bytes'] / (1024 * 1024):.1f} MB in {args.cache_dir}.")
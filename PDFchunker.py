@@ -2,9 +2,17 @@
 UNResolutionProcessor: PDFchunker.py
 
     splits processed text (with italic markings) into a list of quasi-sentences
+    (split_span_stream does the same straight off PDFextractor's Span records, no marked-up string in between)
+    chunk_clauses/chunk_span_clauses: the whole text-to-clean-clauses path fused into one pass -- slimming, splitting,
+    validity check and trim -- with the same output as running those steps one after the other
+
 
 """
 import re
+from ResolutionSlimmer import fast_slimDown
+
+# compiled once (DOTALL: the raw, unslimmed text can still have newlines inside a phrase)
+ITALIC_PATTERN = re.compile(r'<i>(.*?)</i>', re.DOTALL)
 
 def split_by_italics(text):
     # find all italicized phrases
@@ -33,3 +41,56 @@ def split_by_italics(text):
         final_chunks.append(segment.strip())
 
     return final_chunks
+
+def close_chunk(phrase, following):
+    # same cut as split_by_italics: phrase + following text, up to its last comma or semicolon
+    combined_text = phrase + following
+    last_punctuation_index = max(combined_text.rfind(','), combined_text.rfind(';'))
+    if last_punctuation_index != -1:
+        combined_text = combined_text[:last_punctuation_index + 1]
+    return combined_text.strip()
+
+def split_span_stream(spans):
+    # gives the same quasi-sentences as split_by_italics(ResolutionSlimmer.PDFslimDown(text)) on the marked-up text of
+    # these spans -- the markup keeps the slimming from running across an italic boundary, so slimming each italic
+    # phrase and each run of plain text on its own comes out the same
+    final_chunks = []
+    phrase = None # current italic phrase (text before the first one is dropped, same as split_by_italics)
+    following = [] # plain text after it
+
+    for span in spans:
+        if span.italic:
+            if phrase is not None:
+                final_chunks.append(close_chunk(phrase, fast_slimDown(''.join(following))))
+            phrase = fast_slimDown(span.text)
+            following = []
+        elif phrase is not None:
+            following.append(span.text)
+
+    if phrase is not None:
+        final_chunks.append(close_chunk(phrase, fast_slimDown(''.join(following))))
+
+    return final_chunks
+
+def is_clean_clause(clause):
+    # ReadAndProcessPDFs.is_valid_clause for a slimmed, stripped clause (ascii only, so isdigit means just 0-9)
+    return bool(clause) and not clause.isdigit()
+
+def chunk_clauses(text):
+    # marked-up text -> clean, valid quasi-sentences in one pass over the italic phrases, each phrase and the text
+    # after it slimmed once; same output as PDFslimDown + split_by_italics + is_valid_clause + collapse_and_trim_clause
+    clauses = []
+    matches = ITALIC_PATTERN.finditer(text)
+    match = next(matches, None)
+    while match is not None:
+        next_match = next(matches, None)
+        following = text[match.end():next_match.start() if next_match is not None else len(text)]
+        clause = close_chunk(fast_slimDown(match.group(1)), fast_slimDown(following))
+        if is_clean_clause(clause):
+            clauses.append(clause)
+        match = next_match
+    return clauses
+
+def chunk_span_clauses(spans):
+    # same as chunk_clauses, straight off a Span stream
+    return [clause for clause in split_span_stream(spans) if is_clean_clause(clause)]
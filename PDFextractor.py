@@ -8,23 +8,40 @@ UNResolutionProcessor: PDFextractor.py
           body of text (gives a cushiony buffer, needed for less-than-tidy resolutions, of which there are no more than five)
         - detects content by drawing lines, getting cut lines based on the position of content it finds to the left and 
           right of the main-body area
+        - (the content check is a per-page occupancy profile: every row's left/right content, built once with numpy)
+        - (cut lines aren't cached per page template: checking a cached pair against a page takes the same object read
+          as computing it, see get_cut_lines)
         - [might remove everything after the annex]
+          (found with a cheap plain-text search for 'Annex', then the bold check on just those pages)
         - creates clean content boxes used to extract the text from the main res body
+        - layout backends: 'pdfplumber' (reference) or 'pymupdf' (same steps off fitz text dicts, drawings and image
+          info -- much faster; compare the two with layoutParity.py)
+          (known gap: fitz reports any closed axis-aligned 4-point path as a rect, while pdfminer calls some of them
+          curves (e.g. one closed twice), which the cut lines ignore -- a page with one in the margins can get other
+          cut lines with 'pymupdf')
     3. Wraps valid italic phrases in text-based indicators for chunking
+       (or hands them on as a stream of Span records, which PDFchunker.split_span_stream chunks directly)
+    (DocumentSession runs all of the above off one read of the file, with fitz and pdfplumber each opened once)
 
 """
 import pdfplumber
 import fitz  # or 'PyMuPDF'
+import numpy as np
 import re
+import io
+import contextlib
+from collections import namedtuple
+from pdfminer.pdffont import FontMetricsDB
 import GrabResID
 from ProcessHelpers import animated_printer
 
-def extract_date_from_pdf(pdf_path):
+def extract_date_from_pdf(pdf_path, document=None):
     # hides recoverable MuPDF error messages to ignore unnecessary scaries
     fitz.TOOLS.mupdf_display_errors(False)
 
-    # open up
-    document = fitz.open(pdf_path)
+    # open up (unless a DocumentSession already did)
+    if document is None:
+        document = fitz.open(pdf_path)
     if not document:
         animated_printer.safe_print("Could not open the PDF file.")
         return 0, '', 0  # return empty if the file cannot be opened (check final .csv / .xlsx for verification/troubleshooting)
@@ -50,16 +67,33 @@ def extract_date_from_pdf(pdf_path):
         animated_printer.safe_print(f"Date not found in the PDF of Resolution {GrabResID.grab_resID(pdf_path)}.")
         return 0, '', 0  # see note on this above
 
+LAYOUT_BACKENDS = ('pdfplumber', 'pymupdf') # pdfplumber is the reference, pymupdf the fast one (see layoutParity.py)
+
+def is_fitz_page(page):
+    return isinstance(page, fitz.Page)
+
+def page_size(page):
+    # (width, height) of a pdfplumber or fitz page (whole numbers as ints for both, like pdfplumber reads the mediabox)
+    if is_fitz_page(page):
+        return tuple(int(side) if side.is_integer() else side for side in (page.rect.width, page.rect.height))
+    return page.width, page.height
+
 def find_resolution_position(page):
     # find the position of 'Resolution' (from the left bound of the 'R')
+    if is_fitz_page(page):
+        for word in page.get_text("words"): # (x0, y0, x1, y1, text, ...)
+            if word[4] == 'Resolution':
+                return word[0], word[1]
+        return None, None
     for word in page.extract_words():
         if word['text'] == 'Resolution':
             return word['x0'], word['top']
     return None, None
 
 def get_cut_lines(page, resolution_x=None, resolution_y=None):
-    page_height = int(page.height)  # convert to int
-    page_width = int(page.width)  # get page width
+    width, height = page_size(page) # works for either layout backend
+    page_height = int(height)  # convert to int
+    page_width = int(width)  # get page width
     horizontal_center_y = int(page_height / 2)  # convert to int
     
     if resolution_x is None or resolution_y is None:
@@ -71,6 +105,39 @@ def get_cut_lines(page, resolution_x=None, resolution_y=None):
         # vertical boundary lines
         vertical_line_x_left = resolution_x - 30 # NOTE: changed this from 2 to 30 (bigger puff needed)
         vertical_line_x_right = page_width - resolution_x + 30 # NOTE: same as above
+
+        # which rows have content to the left of the first line or the right of the second line (built once per page)
+        # NOTE: not cached by page size and anchor: a cached pair only holds if no side content sits between it and the
+        # center, which takes the page's objects to know, and reading those is ~97% of this function with either
+        # backend (a pdfplumber crop parses the whole page, a clipped fitz read still builds the whole text page)
+        occupied = content_profile(page_layout_objects(page), width, page_height, vertical_line_x_left, vertical_line_x_right)
+        
+        # find header line (first occupied row looking up from the center)
+        header_line_y = 0
+        above = np.flatnonzero(occupied[1:horizontal_center_y + 1])
+        if above.size:
+            header_line_y = int(above[-1]) + 2 # index k is row k + 1, header sits one below it
+        
+        # find footer line (first occupied row looking down from the center)
+        footer_line_y = page_height
+        below = np.flatnonzero(occupied[horizontal_center_y:page_height])
+        if below.size:
+            footer_line_y = horizontal_center_y + int(below[0]) - 1
+    
+    return header_line_y, footer_line_y
+
+def scan_cut_lines(page, resolution_x=None, resolution_y=None):
+    # reference implementation of get_cut_lines (row by row crops), kept for parity checks (see layoutParity.py)
+    page_height = int(page.height)
+    page_width = int(page.width)
+    horizontal_center_y = int(page_height / 2)
+    
+    if resolution_x is None or resolution_y is None:
+        header_line_y = 15
+        footer_line_y = page_height - 15
+    else:
+        vertical_line_x_left = resolution_x - 30
+        vertical_line_x_right = page_width - resolution_x + 30
         
         # find header line (looking up)
         header_line_y = 0
@@ -125,40 +192,198 @@ def detect_any_content(page, y, vertical_line, right=False):
                 return True
     return False
 
-def get_main_content_bboxes(file_path, exclude_annex):
+def bounds_array(objects):
+    # (x0, x1, top, bottom) rows for a list of pdf objects
+    return np.array([(obj['x0'], obj['x1'], obj['top'], obj['bottom']) for obj in objects], dtype=float).reshape(-1, 4)
+
+def page_layout_objects(page):
+    # everything detect_any_content looks at, pulled off the page once (blank chars never count as text)
+    if is_fitz_page(page):
+        return fitz_page_layout_objects(page)
+    return {
+        'chars': bounds_array([char for char in page.chars if char['text'].strip()]),
+        'lines': bounds_array(page.lines),
+        'images': bounds_array(page.images),
+        'rects': bounds_array(page.rects),
+    }
+
+def pdf_font_descent(document, xref, font_type, name):
+    # a font's descent (per unit of font size, negative) the way pdfminer takes it: the standard 14 fonts from their AFM
+    # metrics, the others from their FontDescriptor (a Type0 font's from its descendant font), 0 without one;
+    # None for Type3 fonts (glyph space descent, left to fitz)
+    if font_type == 'Type3':
+        return None
+    if font_type in ('Type1', 'MMType1', 'TrueType'):
+        try:
+            return -abs(FontMetricsDB.get_metrics(name)[0]['Descent']) / 1000
+        except KeyError:
+            pass
+    if font_type == 'Type0':
+        kind, descendants = document.xref_get_key(xref, 'DescendantFonts')
+        match = re.search(r'(\d+) 0 R', descendants)
+        if not match:
+            return 0.0
+        xref = int(match.group(1))
+    kind, descriptor = document.xref_get_key(xref, 'FontDescriptor')
+    if kind != 'xref':
+        return 0.0
+    kind, descent = document.xref_get_key(int(descriptor.split()[0]), 'Descent')
+    if kind not in ('int', 'float'):
+        return 0.0
+    return -abs(float(descent)) / 1000 # pdfminer forces it negative too
+
+def font_descents(page):
+    # font name (without a subset prefix, as in fitz spans) -> pdf_font_descent, for the fonts the page uses
+    descents = {}
+    for xref, _, font_type, basefont, _, _ in page.get_fonts():
+        name = re.sub(r'^[A-Z]{6}\+', '', basefont)
+        if name not in descents:
+            descents[name] = pdf_font_descent(page.parent, xref, font_type, name)
+    return descents
+
+def fitz_page_layout_objects(page):
+    # same objects as page_layout_objects, from fitz text dicts, drawings and image info
+    chars = []
+    descents = font_descents(page)
+    for block in page.get_text("rawdict")["blocks"]:
+        for line in block.get("lines", []):
+            for span in line["spans"]:
+                # pdfminer-style char boxes (one font size tall, sitting on the descent pdfminer reads from the pdf,
+                # not fitz's own font metrics) so rows match pdfplumber
+                size = span["size"]
+                descent = descents.get(span["font"])
+                if descent is None:
+                    descent = span["descender"]
+                for char in span["chars"]:
+                    if char["c"].strip():
+                        bottom = char["origin"][1] - descent * size
+                        chars.append((char["bbox"][0], char["bbox"][2], bottom - size, bottom))
+
+    # pdfplumber calls single straight segments lines and rectangles rects (curves are ignored by both; fitz can't tell a
+    # rectangle from a path pdfminer would call a curve, see the known gap in the module docstring)
+    lines = []
+    rects = []
+    for path in page.get_drawings():
+        items = path["items"]
+        if len(items) == 1 and items[0][0] == "l":
+            p1, p2 = items[0][1], items[0][2]
+            lines.append((min(p1.x, p2.x), max(p1.x, p2.x), min(p1.y, p2.y), max(p1.y, p2.y)))
+            continue
+        for item in items:
+            if item[0] in ("re", "qu"):
+                rect = item[1].rect if item[0] == "qu" else item[1]
+                rects.append((rect.x0, rect.x1, rect.y0, rect.y1))
+
+    images = [(info["bbox"][0], info["bbox"][2], info["bbox"][1], info["bbox"][3]) for info in page.get_image_info()]
+
+    return {
+        'chars': np.array(chars, dtype=float).reshape(-1, 4),
+        'lines': np.array(lines, dtype=float).reshape(-1, 4),
+        'images': np.array(images, dtype=float).reshape(-1, 4),
+        'rects': np.array(rects, dtype=float).reshape(-1, 4),
+    }
+
+def mark_rows(diff, lo, hi):
+    # add +1/-1 at the ends of each [lo, hi] row interval (clipped to the page), summed up later
+    lo = np.clip(lo, 0, len(diff) - 1)
+    hi = np.clip(hi, -1, len(diff) - 2)
+    keep = lo <= hi
+    np.add.at(diff, lo[keep], 1)
+    np.add.at(diff, hi[keep] + 1, -1)
+
+def content_profile(objects, page_width, page_height, vertical_line_left, vertical_line_right):
+    # occupied[y] is True where detect_any_content would find something at row y on either side (rows 0..page_height)
+    diff = np.zeros(page_height + 2, dtype=np.int64)
+
+    # text: detect_any_content crops a 1pt strip (x0, y, x1, y + 1) and keeps chars overlapping it, where an overlap
+    # may be zero in one direction but not both
+    chars = objects['chars']
+    for strip_x0, strip_x1 in ((0, vertical_line_left), (vertical_line_right, page_width)):
+        x0, x1, top, bottom = chars.T
+        overlap_width = np.minimum(x1, strip_x1) - np.maximum(x0, strip_x0)
+        hit = overlap_width >= 0
+        overlap_width, top, bottom = overlap_width[hit], top[hit], bottom[hit]
+        lo = np.ceil(top - 1)
+        hi = np.floor(bottom)
+        edge_only = overlap_width == 0 # these need some vertical overlap, so the touching rows don't count
+        lo = np.where(edge_only & (lo == top - 1), lo + 1, lo)
+        hi = np.where(edge_only & (hi == bottom), hi - 1, hi)
+        mark_rows(diff, lo.astype(np.int64), hi.astype(np.int64))
+
+    # graphics: any row between top and bottom, with the same side tests as detect_any_content
+    for kind, left_x, right_x in (('lines', 1, 0), ('images', 0, 1), ('rects', 0, 1)):
+        bounds = objects[kind]
+        left = bounds[:, left_x] <= vertical_line_left
+        right = bounds[:, right_x] >= vertical_line_right
+        hit = bounds[left | right]
+        mark_rows(diff, np.ceil(hit[:, 2]).astype(np.int64), np.floor(hit[:, 3]).astype(np.int64))
+
+    return np.cumsum(diff[:page_height + 1]) > 0
+
+def get_main_content_bboxes(file_path, exclude_annex, pdf=None, annex_page=None, backend='pdfplumber'):
+    # pdf: an already open document for the backend (DocumentSession)
+    # annex_page: a known annex page, 0 for a known lack of one (either skips the search)
     annex_pdf = None
-    if not exclude_annex: # annex inclusive
-        bboxes = []
-        with pdfplumber.open(file_path) as pdf:
+    with opened_or_open(pdf, file_path, backend) as pdf:
+        pages = layout_pages(pdf, backend)
+        if not exclude_annex: # annex inclusive
+            bboxes = []
             resolution_x, resolution_y = None, None
-            for i, page in enumerate(pdf.pages): # iterate through all pdf pages
+            for i, page in enumerate(pages): # iterate through all pdf pages
                 if i == 0:
                     resolution_x, resolution_y = find_resolution_position(page)
                 header_line_y, footer_line_y = get_cut_lines(page, resolution_x, resolution_y) # get cut lines
-                bbox = (0, header_line_y, page.width, footer_line_y) # define bbox 
+                bbox = (0, header_line_y, page_size(page)[0], footer_line_y) # define bbox 
                 bboxes.append(bbox) # add bbox to list
-        return bboxes
-    else: # annex exclusive (notes same as above, just exclude all bboxes after the annex)
-        annex_page = search_annex_bold_in_all_pages(file_path)
-        if annex_page:
-            annex_pdf = file_path
-        bboxes = []
-        with pdfplumber.open(file_path) as pdf:
+            return bboxes, annex_pdf
+        else: # annex exclusive (notes same as above, just exclude all bboxes after the annex)
+            if annex_page is None:
+                annex_page = search_annex_bold_in_all_pages(file_path, pdf=pdf, backend=backend)
+            if annex_page:
+                annex_pdf = file_path
+            bboxes = []
             resolution_x, resolution_y = None, None
-            for i, page in enumerate(pdf.pages):
+            for i, page in enumerate(pages):
                 if annex_page and (i + 1) >= annex_page:
                     break
                 if i == 0:
                     resolution_x, resolution_y = find_resolution_position(page)
                 header_line_y, footer_line_y = get_cut_lines(page, resolution_x, resolution_y)
-                bbox = (0, header_line_y, page.width, footer_line_y)
+                bbox = (0, header_line_y, page_size(page)[0], footer_line_y)
                 bboxes.append(bbox)
-        return bboxes, annex_pdf
+            return bboxes, annex_pdf
+
+def opened_or_open(pdf, file_path, backend='pdfplumber'):
+    # reuse an open document without closing it, or open (and later close) the file with the backend's library
+    if pdf is not None:
+        return contextlib.nullcontext(pdf)
+    if backend == 'pymupdf':
+        fitz.TOOLS.mupdf_display_errors(False)
+        return fitz.open(file_path)
+    return pdfplumber.open(file_path)
+
+def layout_pages(pdf, backend='pdfplumber'):
+    # a fitz document iterates over its pages, a pdfplumber one keeps them in .pages
+    if backend == 'pymupdf':
+        return pdf
+    return pdf.pages
 
 def contains_annex(page):
     # just looks at the top of the page
-    crop_height = page.height * 0.2
-    cropped_page = page.within_bbox((0, 0, page.width, crop_height))
+    width, height = page_size(page)
+    crop_height = height * 0.2
+
+    if is_fitz_page(page):
+        # same bold check, on the spans in the top of the page
+        text_page = page.get_text("dict", clip=fitz.Rect(0, 0, width, crop_height))
+        for block in text_page.get("blocks", []):
+            for line in block.get("lines", []):
+                for span in line["spans"]:
+                    if 'Bold' in span["font"] and 'Annex' in span["text"].split():
+                        return True
+        return False
+
+    cropped_page = page.within_bbox((0, 0, width, crop_height))
     
     # only grab it if it's bold (this + the crop makes sure it only grabs the mention of 'Annex' marking the annex)
     bold_text = cropped_page.extract_words(extra_attrs=["fontname"])
@@ -167,33 +392,56 @@ def contains_annex(page):
             return True
     return False
 
-def search_annex_bold_in_all_pages(pdf_path):
+def search_annex_bold_in_all_pages(pdf_path, pdf=None, backend='pdfplumber'):
     annex_page = None
-    with pdfplumber.open(pdf_path) as pdf:
-        for i, page in enumerate(pdf.pages):
+    with opened_or_open(pdf, pdf_path, backend) as pdf:
+        for i, page in enumerate(layout_pages(pdf, backend)):
             if contains_annex(page): # marks the page where the annex begins, so elsewhere the rest of the res can be ignored
                 annex_page = i + 1
                 break
     return annex_page
 
-def extract_text_with_italics(file_path, bboxes): # NOTE: this was buggy to build, so it comes with some error testing residue
+def annex_candidate_pages(document):
+    # cheap pass over the plain text: pages that mention 'Annex' at all (whitespace dropped, in case it's letter-spaced)
+    return [i for i, page in enumerate(document) if 'Annex' in ''.join(page.get_text().split())]
+
+def build_annex_index(document, pdf=None, backend='pdfplumber'):
+    # same answer as search_annex_bold_in_all_pages, but the bold check only runs on the candidate pages
+    # document: open fitz document, pdf: the backend's open document (defaults to the fitz one)
+    pages = layout_pages(pdf if pdf is not None else document, backend if pdf is not None else 'pymupdf')
+    page_count = len(document)
+    annex_page = None
+    for i in annex_candidate_pages(document):
+        if contains_annex(pages[i]):
+            annex_page = i + 1
+            break
+    return {
+        'annex_page': annex_page, # 1-based, None if there's no annex
+        'annex_page_count': page_count - annex_page + 1 if annex_page else 0,
+        'page_count': page_count,
+    }
+
+# one run of text from the page, italic = starts a quasi-sentence (italic + upper case first letter)
+# line breaks come through as Span(' ', False, page)
+Span = namedtuple('Span', ['text', 'italic', 'page'])
+
+def extract_spans_with_italics(file_path, bboxes, document=None): # NOTE: this was buggy to build, so it comes with some error testing residue
     # [message copied from above] hides recoverable MuPDF error messages to ignore unnecessary scaries
     fitz.TOOLS.mupdf_display_errors(False)
 
     # error detection for fitz problems
     try:
-        doc = fitz.open(file_path)
+        doc = document if document is not None else fitz.open(file_path)
     except fitz.fitz.FileDataError as e:
         animated_printer.safe_print(f"FileDataError: {e}")
-        return ""
+        return
     except fitz.fitz.MuPdfError as e:
         animated_printer.safe_print(f"MuPdfError: {e}")
-        return ""
+        return
     except Exception as e:
         animated_printer.safe_print(f"An unexpected error occurred while opening the file: {e}")
-        return ""
+        return
 
-    formatted_text = ""
     try:
         for i, page in enumerate(doc):
             if i >= len(bboxes):
@@ -208,7 +456,7 @@ def extract_text_with_italics(file_path, bboxes): # NOTE: this was buggy to buil
                 animated_printer.safe_print(f"An error occurred while extracting text from page {i+1}: {e}")
                 continue
 
-            # wrap italicized text in signatures to preserve italics in plain text
+            # flag italicized text to preserve italics
             for block in text_page.get("blocks", []):
                 if "lines" in block:
                     for line in block["lines"]:
@@ -216,14 +464,93 @@ def extract_text_with_italics(file_path, bboxes): # NOTE: this was buggy to buil
                             text = span["text"]
                             try:
                                 # check if the text is italic and begins with an upper case letter
-                                if span["flags"] & 2 and text[0].isupper():  
-                                    formatted_text += f"<i>{text}</i>"
-                                else:
-                                    formatted_text += text
+                                italic = bool(span["flags"] & 2 and text[0].isupper())
                             except Exception as e:
                                 animated_printer.safe_print(f"An error occurred while processing text span: {e}")
-                        formatted_text += " "
+                                continue
+                            yield Span(text, italic, i)
+                        yield Span(" ", False, i)
     except Exception as e:
         animated_printer.safe_print(f"An unexpected error occurred while processing the document: {e}")
 
-    return formatted_text
\ No newline at end of file
+def extract_text_with_italics(file_path, bboxes, document=None):
+    # wrap italicized text in signatures to preserve italics in plain text
+    return ''.join(f"<i>{span.text}</i>" if span.italic else span.text
+                   for span in extract_spans_with_italics(file_path, bboxes, document))
+
+class DocumentSession:
+    # reads a res pdf off the disk once and hands the same bytes to both fitz and pdfplumber, each opened (at most) once
+    # and shared by the date, annex, bbox and italic text stages
+    def __init__(self, file_path):
+        self.file_path = file_path
+        with open(file_path, 'rb') as f:
+            self.data = f.read()
+        self._document = None
+        self._pdf = None
+        self._annex_index = None
+
+    @property
+    def document(self):
+        if self._document is None:
+            fitz.TOOLS.mupdf_display_errors(False)
+            self._document = fitz.open(stream=self.data, filetype="pdf")
+        return self._document
+
+    @property
+    def pdf(self):
+        if self._pdf is None:
+            self._pdf = pdfplumber.open(io.BytesIO(self.data))
+        return self._pdf
+
+    def date(self):
+        return extract_date_from_pdf(self.file_path, document=self.document)
+
+    def layout_document(self, backend):
+        # the document the layout stages run on (pymupdf reuses the fitz document, no pdfplumber parse at all)
+        return self.document if backend == 'pymupdf' else self.pdf
+
+    def annex_index(self, backend='pdfplumber'):
+        # annex start page + page counts, found once per file and reused by the bbox stage and reporting
+        if self._annex_index is None:
+            self._annex_index = build_annex_index(self.document, pdf=self.layout_document(backend), backend=backend)
+        return self._annex_index
+
+    def annex_page(self, backend='pdfplumber'):
+        return self.annex_index(backend)['annex_page']
+
+    def main_content_bboxes(self, exclude_annex, backend='pdfplumber'):
+        # 0 tells get_main_content_bboxes there's no annex (None would make it search again)
+        annex_page = (self.annex_page(backend) or 0) if exclude_annex else None
+        return get_main_content_bboxes(self.file_path, exclude_annex, pdf=self.layout_document(backend), 
+                                       annex_page=annex_page, backend=backend)
+
+    def italic_text(self, bboxes):
+        try:
+            document = self.document
+        except Exception as e:
+            animated_printer.safe_print(f"An unexpected error occurred while opening the file: {e}")
+            return ""
+        return extract_text_with_italics(self.file_path, bboxes, document=document)
+
+    def italic_spans(self, bboxes):
+        # Span stream of the same text (consume it before the session closes)
+        try:
+            document = self.document
+        except Exception as e:
+            animated_printer.safe_print(f"An unexpected error occurred while opening the file: {e}")
+            return iter(())
+        return extract_spans_with_italics(self.file_path, bboxes, document=document)
+
+    def close(self):
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+        if self._document is not None:
+            self._document.close()
+            self._document = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -3,8 +3,11 @@ UNResolutionProcessor: ProcessHelpers.py
 
     an assortment of helper functions:
     - an animated printer (twirls while long processes run) for looks, funzies, visual confirmation it's still running
+    - init_worker: process pool initializer giving a forked worker its own (unlocked, still) animated printer
     - functions that list/print all files in a directory
     - standard elapsed time formatter for convenience
+    - timed: context manager adding a block's wall time to a dict of stage timings
+    - profiled: opt-in context manager dumping a cProfile of a block to a .prof file
     - check/install libraries function
     - Y/N custom user input prompt returning T/F
 
@@ -16,6 +19,8 @@ import sys
 import importlib
 import time
 import threading
+import cProfile
+from contextlib import contextmanager
 
 class AnimatedPrinter:
     def __init__(self):
@@ -55,6 +60,12 @@ class AnimatedPrinter:
 # create a global instance of AnimatedPrinter
 animated_printer = AnimatedPrinter()
 
+def init_worker():
+    # a forked pool worker inherits the printer's lock as it was at the fork, which the animation thread (not forked
+    # along) holds most of the time, so the worker's first safe_print would wait on it forever
+    animated_printer.animation_lock = threading.Lock()
+    animated_printer.animation_running = False
+
 def list_files_in_directory(directory_path):
     files = [os.path.join(root, file)
              for root, _, files in os.walk(directory_path)
@@ -84,6 +95,30 @@ def format_elapsed_time(elapsed_seconds):
     seconds = elapsed_seconds % 60
     return f"{hours}h {minutes}m {seconds:.2f}s"
 
+@contextmanager
+def timed(timings, stage):
+    # adds the wall time of the with-block to timings[stage] (seconds)
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start_time
+
+@contextmanager
+def profiled(profile_dir, name):
+    # cProfiles the with-block into profile_dir/<name>.prof (does nothing when profile_dir is None)
+    if not profile_dir:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(profile_dir, exist_ok=True)
+        profiler.dump_stats(os.path.join(profile_dir, f"{name}.prof"))
+
 def check_and_install_packages(packages):
     for package in packages:
         try:
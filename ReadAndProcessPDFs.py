@@ -6,14 +6,17 @@ UNResolutionProcessor: ReadAndProcessPDFs.py
 """
 
 import pandas as pd
+import numpy as np
 import re
 import os
-from itertools import count
+import time
+from concurrent.futures import ProcessPoolExecutor
 import GrabResID
-import ResolutionSlimmer
 import PDFextractor
 import PDFchunker
-import ProcessHelpers
+import RunReport
+import ClauseSchema
+from ProcessHelpers import animated_printer, timed, profiled, init_worker
 
 def is_valid_clause(clause):
     # no special characters allowed
@@ -23,28 +26,94 @@ def collapse_and_trim_clause(clause):
     # collapse and trim string
     return ' '.join(clause).strip()
 
-def read_and_process_paragraphs(file_path, failed_pdfs, exclude_annex, annex_pdfs):
+def extract_resolution(file_path, failed_pdfs, exclude_annex, annex_pdfs, layout_backend='pdfplumber', details=None):
+    # returns the res specific info and its list of quasi-sentences (no frame is built here)
+    # details: optional dict, filled with the file's stage timings, page count and annex index (when annexes are excluded)
     resID = GrabResID.grab_resID(file_path) # for res ID column
-    day, month, year = PDFextractor.extract_date_from_pdf(file_path) # for date column(s)
+    timings = {}
+    if details is not None:
+        details['timings'] = timings
 
-    bboxes, annex_pdf = PDFextractor.get_main_content_bboxes(file_path, exclude_annex) # extract file bboxes
-    if annex_pdf is not None:
-        annex_pdfs.append(annex_pdf) # is annex pdf? cool
+    # one read of the file, shared by every stage below
+    with timed(timings, 'open'):
+        session = PDFextractor.DocumentSession(file_path)
+        page_count = len(session.document)
+        session.layout_document(layout_backend)
+    with session:
+        if details is not None:
+            details['pages'] = page_count
+        with timed(timings, 'date'):
+            day, month, year = session.date() # for date column(s)
 
-    try:
-        # extract processed text from processed bboxes
-        formatted_text = PDFextractor.extract_text_with_italics(file_path, bboxes) 
-    except Exception as e:
-        ProcessHelpers.safe_print(f"Error extracting text with italics for {file_path}: {e}")
-        failed_pdfs.append(f"S/RES/{GrabResID.grab_resID(file_path)}") # if failed, add to the list and notify
-        return pd.DataFrame({'clause': [], 'resID': [], 'year': [], 'month': [], 'day': []})
+        if exclude_annex:
+            with timed(timings, 'annex_search'):
+                annex_index = session.annex_index(layout_backend)
+            if details is not None:
+                details['annex_index'] = annex_index # reused by the bboxes below, no second scan
+        with timed(timings, 'cut_lines'):
+            bboxes, annex_pdf = session.main_content_bboxes(exclude_annex, layout_backend) # extract file bboxes
+        if annex_pdf is not None:
+            annex_pdfs.append(annex_pdf) # is annex pdf? cool
+
+        try:
+            # extract italic-flagged spans from processed bboxes and turn them into clean quasi-sentences (slimmed, split,
+            # validity checked and trimmed in one pass)
+            with timed(timings, 'text_extraction'):
+                spans = list(session.italic_spans(bboxes))
+            with timed(timings, 'chunking'):
+                clauses = PDFchunker.chunk_span_clauses(spans)
+        except Exception as e:
+            animated_printer.safe_print(f"Error extracting text with italics for {file_path}: {e}")
+            failed_pdfs.append(f"S/RES/{GrabResID.grab_resID(file_path)}") # if failed, add to the list and notify
+            return [], resID, year, month, day
+
+    return clauses, resID, year, month, day
 
-    reformatted_text = ResolutionSlimmer.PDFslimDown(formatted_text) # weight watchers
-    clauses = PDFchunker.split_by_italics(reformatted_text) # extract list of quasi-sentences
+def extract_resolution_variants(file_path, layout_backend='pdfplumber', details=None):
+    # both annex settings from one read of the file, {exclude_annex: (result, failed_pdfs, annex_pdfs)}: the annex
+    # excluding bboxes are the annex including ones minus the pages from the annex on, so the annex excluded clauses are
+    # chunked from the spans of the pages before it
+    resID = GrabResID.grab_resID(file_path)
+    timings = {}
+    if details is not None:
+        details['timings'] = timings
 
-    clauses = [clause for clause in clauses if is_valid_clause(clause)] # double-check validity
+    with timed(timings, 'open'):
+        session = PDFextractor.DocumentSession(file_path)
+        page_count = len(session.document)
+        session.layout_document(layout_backend)
+    with session:
+        if details is not None:
+            details['pages'] = page_count
+        with timed(timings, 'date'):
+            day, month, year = session.date()
+        with timed(timings, 'annex_search'):
+            annex_index = session.annex_index(layout_backend)
+        if details is not None:
+            details['annex_index'] = annex_index
+        with timed(timings, 'cut_lines'):
+            bboxes, _ = session.main_content_bboxes(False, layout_backend)
+        annex_page = annex_index['annex_page']
 
-    clauses = [collapse_and_trim_clause([clause]) for clause in clauses] # redo slimdown (for each clause, not redundant)
+        try:
+            with timed(timings, 'text_extraction'):
+                spans = list(session.italic_spans(bboxes))
+            with timed(timings, 'chunking'):
+                included = PDFchunker.chunk_span_clauses(spans)
+                excluded = PDFchunker.chunk_span_clauses([span for span in spans if span.page < annex_page - 1]) if annex_page else included
+        except Exception as e:
+            animated_printer.safe_print(f"Error extracting text with italics for {file_path}: {e}")
+            failed = [f"S/RES/{resID}"]
+            return {True: (([], resID, year, month, day), failed, []), False: (([], resID, year, month, day), list(failed), [])}
+
+    return {True: ((excluded, resID, year, month, day), [], [file_path] if annex_page else []),
+            False: ((included, resID, year, month, day), [], [])}
+
+def read_and_process_paragraphs(file_path, failed_pdfs, exclude_annex, annex_pdfs, profile_dir=None):
+    # profile_dir: cProfile the extraction into <profile_dir>/<file>.prof (defaults to $UNRES_PROFILE_DIR, off if unset)
+    profile_dir = profile_dir or RunReport.profile_dir_from_env()
+    with profiled(profile_dir, os.path.basename(file_path)):
+        clauses, resID, year, month, day = extract_resolution(file_path, failed_pdfs, exclude_annex, annex_pdfs)
 
     # dup the res specific info
     dup_resID = [resID] * len(clauses)
@@ -57,20 +126,191 @@ def read_and_process_paragraphs(file_path, failed_pdfs, exclude_annex, annex_pdf
 
     return df
 
-def process_all_files(folder_path, failed_pdfs, exclude_annex, annex_pdfs):
-    files = [os.path.join(root, name)
+class ResultBuilder:
+    # collects per-res results and builds the final frame once (no growing pd.concat); the res columns are kept once per
+    # res and only repeated out to every clause when the frame is built
+    columns = ['clause', 'clauseID', 'resID', 'year', 'month', 'day']
+
+    def __init__(self):
+        self.clauses = []
+        self.resolutions = {column: [] for column in ClauseSchema.RESOLUTION_COLUMNS}
+        self.counts = [] # clauses per res
+
+    def add(self, clauses, resID, year, month, day):
+        # 'clauseID' is assigned on a directory (not res) basis, in the order the clauses come in
+        self.clauses.extend(clauses)
+        for column, value in zip(ClauseSchema.RESOLUTION_COLUMNS, (resID, year, month, day)):
+            self.resolutions[column].append(value)
+        self.counts.append(len(clauses))
+
+    def __len__(self):
+        return len(self.clauses)
+
+    def ordinals(self):
+        # every clause's position in its res (0, 1, ...), which the clean-up steps don't renumber like clauseID
+        counts = np.array(self.counts, dtype=np.int64)
+        return np.arange(len(self.clauses)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    def to_frame(self, compact=True, ordinals=False):
+        # compact: the ClauseSchema types (arrow strings, small ints, categorical month); otherwise object columns, same
+        # as the frame the old concat loop produced
+        # ordinals: add an 'ordinal' column (see ordinals)
+        columns = self.columns + ['ordinal'] if ordinals else self.columns
+        data = {'clause': self.clauses, 'clauseID': np.arange(1, len(self.clauses) + 1)}
+        for column, values in self.resolutions.items():
+            data[column] = np.repeat(np.array(values, dtype=object), self.counts)
+        if ordinals:
+            data['ordinal'] = self.ordinals()
+        if not compact:
+            return pd.DataFrame(data, columns=columns, dtype=object)
+        return pd.DataFrame({column: ClauseSchema.typed_column(column, data[column]) for column in columns})
+
+    def to_tables(self, compact=True, ordinals=False):
+        # normalized layout: (resolutions, clauses) joined on resID (see ClauseSchema.join_resolutions)
+        resolutions = pd.DataFrame(self.resolutions, columns=ClauseSchema.RESOLUTION_COLUMNS)
+        resolutions = resolutions[np.array(self.counts) > 0].drop_duplicates('resID').reset_index(drop=True)
+        clauses = pd.DataFrame({'clause': self.clauses, 'clauseID': np.arange(1, len(self.clauses) + 1),
+                                'resID': np.repeat(np.array(self.resolutions['resID'], dtype=object), self.counts)},
+                               dtype=object)
+        if ordinals:
+            clauses['ordinal'] = self.ordinals()
+        if compact:
+            resolutions, clauses = ClauseSchema.compact(resolutions), ClauseSchema.compact(clauses)
+        return resolutions, clauses
+
+def process_file_in_worker(file_path, exclude_annex, layout_backend='pdfplumber', profile_dir=None):
+    # runs in a pool worker, so the failed/annex lists are local and shipped back with the result
+    failed_pdfs = []
+    annex_pdfs = []
+    details = {}
+    start_time = time.perf_counter()
+    with profiled(profile_dir, os.path.basename(file_path)):
+        result = extract_resolution(file_path, failed_pdfs, exclude_annex, annex_pdfs, layout_backend, details)
+    stats = {'pages': details.get('pages', 0), 'clauses': len(result[0]), 'seconds': time.perf_counter() - start_time,
+             'timings': details.get('timings', {})}
+    stats.update(annex_stats(details.get('annex_index')))
+    return result, failed_pdfs, annex_pdfs, stats
+
+def process_file_variants_in_worker(file_path, layout_backend='pdfplumber', profile_dir=None):
+    # process_file_in_worker for both annex settings at once, {exclude_annex: (result, failed_pdfs, annex_pdfs, stats)}
+    # (each variant's stats carry the timings of the one shared parse)
+    details = {}
+    start_time = time.perf_counter()
+    with profiled(profile_dir, os.path.basename(file_path)):
+        variants = extract_resolution_variants(file_path, layout_backend, details)
+    seconds = time.perf_counter() - start_time
+    file_results = {}
+    for exclude_annex, (result, failed_pdfs, annex_pdfs) in variants.items():
+        stats = {'pages': details.get('pages', 0), 'clauses': len(result[0]), 'seconds': seconds,
+                 'timings': details.get('timings', {}), 'shared_parse': 1}
+        if exclude_annex:
+            stats.update(annex_stats(details.get('annex_index')))
+        file_results[exclude_annex] = (result, failed_pdfs, annex_pdfs, stats)
+    return file_results
+
+def annex_stats(annex_index):
+    # per-file stats from an annex index (the index itself rides along for the cache and reporting)
+    if annex_index is None:
+        return {}
+    return {'annex_index': annex_index, 'annex_pages': annex_index['annex_page_count']}
+
+def cached_file_result(file_path, entry):
+    # rebuild a worker-style result from a cache entry (res ID always comes from the current filename)
+    result = (entry['clauses'], GrabResID.grab_resID(file_path), entry['year'], entry['month'], entry['day'])
+    annex_pdfs = [file_path] if entry['annex'] else []
+    stats = {'cached': 1, 'clauses': len(entry['clauses'])}
+    stats.update(annex_stats(entry.get('annex_index')))
+    return result, [], annex_pdfs, stats
+
+def cache_file_result(cache, key, file_result):
+    # stores a worker result under key (failures are never cached, they get retried next run)
+    result, file_failed_pdfs, file_annex_pdfs, stats = file_result
+    if file_failed_pdfs:
+        return
+    clauses, _, year, month, day = result
+    cache.put(key, {'clauses': clauses, 'year': year, 'month': month, 'day': day,
+                    'annex': bool(file_annex_pdfs), 'annex_index': stats.get('annex_index')})
+
+def iter_file_results(files, exclude_annex, workers=1, cache=None, layout_backend='pdfplumber', profile_dir=None):
+    # yields (result, failed_pdfs, annex_pdfs, stats) per file, in file order, pulling from the cache where possible
+    keys = [None] * len(files)
+    cached = {}
+    if cache is not None:
+        for i, file in enumerate(files):
+            keys[i] = cache.make_key(file, exclude_annex, layout_backend=layout_backend)
+            entry = cache.get(keys[i])
+            if entry is not None:
+                cached[i] = cached_file_result(file, entry)
+    pending = [file for i, file in enumerate(files) if i not in cached]
+
+    executor = None
+    if workers is not None and workers > 1 and len(pending) > 1:
+        # fan the files out over a process pool (map hands results back in file order, so clauseIDs match a serial run)
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+        fresh = executor.map(process_file_in_worker, pending, [exclude_annex] * len(pending), [layout_backend] * len(pending),
+                             [profile_dir] * len(pending))
+    else:
+        fresh = (process_file_in_worker(file, exclude_annex, layout_backend, profile_dir) for file in pending)
+
+    try:
+        for i, file in enumerate(files):
+            if i in cached:
+                yield cached[i]
+                continue
+            file_result = next(fresh)
+            if cache is not None:
+                cache_file_result(cache, keys[i], file_result)
+            yield file_result
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+def list_pdf_files(folder_path):
+    # sorted, so the clauseIDs (and which copy of a duplicate the clean-up keeps) don't depend on the os.walk order
+    return sorted(os.path.join(root, name)
     for root, _, files in os.walk(folder_path)
         for name in files
-            if name.endswith(".pdf")]
+            if name.endswith(".pdf"))
 
-    unique_clause_num = count(1)
-
-    final_data = pd.DataFrame(columns=['clause', 'clauseID', 'resID', 'year', 'month', 'day'])
+def process_all_files(folder_path, failed_pdfs, exclude_annex, annex_pdfs, workers=1, cache=None, layout_backend='pdfplumber',
+                      run_stats=None, report=None, profile_dir=None, sampler=None, ordinals=False, compact=True,
+                      normalized=False):
+    # run_stats: optional dict, the numeric per-file stats (annex pages, pages, clauses, ...)
+    # summed over all files
+    # report: optional RunReport.RunReport, gets every file's stage timings and counts
+    # profile_dir: cProfile each parsed file into <profile_dir>/<file>.prof (off when None)
+    # sampler: optional createSubsetToAnnotate.ReservoirSampler over createSubsetToAnnotate.STREAM_COLUMNS (see
+    # stream_sampler), offered each res's clauses as they come in (implies ordinals, to match the sample back to the
+    # data after the clean-up with createSubsetToAnnotate.match_sample)
+    # ordinals: add an 'ordinal' column, each clause's position in its res as extracted (the clean-up steps keep it as is,
+    # so it still names the same clause after dedup/phrase removal; ClauseStore.upsert keys on it)
+    # compact: ClauseSchema types instead of object columns; normalized: return (resolutions, clauses) instead of one frame
+    files = list_pdf_files(folder_path)
 
     # process all files in the directory
-    for file in files:
-        df = read_and_process_paragraphs(file, failed_pdfs, exclude_annex, annex_pdfs)
-        df['clauseID'] = [next(unique_clause_num) for _ in range(len(df))] # assign 'clauseID' on a directory (not res) basis
-        final_data = pd.concat([final_data, df], ignore_index=True)
+    file_results = iter_file_results(files, exclude_annex, workers, cache, layout_backend, profile_dir)
+    return collect_results(files, file_results, failed_pdfs, annex_pdfs, run_stats, report, sampler, ordinals, compact,
+                           normalized)
+
+def collect_results(files, file_results, failed_pdfs, annex_pdfs, run_stats=None, report=None, sampler=None, ordinals=False,
+                    compact=True, normalized=False):
+    # builds the frame from per-file worker results given in file order (see process_all_files for the options)
+    builder = ResultBuilder()
+    for file, (result, file_failed_pdfs, file_annex_pdfs, stats) in zip(files, file_results):
+        failed_pdfs.extend(file_failed_pdfs)
+        annex_pdfs.extend(file_annex_pdfs)
+        if run_stats is not None:
+            for name, value in stats.items():
+                if isinstance(value, (int, float)):
+                    run_stats[name] = run_stats.get(name, 0) + value
+        if report is not None:
+            report.add_file(file, result[1], stats)
+        if sampler is not None:
+            clauses, resID, year, month, day = result
+            sampler.add((resID, ordinal, year) for ordinal in range(len(clauses)))
+        builder.add(*result)
 
-    return final_data
\ No newline at end of file
+    ordinals = ordinals or sampler is not None
+    if normalized:
+        return builder.to_tables(compact, ordinals)
+    return builder.to_frame(compact, ordinals)
@@ -0,0 +1,390 @@
+"""
+UNResolutionProcessor: ResDownloader.py
+
+    browser-free version of ResFisher: scrapes the res pdf files from the UN website over pooled http connections
+    - year index pages and res pages are fetched with one requests.Session (keep-alive, connection pool sized to the workers)
+    - res pages/documents are fetched by a bounded thread pool, each download streamed to a '.part' file and renamed once
+      complete (a download is done when the response is, no sleeping)
+    - polite: requests are spaced by a shared rate limiter, 429/5xx responses and connection errors back off exponentially
+      (honouring Retry-After), pausing every worker
+    - selenium (ResFisher.make_driver) is only started for pages that actually need javascript, i.e. when the plain html
+      has no res links or no document behind the english link
+    - incremental (default): a ScrapeManifest in the folder records every download, so reruns send conditional requests
+      for the index pages, skip unchanged documents, fill gaps in older years and re-fetch corrupted/truncated pdfs
+      (with incremental=False it stops like ResFisher: at S/RES/1292 or at the first res already in the folder)
+    - base_url can point anywhere (downloaderChecks.py runs it against a local stand-in server)
+    - .doc documents go to a DocConverter (long-lived office listeners, converting in the background while downloads go on)
+    # NOTE: LibreOffice dependency
+    # NOTE: unoconv dependency
+
+"""
+import os
+import time
+import random
+import threading
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from itertools import chain
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+from ProcessHelpers import animated_printer
+from ScrapeManifest import ScrapeManifest
+from DocConverter import DocConverter
+
+BASE_URL = "https://www.un.org/securitycouncil/content/resolutions-adopted-security-council-"
+USER_AGENT = "UNResolutionProcessor (research scraper)"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+PDF_MAGIC = b'%PDF'
+DOC_MAGIC = b'\xd0\xcf\x11\xe0' # OLE2 container ('.doc')
+CHUNK_SIZE = 1 << 16
+
+class RateLimiter:
+    # spaces request starts at least 1/requests_per_second apart across all threads, and lets one thread pause everyone
+    def __init__(self, requests_per_second=4.0):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_time)
+            self.next_time = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.next_time = max(self.next_time, time.monotonic() + seconds)
+
+def retry_after_seconds(response):
+    # Retry-After as seconds (it can be a number or an http date), None if missing/unreadable
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def get_custom_filename(resolution_string):
+    # pull desired filename from the download link text on the webpage (same as ResFisher)
+    return resolution_string.replace("/", "_") + ".pdf"
+
+def find_english_link(soup):
+    # check for a language selection page (same lookup as ResFisher)
+    english_link = soup.find('a', href=True, string='English')
+    if not english_link:
+        english_link = soup.find('a', href=True, string=lambda t: t and 'Lang=E' in t)
+    return english_link
+
+def find_res_links(soup):
+    # find links with the pattern 'S/RES/...'
+    return [a['href'] for a in soup.find_all('a', href=True) if 'S/RES/' in a['href']]
+
+class BrowserFallback:
+    # one headless Firefox (ResFisher's), started on first use and shared by the threads one page at a time
+    def __init__(self, save_directory, download_timeout=60):
+        # the browser downloads into its own folder, so the http workers' files never look like browser downloads
+        self.download_directory = os.path.join(os.path.abspath(save_directory), '.browser_downloads')
+        self.download_timeout = download_timeout
+        self.driver = None
+        self.lock = threading.Lock()
+        self.pages = 0
+
+    def ensure_driver(self):
+        if self.driver is None:
+            import ResFisher # selenium is only imported when a page actually needs it
+            os.makedirs(self.download_directory, exist_ok=True)
+            animated_printer.safe_print("Starting Firefox for pages that need javascript...")
+            self.driver = ResFisher.make_driver(self.download_directory)
+        return self.driver
+
+    def page_source(self, url):
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.common.by import By
+        with self.lock:
+            driver = self.ensure_driver()
+            self.pages += 1
+            driver.get(url)
+            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, 'body'))) # wait to load
+            return driver.page_source
+
+    def download(self, url, save_path):
+        # opens url in the browser and moves the downloaded file next to save_path, returns its path (None if nothing came)
+        import ResFisher
+        from selenium.common.exceptions import TimeoutException
+        with self.lock:
+            driver = self.ensure_driver()
+            self.pages += 1
+            before_files = set(os.listdir(self.download_directory))
+            try:
+                driver.get(url)
+            except TimeoutException:
+                pass # downloads often never 'finish loading' as a page, the folder tells us if it came
+            new_files = ResFisher.wait_for_download(self.download_directory, before_files, self.download_timeout)
+            if not new_files:
+                return None
+            downloaded = sorted(new_files)[0]
+            target = save_path[:-len('.pdf')] + '.doc' if downloaded.endswith('.doc') else save_path
+            os.replace(os.path.join(self.download_directory, downloaded), target)
+            return target
+
+    def close(self):
+        if self.driver is not None:
+            self.driver.quit()
+            self.driver = None
+
+class ResDownloader:
+    def __init__(self, save_directory, base_url=BASE_URL, max_workers=8, requests_per_second=4.0, timeout=30,
+                 max_retries=5, backoff_base=1.0, backoff_cap=60.0, use_browser_fallback=True, first_year=None, last_year=2000,
+                 incremental=True, revalidate_after_days=30, conversion_workers=2, conversion_timeout=120):
+        # revalidate_after_days: documents last checked longer ago than this get a conditional request (None: never)
+        self.save_directory = save_directory
+        self.base_url = base_url
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.first_year = first_year or datetime.now().year
+        self.last_year = last_year
+        self.limiter = RateLimiter(requests_per_second)
+        self.browser = BrowserFallback(save_directory) if use_browser_fallback else None
+        self.manifest = ScrapeManifest(save_directory) if incremental else None
+        self.revalidate_after_days = revalidate_after_days
+        self.converter = DocConverter(max_workers=conversion_workers, timeout=conversion_timeout, on_done=self.doc_converted)
+        self.awaiting_conversion = {} # pdf path -> what finish_resolution records once the pdf exists
+
+        # one session for every request: keep-alive connections, pooled per host, at least one per worker
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(max_workers, 4))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['User-Agent'] = USER_AGENT
+
+        self.downloaded = []
+        self.converted = []
+        self.failed = []
+        self.repaired = [] # re-fetched because the local pdf was corrupt/truncated
+        self.not_modified = 0 # conditional requests answered with 304
+        self.stats_lock = threading.Lock()
+
+    def backoff(self, attempt):
+        # exponential with jitter, capped
+        return min(self.backoff_cap, self.backoff_base * (2 ** attempt)) * (0.5 + random.random() / 2)
+
+    def get(self, url, stream=False, headers=None):
+        # rate limited GET, retried (with backoff for every worker) on connection errors and 429/5xx
+        # (a conditional request's 304 comes back as is, its status tells the caller nothing changed)
+        for attempt in range(self.max_retries + 1):
+            self.limiter.wait()
+            try:
+                response = self.session.get(url, timeout=self.timeout, stream=stream, headers=headers)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                self.limiter.pause(self.backoff(attempt))
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                delay = retry_after_seconds(response)
+                response.close()
+                self.limiter.pause(min(self.backoff_cap, delay) if delay is not None else self.backoff(attempt))
+                continue
+            response.raise_for_status()
+            return response
+
+    def save_response(self, response, chunks, save_path):
+        # streams the response's chunks into save_path through a '.part' file, checking the length when it's known
+        part_path = save_path + '.part'
+        size = 0
+        try:
+            with open(part_path, 'wb') as file:
+                for chunk in chunks:
+                    file.write(chunk)
+                    size += len(chunk)
+            expected = response.headers.get('Content-Length')
+            if expected is not None and response.headers.get('Content-Encoding') is None and int(expected) != size:
+                raise IOError(f"truncated download ({size} of {expected} bytes)")
+            os.replace(part_path, save_path)
+        finally:
+            response.close()
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        return save_path
+
+    def fetch_document(self, url, save_path, headers=None):
+        # returns (saved path or None, html soup or None, response): the document if url serves one, the page if it's html
+        # (both None on a 304)
+        response = self.get(url, stream=True, headers=headers)
+        if response.status_code == 304:
+            response.close()
+            return None, None, response
+        chunks = response.iter_content(CHUNK_SIZE)
+        first_chunk = next(chunks, b'')
+        content_type = response.headers.get('Content-Type', '').lower()
+        if first_chunk.startswith(PDF_MAGIC) or 'application/pdf' in content_type:
+            return self.save_response(response, chain([first_chunk], chunks), save_path), None, response
+        if first_chunk.startswith(DOC_MAGIC) or 'msword' in content_type:
+            return self.save_response(response, chain([first_chunk], chunks), save_path[:-len('.pdf')] + '.doc'), None, response
+        body = first_chunk + b''.join(chunks)
+        response.close()
+        return None, BeautifulSoup(body, 'html.parser'), response
+
+    def revalidate_resolution(self, resolution_string):
+        # conditional request for a recorded document: 304 leaves the pdf alone, anything else replaces it
+        entry = self.manifest.resolution(resolution_string)
+        save_path = os.path.join(self.save_directory, get_custom_filename(resolution_string))
+        saved, _, response = self.fetch_document(entry['document_url'], save_path, ScrapeManifest.conditional_headers(entry))
+        if response.status_code == 304:
+            self.manifest.mark_checked(resolution_string)
+            with self.stats_lock:
+                self.not_modified += 1
+            return save_path
+        if saved is None: # the document moved, go through the res page again
+            return self.fetch_resolution(resolution_string, entry['url'])
+        return self.finish_resolution(resolution_string, saved, save_path, entry['url'], entry['document_url'], response)
+
+    def fetch_resolution(self, resolution_string, res_page_url):
+        # downloads one res (res page -> english link -> document), falling back on the browser where the html has no document
+        save_path = os.path.join(self.save_directory, get_custom_filename(resolution_string))
+        document_url = res_page_url
+        saved, soup, response = self.fetch_document(res_page_url, save_path)
+        if saved is None:
+            english_link = find_english_link(soup)
+            if english_link:
+                document_url = urljoin(res_page_url, english_link['href'])
+                saved, _, response = self.fetch_document(document_url, save_path)
+            # (if no english pdf page link, the link itself should be the download link)
+            if saved is None and self.browser is not None:
+                saved = self.browser.download(document_url, save_path)
+                document_url, response = None, None # only the browser can get it, nothing to revalidate over http
+            if saved is None:
+                raise IOError(f"no document behind {document_url}")
+        return self.finish_resolution(resolution_string, saved, save_path, res_page_url, document_url, response)
+
+    def finish_resolution(self, resolution_string, saved, save_path, res_page_url, document_url, response):
+        # records the pdf in the manifest (a .doc is queued for conversion first, and recorded when its pdf exists)
+        if saved.endswith('.doc'):
+            with self.stats_lock:
+                self.awaiting_conversion[save_path] = (resolution_string, res_page_url, document_url, response)
+            self.converter.submit(saved, save_path)
+            return save_path
+        if self.manifest is not None:
+            self.manifest.record_resolution(resolution_string, save_path, res_page_url, document_url, response)
+        with self.stats_lock:
+            self.downloaded.append(save_path)
+        return save_path
+
+    def doc_converted(self, doc_path, pdf_path, error):
+        # DocConverter callback (runs on its worker threads)
+        with self.stats_lock:
+            resolution_string, res_page_url, document_url, response = self.awaiting_conversion.pop(pdf_path)
+        if error is not None:
+            with self.stats_lock:
+                self.failed.append(resolution_string)
+            return
+        if self.manifest is not None:
+            self.manifest.record_resolution(resolution_string, pdf_path, res_page_url, document_url, response)
+        with self.stats_lock:
+            self.converted.append(pdf_path)
+            self.downloaded.append(pdf_path)
+
+    def year_res_links(self, year):
+        # the res links of a year's index page (rendered in the browser only if the plain html has none)
+        # (with a manifest the request is conditional, and a 304 reuses the links recorded last time)
+        year_url = f"{self.base_url}{year}"
+        recorded = self.manifest.index_page(year_url) if self.manifest is not None else None
+        response = self.get(year_url, headers=ScrapeManifest.conditional_headers(recorded))
+        if response.status_code == 304 and recorded is not None:
+            with self.stats_lock:
+                self.not_modified += 1
+            return recorded['links']
+        res_links = find_res_links(BeautifulSoup(response.text, 'html.parser'))
+        if not res_links and self.browser is not None:
+            res_links = find_res_links(BeautifulSoup(self.browser.page_source(year_url), 'html.parser'))
+        res_links = [urljoin(year_url, res_link) for res_link in res_links]
+        if self.manifest is not None and res_links:
+            self.manifest.record_index_page(year_url, response, res_links)
+        return res_links
+
+    def pending_resolutions(self, res_links):
+        # (task, resolution string, res page url) for the year's links that need a request, and whether the scrape stops here
+        pending = []
+        for res_page_url in res_links:
+            resolution_string = res_page_url.rstrip('/').split("/")[-1] # extract 'S/RES/...'
+            if int(resolution_string[:4]) == 1292: # S/RES/1292 is the last '90s-style' resolution the UN released in 2000
+                animated_printer.safe_print("Resolution scraping complete.")
+                return pending, True
+            save_path = os.path.join(self.save_directory, get_custom_filename(resolution_string))
+            if self.manifest is None:
+                if os.path.exists(save_path):
+                    animated_printer.safe_print("Your folder is now up to date with the most recent UNSC Resolutions.")
+                    return pending, True
+                pending.append((self.fetch_resolution, resolution_string, res_page_url))
+                continue
+
+            # with a manifest every year is walked, so gaps get filled and damaged files replaced
+            state = self.manifest.local_state(resolution_string, save_path)
+            if state in ('missing', 'corrupt'):
+                if state == 'corrupt':
+                    animated_printer.safe_print(f"{save_path} is damaged or truncated, fetching it again.")
+                    with self.stats_lock:
+                        self.repaired.append(save_path)
+                pending.append((self.fetch_resolution, resolution_string, res_page_url))
+            elif state == 'untracked':
+                self.manifest.record_resolution(resolution_string, save_path, res_page_url) # intact pdf from an earlier scrape
+            elif self.manifest.needs_revalidation(resolution_string, self.revalidate_after_days):
+                pending.append((self.revalidate_resolution, resolution_string))
+        return pending, False
+
+    def run(self):
+        os.makedirs(self.save_directory, exist_ok=True)
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for year in range(self.first_year, self.last_year - 1, -1):
+                    try:
+                        res_links = self.year_res_links(year)
+                    except requests.RequestException as e:
+                        # e.g. no page yet for the current year in January, or the server giving up on it: skip the year
+                        animated_printer.safe_print(f"Failed to get the {year} resolutions page: {e}")
+                        with self.stats_lock:
+                            self.failed.append(f"{self.base_url}{year}")
+                        continue
+                    pending, done = self.pending_resolutions(res_links)
+                    futures = {executor.submit(*task): task[1] for task in pending}
+                    for future in as_completed(futures):
+                        try:
+                            future.result()
+                        except Exception as e:
+                            animated_printer.safe_print(f"Failed to download S/RES/{futures[future]}: {e}")
+                            with self.stats_lock:
+                                self.failed.append(futures[future])
+                    if self.manifest is not None:
+                        self.manifest.save() # once per year, so an interrupted scrape keeps what it fetched
+                    if done:
+                        break
+        finally:
+            self.converter.close() # waits for the queued conversions
+            if self.manifest is not None:
+                self.manifest.save()
+            self.session.close()
+            if self.browser is not None:
+                self.browser.close()
+        browser_pages = self.browser.pages if self.browser is not None else 0
+        animated_printer.safe_print(f"Downloaded {len(self.downloaded)} resolutions ({len(self.converted)} converted from .doc, "
+                                    f"{len(self.repaired)} replacing damaged files, {browser_pages} pages needed the browser), "
+                                    f"{self.not_modified} unchanged (304), {len(self.failed)} failed.")
+        return self.downloaded
+
+def resDownloader(save_directory, **options):
+    # drop-in for ResFisher.resFisher (options: see ResDownloader)
+    return ResDownloader(save_directory, **options).run()
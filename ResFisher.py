@@ -2,7 +2,8 @@
 UNResolutionProcessor: ResFisher.py
 
     uses selenium/soup to scrape res pdf files from the UN website, storing them in a directory
-    # NOTE: LibreOffice dependency
+    (the browser-free, concurrent scraper is ResDownloader, which falls back on make_driver/wait_for_download here)
+    # NOTE: LibreOffice dependency (.doc conversion through DocConverter)
     # NOTE: unoconv dependency
     # NOTE: setup to work with Firefox 
 
@@ -18,10 +19,11 @@ from selenium.webdriver.common.by import By
 from datetime import datetime
 import mimetypes
 from ProcessHelpers import animated_printer
+from DocConverter import DocConverter
 import time
 from selenium.common.exceptions import WebDriverException, TimeoutException
 
-def resFisher(save_directory):
+def make_driver(download_directory):
     # set up selenium with Firefox
     options = Options()
     options.headless = True
@@ -30,27 +32,46 @@ def resFisher(save_directory):
     profile = webdriver.FirefoxProfile()
     profile.set_preference("browser.download.folderList", 2)
     profile.set_preference("browser.download.manager.showWhenStarting", False)
-    profile.set_preference("browser.download.dir", save_directory)
+    profile.set_preference("browser.download.dir", download_directory)
     profile.set_preference("browser.helperApps.neverAsk.saveToDisk", "application/pdf, application/msword")
     options.profile = profile
-    driver = webdriver.Firefox(options=options)
 
     while True:
         try:
-            driver = webdriver.Firefox(options=options)
-            break
+            return webdriver.Firefox(options=options)
         except WebDriverException as e:
             print("Please ensure Firefox has the necessary permissions (kill the terminal and re-run main.py if this message continues to appear or you run into other issues).")
             input("Press Enter after granting permissions and closing any dialog boxes...")
             # retry after the user has granted permissions
 
-    # define base URL
-    base_url = "https://www.un.org/securitycouncil/content/resolutions-adopted-security-council-"
+def wait_for_download(download_directory, before_files, timeout=60, poll_interval=0.25):
+    # returns the files that showed up in download_directory since before_files, once Firefox has finished writing them
+    # (no '.part' left and sizes unchanged between two polls), or whatever is there after timeout seconds
+    deadline = time.monotonic() + timeout
+    last_sizes = None
+    while True:
+        current_files = set(os.listdir(download_directory))
+        new_files = {name for name in current_files - before_files if not name.endswith('.part')}
+        in_progress = any(name.endswith('.part') for name in current_files - before_files)
+        if new_files and not in_progress:
+            sizes = {name: os.path.getsize(os.path.join(download_directory, name)) for name in new_files}
+            if sizes == last_sizes:
+                return new_files
+            last_sizes = sizes
+        if time.monotonic() > deadline:
+            return new_files
+        time.sleep(poll_interval)
 
-    # check/define save directory
+def resFisher(save_directory):
+    # check/define save directory (before Firefox is pointed at it)
     if not os.path.exists(save_directory):
         os.makedirs(save_directory)
 
+    driver = make_driver(save_directory)
+
+    # define base URL
+    base_url = "https://www.un.org/securitycouncil/content/resolutions-adopted-security-council-"
+
     def download_file(file_url, save_path):
         # download and save a pdf (or word) document
         try:
@@ -65,14 +86,8 @@ def resFisher(save_directory):
         # pull desired filename from the download link text on the webpage
         return resolution_string.replace("/", "_") + ".pdf"
 
-    def convert_doc_to_pdf(doc_path, pdf_path):
-        # convert doc to pdf using unoconv
-        try:
-            os.system(f'unoconv -f pdf -o "{pdf_path}" "{doc_path}"')
-            os.remove(doc_path)  # remove the doc file after conversion
-            animated_printer.safe_print(f"Converted and saved: {pdf_path}")
-        except Exception as e:
-            animated_printer.safe_print(f"Failed to convert {doc_path} to PDF: {e}")
+    # .doc files are converted in the background by long-lived office listeners (failures are reported, the .doc kept)
+    converter = DocConverter()
 
     # iterate through the years from 2024 to 2000 (stopping after S/RES/1293 in 2000)
     for year in range(datetime.now().year, 1999, -1):
@@ -120,12 +135,8 @@ def resFisher(save_directory):
                 except TimeoutException:
                     animated_printer.safe_print(f"Timeout while trying to access {pdf_page_url}. Checking for downloads.") # Need to get rid of this
 
-                # wait for download to complete
-                time.sleep(10) 
-
-                # track files after download
-                after_files = set(os.listdir(save_directory))
-                new_files = after_files - before_files
+                # wait for download to complete (returns as soon as the new files are fully written)
+                new_files = wait_for_download(save_directory, before_files, timeout=10)
 
                 # check for downloaded .doc file
                 doc_files = [filename for filename in new_files if filename.endswith('.doc')]
@@ -133,7 +144,7 @@ def resFisher(save_directory):
                     for doc_file in doc_files:
                         doc_path = os.path.join(save_directory, doc_file)
                         pdf_path = os.path.join(save_directory, get_custom_filename(resolution_string))
-                        convert_doc_to_pdf(doc_path, pdf_path) # if so, convert to pdf
+                        converter.submit(doc_path, pdf_path) # if so, queue it for conversion to pdf
                     continue 
 
                 file_url = pdf_page_url
@@ -158,11 +169,11 @@ def resFisher(save_directory):
             if mime_type == 'application/msword':
                 doc_path = save_path
                 pdf_path = save_path.replace(".doc", ".pdf")
-                convert_doc_to_pdf(doc_path, pdf_path)
-                animated_printer.safe_print(f"Converted and saved: {pdf_path}")
+                converter.submit(doc_path, pdf_path)
 
         if break_out:
             break
 
-    # close the browser
+    # close the browser, finish the queued conversions
     driver.quit()
+    converter.close()
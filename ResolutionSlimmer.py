@@ -5,20 +5,24 @@ UNResolutionProcessor: ResolutionSlimmer.py
         - whitespace cleanup
         - delete newlines
         - replace non-ascii
+        - fast_slimDown: the PDF slimdown without regexes (used per chunk by PDFchunker)
         - application of the above in a filepath and string, where needed
 
 """
 import re
 
+# compiled once, not on every call
+WHITESPACE_PATTERN = re.compile(r'\s+')
+NON_ASCII_PATTERN = re.compile(r'[^\x00-\x7F]')
+
 def replace_white(text):
-    return re.sub(r'\s+', ' ', text)
+    return WHITESPACE_PATTERN.sub(' ', text)
 
 def replace_new_line(text):
     return text.replace('\n', '')
 
 def replace_non_ascii(input_string, replacement=''):
-    non_ascii_pattern = re.compile(r'[^\x00-\x7F]')
-    result_string = non_ascii_pattern.sub(replacement, input_string)
+    result_string = NON_ASCII_PATTERN.sub(replacement, input_string)
     return result_string
 
 def slimDown(filepath):
@@ -33,4 +37,17 @@ def PDFslimDown(text):
     text = replace_white(text)
     text = replace_non_ascii(text)
     return text
-    
\ No newline at end of file
+    
+
+def fast_slimDown(text):
+    # same result as PDFslimDown, with str builtins instead of regexes (collapse whitespace runs, then drop non-ascii)
+    if not text:
+        return text
+    collapsed = ' '.join(text.split())
+    if not collapsed:
+        return ' ' # whitespace only
+    if text[0].isspace():
+        collapsed = ' ' + collapsed
+    if text[-1].isspace():
+        collapsed = collapsed + ' '
+    return collapsed.encode('ascii', 'ignore').decode('ascii')
@@ -0,0 +1,102 @@
+"""
+UNResolutionProcessor: RunReport.py
+
+    per-run instrumentation for main.py, written as a JSON run report next to the .csv output:
+    - per res: wall time per stage (open, annex search, cut lines, text extraction, chunking), page and clause counts
+    - per run: stage totals, pipeline stage times (dedup, phrases, context, exports, ...), the slowest resolutions and the
+      memory taken by each column of the final frame
+    - opt-in cProfile: set UNRES_PROFILE_DIR=<folder> (or pass profile_dir to process_all_files) and every
+      read_and_process_paragraphs/extract_resolution call dumps a .prof there; combine them with
+      python RunReport.py <folder> [number of functions]
+
+"""
+import os
+import sys
+import json
+import glob
+import pstats
+import platform
+from datetime import datetime
+
+PROFILE_DIR_ENV = 'UNRES_PROFILE_DIR'
+
+def profile_dir_from_env():
+    # the opt-in profiling folder (None when profiling is off)
+    return os.environ.get(PROFILE_DIR_ENV) or None
+
+class RunReport:
+    def __init__(self, settings=None):
+        self.started = datetime.now()
+        self.settings = settings or {}
+        self.files = [] # one record per res
+        self.pipeline_timings = {} # run-level stages (extraction wall time, dedup, exports, ...), see ProcessHelpers.timed
+        self.memory = {} # bytes per column of the final frame, see ClauseSchema.memory_report
+
+    def add_file(self, file_path, resID, stats):
+        self.files.append({
+            'file': os.path.basename(file_path),
+            'resID': resID,
+            'cached': bool(stats.get('cached')),
+            'pages': stats.get('pages'),
+            'clauses': stats.get('clauses'),
+            'seconds': round(stats.get('seconds', 0.0), 6),
+            'timings': {stage: round(seconds, 6) for stage, seconds in stats.get('timings', {}).items()},
+        })
+
+    def stage_totals(self):
+        # summed over every parsed res (in parallel runs this is worker time, not wall time)
+        totals = {}
+        for record in self.files:
+            for stage, seconds in record['timings'].items():
+                totals[stage] = totals.get(stage, 0.0) + seconds
+        return {stage: round(seconds, 6) for stage, seconds in totals.items()}
+
+    def slowest(self, count=10):
+        parsed = [record for record in self.files if not record['cached']]
+        return sorted(parsed, key=lambda record: record['seconds'], reverse=True)[:count]
+
+    def to_dict(self, slowest_count=10):
+        parsed = [record for record in self.files if not record['cached']]
+        return {
+            'started': self.started.isoformat(timespec='seconds'),
+            'finished': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'settings': self.settings,
+            'totals': {
+                'files': len(self.files),
+                'parsed': len(parsed),
+                'cached': len(self.files) - len(parsed),
+                'pages': sum(record['pages'] or 0 for record in parsed),
+                'clauses': sum(record['clauses'] or 0 for record in self.files),
+            },
+            'pipeline_timings': {stage: round(seconds, 6) for stage, seconds in self.pipeline_timings.items()},
+            'stage_totals': self.stage_totals(),
+            'memory': self.memory,
+            'slowest': self.slowest(slowest_count),
+            'files': self.files,
+        }
+
+    def write(self, file_path):
+        with open(file_path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        return file_path
+
+def combine_profiles(profile_dir, limit=30):
+    # merges every per-res .prof in profile_dir and prints the hottest functions by cumulative time
+    paths = sorted(glob.glob(os.path.join(profile_dir, '*.prof')))
+    if not paths:
+        print(f"No .prof files in {profile_dir}")
+        return None
+    stats = pstats.Stats(paths[0])
+    for path in paths[1:]:
+        stats.add(path)
+    print(f"Combined {len(paths)} profiles from {profile_dir}")
+    stats.sort_stats('cumulative').print_stats(limit)
+    return stats
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python RunReport.py <profile folder> [number of functions]")
+        sys.exit(2)
+    combine_profiles(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 30)
@@ -0,0 +1,168 @@
+"""
+UNResolutionProcessor: ScrapeManifest.py
+
+    persistent record of what ResDownloader has fetched, kept as a JSON file in the res folder ('.scrape_manifest.json')
+    - per res: res page url, document url, ETag/Last-Modified of the document, size, sha256 and when it was fetched/checked
+    - per year index page: ETag/Last-Modified and the res links found on it
+    reruns use it to send conditional requests (304 = nothing to do), skip unchanged documents, fill gaps anywhere in
+    the folder and re-fetch pdfs that are missing, truncated or no longer match their checksum
+
+    run: python ScrapeManifest.py <res folder> [--verify]  (prints a summary; --verify checks every pdf against it)
+
+"""
+import os
+import sys
+import json
+import hashlib
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+MANIFEST_NAME = '.scrape_manifest.json'
+MANIFEST_VERSION = 1 # bump if the layout of the entries changes (older manifests are then ignored)
+
+def sha256_file(file_path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def is_intact_pdf(file_path):
+    # cheap structural check: pdf header up front and an end-of-file marker in the tail (truncated downloads lose it)
+    try:
+        size = os.path.getsize(file_path)
+        with open(file_path, 'rb') as f:
+            if f.read(5) != b'%PDF-':
+                return False
+            f.seek(max(0, size - 2048))
+            return b'%%EOF' in f.read()
+    except OSError:
+        return False
+
+def now_str():
+    return datetime.now().isoformat(timespec='seconds')
+
+class ScrapeManifest:
+    def __init__(self, save_directory, file_name=MANIFEST_NAME):
+        self.path = os.path.join(save_directory, file_name)
+        self.lock = threading.Lock() # ResDownloader's threads record into it concurrently
+        self.resolutions = {}
+        self.index_pages = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return # no (readable) manifest yet, everything gets verified from the files
+        if data.get('version') != MANIFEST_VERSION:
+            return
+        self.resolutions = data.get('resolutions', {})
+        self.index_pages = data.get('index_pages', {})
+
+    def save(self):
+        # written to a temp file first so an interrupted scrape never leaves a half-written manifest
+        with self.lock:
+            data = {'version': MANIFEST_VERSION, 'saved': now_str(), 'resolutions': self.resolutions,
+                    'index_pages': self.index_pages}
+            directory = os.path.dirname(self.path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(data, f, indent=1, sort_keys=True)
+                os.replace(temp_path, self.path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+    @staticmethod
+    def conditional_headers(entry):
+        # If-None-Match/If-Modified-Since for a recorded response (empty when there's nothing to validate against)
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def index_page(self, url):
+        return self.index_pages.get(url)
+
+    def record_index_page(self, url, response, links):
+        with self.lock:
+            self.index_pages[url] = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified'),
+                                     'links': links, 'fetched': now_str()}
+
+    def resolution(self, resolution_string):
+        return self.resolutions.get(resolution_string)
+
+    def record_resolution(self, resolution_string, file_path, res_page_url, document_url=None, response=None):
+        # records the pdf now at file_path (response: the one the document came from, for its validators)
+        stat = os.stat(file_path)
+        entry = {'url': res_page_url, 'document_url': document_url,
+                 'etag': response.headers.get('ETag') if response is not None else None,
+                 'last_modified': response.headers.get('Last-Modified') if response is not None else None,
+                 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256_file(file_path),
+                 'fetched': now_str(), 'checked': now_str()}
+        with self.lock:
+            self.resolutions[resolution_string] = entry
+        return entry
+
+    def mark_checked(self, resolution_string):
+        with self.lock:
+            self.resolutions[resolution_string]['checked'] = now_str()
+
+    def needs_revalidation(self, resolution_string, max_age_days):
+        # whether the server should be asked (conditionally) if the document changed
+        entry = self.resolutions.get(resolution_string)
+        if max_age_days is None or not entry or not entry.get('document_url'):
+            return False
+        if not (entry.get('etag') or entry.get('last_modified')):
+            return False
+        return datetime.fromisoformat(entry['checked']) < datetime.now() - timedelta(days=max_age_days)
+
+    def local_state(self, resolution_string, file_path):
+        # 'missing', 'corrupt' (truncated/damaged or not what was downloaded), 'untracked' (intact, but not in the
+        # manifest, e.g. scraped before it existed) or 'ok'
+        if not os.path.exists(file_path):
+            return 'missing'
+        if not is_intact_pdf(file_path):
+            return 'corrupt'
+        entry = self.resolutions.get(resolution_string)
+        if entry is None:
+            return 'untracked'
+        stat = os.stat(file_path)
+        if stat.st_size != entry['size']:
+            return 'corrupt'
+        if stat.st_mtime_ns != entry.get('mtime_ns'):
+            # touched since it was recorded, only the checksum can tell if it changed
+            if sha256_file(file_path) != entry['sha256']:
+                return 'corrupt'
+            with self.lock:
+                entry['mtime_ns'] = stat.st_mtime_ns
+        return 'ok'
+
+def main(save_directory, verify=False):
+    manifest = ScrapeManifest(save_directory)
+    print(f"{len(manifest.resolutions)} resolutions and {len(manifest.index_pages)} index pages in {manifest.path}")
+    if verify:
+        states = {}
+        for name in sorted(os.listdir(save_directory)):
+            if name.endswith('.pdf'):
+                state = manifest.local_state(name[:-len('.pdf')], os.path.join(save_directory, name))
+                states.setdefault(state, []).append(name)
+        for resolution_string in manifest.resolutions:
+            if not os.path.exists(os.path.join(save_directory, resolution_string + '.pdf')):
+                states.setdefault('missing', []).append(resolution_string + '.pdf')
+        for state, names in sorted(states.items()):
+            print(f"{state}: {len(names)}" + (f" ({', '.join(names[:10])}{', ...' if len(names) > 10 else ''})" if state != 'ok' else ''))
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python ScrapeManifest.py <res folder> [--verify]")
+        sys.exit(2)
+    main(sys.argv[1], '--verify' in sys.argv[2:])
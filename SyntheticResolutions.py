@@ -0,0 +1,149 @@
+"""
+UNResolutionProcessor: SyntheticResolutions.py
+
+    generates realistic-looking UNSC res pdfs locally with PyMuPDF (for benchmarks, no scraped corpus needed):
+    - A4 pages with the usual header ('S/RES/xxxx (yyyy)'), footer (document code, page number, barcode image) and rules
+    - first page: 'Security Council' masthead, distribution date, bold 'Resolution xxxx (yyyy)', adoption line
+    - preambular and numbered operative clauses opening with italic verbs, wrapped over as many pages as needed
+    - optionally a bold 'Annex' page (or several) at the end
+    files are named like the scraper names them ('2701(2023).pdf'), so GrabResID works on them
+
+    run: python SyntheticResolutions.py <output folder> [number of resolutions] [seed]
+
+"""
+import os
+import sys
+import random
+import fitz  # or 'PyMuPDF'
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842 # A4
+LEFT_MARGIN = 56 # headers/footers start here
+BODY_LEFT = 130 # main body (the 'Resolution' anchor sits here, so the cut line guides fall between the two)
+BODY_RIGHT = PAGE_WIDTH - BODY_LEFT
+BODY_TOP = 110
+BODY_BOTTOM = 750
+FONT_SIZE = 11
+LINE_HEIGHT = 14
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October',
+          'November', 'December']
+PREAMBULAR_VERBS = ['Recalling', 'Reaffirming', 'Expressing grave concern', 'Noting', 'Welcoming', 'Underlining',
+                    'Stressing', 'Determining', 'Taking note', 'Emphasizing']
+OPERATIVE_VERBS = ['Decides', 'Requests', 'Urges', 'Calls upon', 'Demands', 'Condemns', 'Encourages', 'Authorizes',
+                   'Reiterates', 'Expresses its intention']
+PHRASES = ['its previous resolutions on the situation', 'the Secretary-General', 'all parties to the conflict',
+           'the sovereignty, independence and territorial integrity of the country', 'the Government of National Unity',
+           'the United Nations Mission', 'international humanitarian law', 'the Committee established pursuant to resolution 1533 (2004)',
+           'the protection of civilians', 'the mandate until 31 December', 'the report of the Panel of Experts',
+           'Member States in the region', 'the African Union', 'full, safe and unhindered humanitarian access',
+           'the political process', 'in accordance with paragraph 12 above', 'the Côte d’Ivoire authorities']
+
+class PageWriter:
+    # lays runs of text (with their font) out over wrapped lines, starting new pages (with header/footer) as needed
+    def __init__(self, document, resID, year, rng):
+        self.document = document
+        self.resID = resID
+        self.year = year
+        self.rng = rng
+        self.page = None
+        self.y = BODY_TOP
+        self.new_page()
+
+    def new_page(self):
+        self.page = self.document.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        page_number = len(self.document)
+        self.page.insert_text((LEFT_MARGIN, 50), f"S/RES/{self.resID} ({self.year})", fontname="tiro", fontsize=9)
+        self.page.draw_line((LEFT_MARGIN, 56), (PAGE_WIDTH - LEFT_MARGIN, 56), width=0.5)
+        self.page.draw_line((LEFT_MARGIN, 790), (PAGE_WIDTH - LEFT_MARGIN, 790), width=0.5)
+        self.page.insert_text((LEFT_MARGIN, 805), f"{self.year % 100}-{self.resID * 7 % 100000:05d} (E)", fontname="tiro", fontsize=8)
+        self.page.insert_text((PAGE_WIDTH / 2, 805), f"{page_number}/{page_number + 1}", fontname="tiro", fontsize=8)
+        barcode = fitz.Pixmap(fitz.csGRAY, fitz.IRect(0, 0, 40, 8), 0)
+        barcode.set_rect(barcode.irect, (0,))
+        self.page.insert_image(fitz.Rect(PAGE_WIDTH - LEFT_MARGIN - 80, 796, PAGE_WIDTH - LEFT_MARGIN, 812), pixmap=barcode)
+        self.y = BODY_TOP
+
+    def write_runs(self, runs, indent=0, gap=6):
+        # runs: [(text, fontname)], wrapped word by word between the body margins
+        x = BODY_LEFT + indent
+        self.ensure_room()
+        for text, fontname in runs:
+            for word in text.split(' '):
+                if not word:
+                    continue
+                word_width = fitz.get_text_length(word + ' ', fontname=fontname, fontsize=FONT_SIZE)
+                if x + word_width > BODY_RIGHT and x > BODY_LEFT + indent:
+                    self.y += LINE_HEIGHT
+                    x = BODY_LEFT
+                    self.ensure_room()
+                self.page.insert_text((x, self.y), word + ' ', fontname=fontname, fontsize=FONT_SIZE)
+                x += word_width
+        self.y += LINE_HEIGHT + gap
+
+    def ensure_room(self):
+        if self.y > BODY_BOTTOM:
+            self.new_page()
+
+    def write_centered(self, text, fontname, fontsize):
+        self.ensure_room()
+        width = fitz.get_text_length(text, fontname=fontname, fontsize=fontsize)
+        self.page.insert_text(((PAGE_WIDTH - width) / 2, self.y), text, fontname=fontname, fontsize=fontsize)
+        self.y += fontsize + 10
+
+def clause_body(rng, num_phrases):
+    return ' '.join(rng.choice(PHRASES) for _ in range(num_phrases))
+
+def generate_resolution(file_path, resID, year, num_preambular=10, num_operative=20, annex_pages=0, seed=0):
+    # writes one synthetic res pdf to file_path
+    rng = random.Random(seed)
+    document = fitz.open()
+    writer = PageWriter(document, resID, year, rng)
+    day, month = rng.randint(1, 28), rng.choice(MONTHS)
+
+    # masthead
+    page = writer.page
+    page.insert_text((LEFT_MARGIN, 80), "United Nations", fontname="tibo", fontsize=12)
+    page.insert_text((BODY_LEFT + 60, 80), "Security Council", fontname="tibo", fontsize=20)
+    page.insert_text((PAGE_WIDTH - LEFT_MARGIN - 90, 72), "Distr.: General", fontname="tiro", fontsize=9)
+    page.insert_text((PAGE_WIDTH - LEFT_MARGIN - 90, 84), f"{day} {month} {year}", fontname="tiro", fontsize=9)
+    writer.y = 130
+    writer.write_runs([(f"Resolution {resID} ({year})", "tibo")])
+    writer.write_runs([(f"Adopted by the Security Council at its {8000 + resID}th meeting, on {day} {month} {year}", "tiro")], gap=14)
+    writer.write_runs([("The Security Council,", "tiro")], indent=20)
+
+    for _ in range(num_preambular):
+        writer.write_runs([(rng.choice(PREAMBULAR_VERBS), "tiit"), (f" {clause_body(rng, rng.randint(2, 6))},", "tiro")], indent=20)
+    for i in range(num_operative):
+        end = '.' if i == num_operative - 1 else ';'
+        writer.write_runs([(f"{i + 1}. ", "tiro"), (rng.choice(OPERATIVE_VERBS), "tiit"),
+                           (f" {clause_body(rng, rng.randint(2, 8))}{end}", "tiro")])
+
+    for annex_page in range(annex_pages):
+        writer.new_page()
+        if annex_page == 0:
+            writer.write_centered("Annex", "tibo", 12)
+        for _ in range(8):
+            writer.write_runs([(rng.choice(OPERATIVE_VERBS), "tiit"), (f" {clause_body(rng, rng.randint(3, 8))};", "tiro")])
+
+    document.save(file_path, garbage=3, deflate=True)
+    document.close()
+
+def generate_corpus(folder_path, num_resolutions=50, seed=0, annex_share=0.2, first_resID=2500, year=2020):
+    # writes num_resolutions res pdfs of varying length (some with annexes) to folder_path, returns their paths
+    rng = random.Random(seed)
+    os.makedirs(folder_path, exist_ok=True)
+    file_paths = []
+    for i in range(num_resolutions):
+        resID = first_resID + i
+        file_path = os.path.join(folder_path, f"{resID}({year}).pdf")
+        annex_pages = rng.randint(1, 4) if rng.random() < annex_share else 0
+        generate_resolution(file_path, resID, year, num_preambular=rng.randint(3, 20), num_operative=rng.randint(5, 60),
+                            annex_pages=annex_pages, seed=rng.randrange(1 << 30))
+        file_paths.append(file_path)
+    return file_paths
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python SyntheticResolutions.py <output folder> [number of resolutions] [seed]")
+        sys.exit(2)
+    paths = generate_corpus(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 50, int(sys.argv[3]) if len(sys.argv) > 3 else 0)
+    print(f"Wrote {len(paths)} synthetic resolutions to {sys.argv[1]}")
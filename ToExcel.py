@@ -2,33 +2,85 @@
 UNResolutionProcessor: ToExcel.py
 
     exports processed data to .xlsx (initialize/truncate and overwrite)
+    new files are streamed (write_dataframe_streaming): a write-only workbook gets the rows in chunks, so memory stays flat
+    however big the frame is, and frames past Excel's row limit continue on extra sheets ('<sheet>_2', '<sheet>_3', ...)
+    existing workbooks with other sheets in them are opened and updated through pandas (appending or replacing the sheet)
 
 """
 import os
 import pandas as pd
-from openpyxl import load_workbook
+from openpyxl import Workbook, load_workbook
 from ProcessHelpers import animated_printer
 
+EXCEL_MAX_ROWS = 1048576 # rows per sheet (header included)
+EXCEL_MAX_SHEET_NAME = 31
+STREAMING_KWARGS = {'index', 'header'} # to_excel options the streaming writer handles itself
+
+def sheet_names(base_name, count):
+    # '<base>', '<base>_2', ... cut to Excel's sheet name limit
+    names = [base_name[:EXCEL_MAX_SHEET_NAME]]
+    for i in range(2, count + 1):
+        suffix = f'_{i}'
+        names.append(base_name[:EXCEL_MAX_SHEET_NAME - len(suffix)] + suffix)
+    return names
+
+def write_dataframe_streaming(file_path, sheet_name, df, index=True, header=True, chunk_size=10000, max_rows=EXCEL_MAX_ROWS):
+    # writes df to a new workbook at file_path (overwriting it) the way df.to_excel lays it out (plain cells, no header
+    # formatting), returns the sheet names
+    rows_per_sheet = max_rows - (1 if header else 0)
+    num_sheets = max(1, -(-len(df) // rows_per_sheet))
+    names = sheet_names(sheet_name, num_sheets)
+    workbook = Workbook(write_only=True)
+    sheets = [workbook.create_sheet(name) for name in names]
+
+    for sheet_number, sheet in enumerate(sheets):
+        if header:
+            sheet.append(([None] if index else []) + [str(column) for column in df.columns])
+        sheet_start = sheet_number * rows_per_sheet
+        sheet_stop = min(len(df), sheet_start + rows_per_sheet)
+        for start in range(sheet_start, sheet_stop, chunk_size):
+            # blanks for missing values (as to_excel writes them), converted one chunk at a time
+            chunk = df.iloc[start:min(start + chunk_size, sheet_stop)]
+            chunk = chunk.astype(object).where(chunk.notna(), None)
+            for row in chunk.itertuples(index=index, name=None):
+                sheet.append(row)
+    workbook.save(file_path)
+    return names
+
+def can_stream(file_path, sheet_name, startrow, truncate_sheet, to_excel_kwargs):
+    # streaming rewrites the whole file, fine unless it would drop other sheets or rows meant to be kept
+    if set(to_excel_kwargs) - STREAMING_KWARGS:
+        return False
+    if not os.path.exists(file_path):
+        return True
+    if startrow or not truncate_sheet:
+        return False
+    existing = load_workbook(file_path, read_only=True) # only reads the sheet list
+    try:
+        return existing.sheetnames == [sheet_name]
+    finally:
+        existing.close()
+
 def add_dataframe_to_excel(file_path, sheet_name, df, startrow=None, truncate_sheet=True, **to_excel_kwargs):
     try:
+        if can_stream(file_path, sheet_name, startrow, truncate_sheet, to_excel_kwargs):
+            # write dataframe to a new .xlsx, chunk by chunk (split over several sheets past the row limit)
+            names = write_dataframe_streaming(file_path, sheet_name, df, **to_excel_kwargs)
+            animated_printer.safe_print(f"DataFrame added to {file_path} in sheet{'s' if len(names) > 1 else ''} "
+                                        f"{', '.join(repr(name) for name in names)}.")
+            return
+
         # check if the file exists
         if os.path.exists(file_path):
-            # load existing workbook
-            writer = pd.ExcelWriter(file_path, engine='openpyxl')
-            writer.book = load_workbook(file_path)
+            # open the existing workbook, keeping its other sheets
+            writer = pd.ExcelWriter(file_path, engine='openpyxl', mode='a',
+                                    if_sheet_exists='replace' if truncate_sheet else 'overlay')
 
-            # if sheet exists, determine start row
-            if sheet_name in writer.book.sheetnames:
-                sheet = writer.book[sheet_name]
+            # if sheet exists, determine start row (a truncated sheet is replaced, so it starts at the top)
+            if sheet_name in writer.book.sheetnames and not truncate_sheet:
                 if startrow is None:
+                    sheet = writer.book[sheet_name]
                     startrow = sheet.max_row if sheet.max_row is not None else 0
-
-                # truncate sheet if needed
-                if truncate_sheet:
-                    idx = writer.book.sheetnames.index(sheet_name)
-                    writer.book.remove(writer.book.worksheets[idx])
-                    writer.book.create_sheet(sheet_name, idx)
-                    startrow = 0
             else:
                 startrow = 0
         else:
@@ -48,8 +100,11 @@ def add_dataframe_to_excel(file_path, sheet_name, df, startrow=None, truncate_sh
 def overwrite_excel_file(file_path, sheet_name, df, **to_excel_kwargs):
     try:
         # write dataframe to .xlsx, overwriting a file if it exists at that filename
-        with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name=sheet_name, **to_excel_kwargs)
+        if not set(to_excel_kwargs) - STREAMING_KWARGS:
+            write_dataframe_streaming(file_path, sheet_name, df, **to_excel_kwargs)
+        else:
+            with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
+                df.to_excel(writer, sheet_name=sheet_name, **to_excel_kwargs)
         animated_printer.safe_print(f"DataFrame written to {file_path} in sheet '{sheet_name}'.")
     except Exception as e:
-        animated_printer.safe_print(f"An error occurred: {e}")
\ No newline at end of file
+        animated_printer.safe_print(f"An error occurred: {e}")
@@ -0,0 +1,76 @@
+"""
+UNResolutionProcessor: ToParquet.py
+
+    exports processed data as a typed, compressed Parquet dataset partitioned by year (one folder per year, so jobs can
+    read only the years they need), and as an Arrow IPC file that can be memory-mapped (zero-copy reads)
+    - known columns get fixed types (clauseID/resID int32, year int16, day int8, month dictionary-encoded), others are
+      inferred
+    - read_years/open_arrow_file load them back (as pyarrow tables, .to_pandas() for a frame)
+    # NOTE: pyarrow dependency
+
+"""
+import os
+import shutil
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.ipc as ipc
+import pyarrow.dataset as ds
+from ProcessHelpers import animated_printer
+
+COLUMN_TYPES = {
+    'clause': pa.string(),
+    'clauseID': pa.int32(),
+    'resID': pa.int32(),
+    'year': pa.int16(),
+    'month': pa.dictionary(pa.int8(), pa.string()),
+    'day': pa.int8(),
+    'context_clause': pa.string(),
+    'near_dup_cluster': pa.int32(),
+}
+
+def arrow_table(df):
+    # the frame as an arrow table with the fixed column types (index dropped)
+    fields = []
+    for column in df.columns:
+        if column in COLUMN_TYPES:
+            fields.append(pa.field(column, COLUMN_TYPES[column]))
+        else:
+            fields.append(pa.Schema.from_pandas(df[[column]], preserve_index=False).field(column))
+    return pa.Table.from_pandas(df, schema=pa.schema(fields), preserve_index=False)
+
+def write_parquet_dataset(df, dataset_path, partition_cols=('year',), compression='zstd', table=None):
+    # writes df as <dataset_path>/year=<yyyy>/*.parquet (replacing an earlier dataset at that path)
+    try:
+        table = table if table is not None else arrow_table(df)
+        if os.path.exists(dataset_path):
+            shutil.rmtree(dataset_path)
+        pq.write_to_dataset(table, dataset_path, partition_cols=list(partition_cols), compression=compression)
+        animated_printer.safe_print(f"DataFrame written to the Parquet dataset {dataset_path}.")
+    except Exception as e:
+        animated_printer.safe_print(f"An error occurred: {e}")
+
+def write_arrow_file(df, file_path, table=None, max_chunksize=65536):
+    # Arrow IPC file (uncompressed, so it can be memory-mapped without copying)
+    try:
+        table = table if table is not None else arrow_table(df)
+        with pa.OSFile(file_path, 'wb') as sink, ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=max_chunksize)
+        animated_printer.safe_print(f"DataFrame written to the Arrow file {file_path}.")
+    except Exception as e:
+        animated_printer.safe_print(f"An error occurred: {e}")
+
+def write_parquet_and_arrow(df, dataset_path, arrow_path):
+    # both outputs from one conversion of the frame
+    table = arrow_table(df)
+    write_parquet_dataset(df, dataset_path, table=table)
+    write_arrow_file(df, arrow_path, table=table)
+
+def read_years(dataset_path, years=None, columns=None):
+    # pyarrow table of the given years only (the other partitions aren't touched), all years if None
+    filters = [('year', 'in', list(years))] if years is not None else None
+    partitioning = ds.partitioning(pa.schema([pa.field('year', COLUMN_TYPES['year'])]), flavor='hive') # year back as int16
+    return pq.read_table(dataset_path, columns=columns, filters=filters, partitioning=partitioning)
+
+def open_arrow_file(file_path):
+    # memory-maps an Arrow IPC file written by write_arrow_file (zero-copy, the OS pages it in as it's read)
+    return ipc.open_file(pa.memory_map(file_path, 'r')).read_all()
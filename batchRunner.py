@@ -0,0 +1,296 @@
+"""
+UNResolutionProcessor: batchRunner.py
+
+    headless runs of the pipeline over several corpora/dataset variants in one go, set up by a JSON config instead of the
+    prompts (or dev_mode block) of main.py
+    - every job names a folder of res pdfs, optionally a year slice (by the year in the filenames) and any settings that
+      differ from JOB_DEFAULTS (annex handling, dedup, phrases, context, outputs, ...)
+    - the pdfs of all jobs are extracted up front on one shared process pool, each file at most once per layout backend:
+      jobs that only differ in their annex setting get both variants out of the same parse, and files already in the
+      extraction cache aren't parsed at all (every variant parsed is added to it, so the next run only parses new or
+      changed pdfs)
+    - each job then runs the usual clean-up and exports (.csv, .xlsx, parquet/arrow, clause store, annotation subset and
+      run report) into the output folder, named after the job
+
+    run: python batchRunner.py <config.json> [--workers N] [--only job,job] [--no-cache]
+
+    config (folders are relative to the config file, settings in "defaults" apply to every job):
+        {"output_folder": "UNResolutionData", "workers": 8, "use_extraction_cache": true,
+         "defaults": {"layout_backend": "pdfplumber", "write_excel": false},
+         "jobs": [{"name": "annex_excluded", "folder": "UNPDFs", "exclude_annex": true},
+                  {"name": "annex_included", "folder": "UNPDFs", "exclude_annex": false},
+                  {"name": "nineties", "folder": "UNPDFs", "years": [1990, 1999], "annotation_percentage": 10}]}
+
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import GrabResID
+import ReadAndProcessPDFs
+import ExtractionCache
+import RunReport
+import ClauseSchema
+import duplicateRemover
+import phraseRemover
+import clauseContextualizer
+from ProcessHelpers import animated_printer, timed, format_elapsed_time, init_worker
+
+JOB_DEFAULTS = {
+    'folder': None, # folder of res pdfs (required)
+    'years': None, # [first, last] year (inclusive) to keep, None for all
+    'exclude_annex': True,
+    'layout_backend': 'pdfplumber',
+    'remove_duplicates': True,
+    'near_duplicate_threshold': None,
+    'remove_phrases': True,
+    'strings_to_remove': ['The Security Council,', 'Decides to remain seized of the matter.',
+                          'Decides to remain actively seized of the matter.'],
+    'phrases_file': None,
+    'phrase_removal_mode': 'row',
+    'contextualize': True,
+    'context_window': 1,
+    'annotation_percentage': None, # e.g. 10 to also write an annotation subset
+    'annotation_stratify_by': None,
+    'annotation_reservoir_size': None, # e.g. 2000 to draw that many rows while the results are collected (see main.py)
+    'write_csv': True,
+    'write_excel': True,
+    'write_parquet': True,
+    'clause_store_path': None,
+}
+
+def load_config(config_path):
+    # the config with every job filled out from JOB_DEFAULTS/"defaults" (unknown settings are an error, not ignored)
+    with open(config_path) as f:
+        config = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(config_path))
+    defaults = dict(JOB_DEFAULTS, **config.get('defaults', {}))
+    jobs = []
+    for i, job_settings in enumerate(config.get('jobs', [])):
+        job = dict(defaults, **job_settings)
+        job.setdefault('name', f'job{i + 1}')
+        unknown = set(job) - set(JOB_DEFAULTS) - {'name'}
+        if unknown:
+            raise ValueError(f"job '{job['name']}': unknown settings {sorted(unknown)}")
+        if not job['folder']:
+            raise ValueError(f"job '{job['name']}': no folder given")
+        job['folder'] = os.path.join(base_dir, job['folder'])
+        for setting in ('phrases_file', 'clause_store_path'):
+            if job[setting]:
+                job[setting] = os.path.join(base_dir, job[setting])
+        jobs.append(job)
+    names = [job['name'] for job in jobs]
+    if len(set(names)) != len(names):
+        raise ValueError("job names must be unique (they name the output files)")
+    config['jobs'] = jobs
+    config['output_folder'] = os.path.join(base_dir, config.get('output_folder', 'UNResolutionData'))
+    return config
+
+def job_files(job):
+    # the job's pdfs, cut to its years by the year in the filename (files without one are kept)
+    files = ReadAndProcessPDFs.list_pdf_files(job['folder'])
+    if job['years'] is None:
+        return files
+    first_year, last_year = job['years']
+    kept = []
+    for file in files:
+        try:
+            year = GrabResID.grab_year(file)
+        except (AttributeError, ValueError):
+            kept.append(file)
+            continue
+        if first_year <= year <= last_year:
+            kept.append(file)
+    return kept
+
+def extract_all(jobs, workers=1, cache=None, profile_dir=None):
+    # {(file, layout backend, exclude_annex): worker result} for the files of every job, parsing each file at most once
+    # per backend (both annex settings from one parse when both are needed) on one process pool
+    needed = {}
+    for job in jobs:
+        for file in job['files']:
+            needed.setdefault((file, job['layout_backend']), set()).add(job['exclude_annex'])
+
+    results, keys, tasks = {}, {}, []
+    counts = {'cached': 0, 'parsed': 0, 'shared_parses': 0}
+    for (file, backend), settings in needed.items():
+        pending = []
+        for exclude_annex in sorted(settings):
+            if cache is not None:
+                keys[(file, backend, exclude_annex)] = cache.make_key(file, exclude_annex, layout_backend=backend)
+                entry = cache.get(keys[(file, backend, exclude_annex)])
+                if entry is not None:
+                    results[(file, backend, exclude_annex)] = ReadAndProcessPDFs.cached_file_result(file, entry)
+                    counts['cached'] += 1
+                    continue
+            pending.append(exclude_annex)
+        if pending:
+            tasks.append((file, backend, pending))
+
+    def store(file, backend, pending, output):
+        file_results = output if len(pending) > 1 else {pending[0]: output}
+        for exclude_annex, file_result in file_results.items():
+            results[(file, backend, exclude_annex)] = file_result
+            if cache is not None:
+                ReadAndProcessPDFs.cache_file_result(cache, keys[(file, backend, exclude_annex)], file_result)
+        counts['parsed'] += 1
+        counts['shared_parses'] += len(pending) > 1
+
+    def call(file, backend, pending):
+        if len(pending) > 1:
+            return ReadAndProcessPDFs.process_file_variants_in_worker, (file, backend, profile_dir)
+        return ReadAndProcessPDFs.process_file_in_worker, (file, pending[0], backend, profile_dir)
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+            futures = {}
+            for task in tasks:
+                function, args = call(*task)
+                futures[executor.submit(function, *args)] = task
+            for future in as_completed(futures):
+                store(*futures[future], future.result())
+    else:
+        for task in tasks:
+            function, args = call(*task)
+            store(*task, function(*args))
+    return results, counts
+
+def run_job(job, results, output_folder, date_str, extraction_seconds=None):
+    # the clean-up and exports of main.py for one job, from the extracted results; returns its run report path
+    name = job['name']
+    animated_printer.safe_print(f"[{name}] Building the data from {len(job['files'])} resolutions...")
+    settings = {setting: job[setting] for setting in JOB_DEFAULTS if setting != 'strings_to_remove'}
+    report = RunReport.RunReport(dict(settings, job=name))
+    if extraction_seconds is not None:
+        report.pipeline_timings['shared_extraction'] = extraction_seconds
+    failed_pdfs, annex_pdfs, run_stats = [], [], {}
+    files = job['files']
+    key = lambda file: (file, job['layout_backend'], job['exclude_annex'])
+    annotation = job['annotation_percentage'] is not None or bool(job['annotation_reservoir_size'])
+    annotation_sampler = None
+    if job['annotation_reservoir_size']:
+        import createSubsetToAnnotate
+        annotation_sampler = createSubsetToAnnotate.stream_sampler(job['annotation_reservoir_size'],
+                                                                   job['annotation_stratify_by'])
+
+    with timed(report.pipeline_timings, 'extraction'):
+        final_data = ReadAndProcessPDFs.collect_results(files, (results[key(file)] for file in files), failed_pdfs, annex_pdfs,
+                                                        run_stats=run_stats, report=report, sampler=annotation_sampler,
+                                                        ordinals=bool(job['clause_store_path']))
+
+    if job['remove_duplicates']:
+        with timed(report.pipeline_timings, 'dedup'):
+            final_data = duplicateRemover.remove_duplicates_and_adjust_ids(final_data, 'clause', 'clauseID')
+            if job['near_duplicate_threshold'] is not None:
+                final_data = duplicateRemover.remove_near_duplicates_and_adjust_ids(final_data, 'clause', 'clauseID',
+                                                                                    job['near_duplicate_threshold'])
+    if job['remove_phrases']:
+        with timed(report.pipeline_timings, 'phrase_removal'):
+            strings_to_remove = list(job['strings_to_remove'])
+            if job['phrases_file']:
+                strings_to_remove += phraseRemover.load_phrases(job['phrases_file'])
+            final_data = phraseRemover.remove_strings_and_adjust_ids(final_data, 'clause', strings_to_remove, 'clauseID',
+                                                                     mode=job['phrase_removal_mode'])
+    if job['contextualize']:
+        with timed(report.pipeline_timings, 'contextualization'):
+            final_data = clauseContextualizer.concatenate_quasi_sentences(final_data, window=job['context_window'])
+    final_data = ClauseSchema.compact(final_data)
+    if annotation_sampler is not None:
+        annotation_subset = createSubsetToAnnotate.match_sample(annotation_sampler, final_data,
+                                                                job['annotation_reservoir_size'])
+    store_data = final_data # with the extraction ordinals, if there are any (see main.py)
+    if 'ordinal' in final_data.columns:
+        final_data = final_data.drop(columns='ordinal')
+    report.memory = ClauseSchema.memory_report(final_data)
+
+    # exports, all at once (see main.py)
+    base_path = os.path.join(output_folder, f'UNResolutionData_{name}_{date_str}')
+    csv_file_path = base_path + '.csv'
+
+    def save_csv():
+        with timed(report.pipeline_timings, 'csv_export'):
+            final_data.to_csv(csv_file_path, index=False)
+
+    def save_excel():
+        import ToExcel
+        with timed(report.pipeline_timings, 'excel_export'):
+            ToExcel.add_dataframe_to_excel(base_path + '.xlsx', 'Final PDF Data', final_data)
+
+    def save_parquet():
+        import ToParquet
+        with timed(report.pipeline_timings, 'parquet_export'):
+            ToParquet.write_parquet_and_arrow(final_data, base_path + '_parquet', base_path + '.arrow')
+
+    def save_clause_store():
+        import ClauseStore
+        try:
+            with timed(report.pipeline_timings, 'clause_store'), ClauseStore.ClauseStore(job['clause_store_path']) as store:
+                store.upsert(store_data)
+        except Exception as e:
+            animated_printer.safe_print(f"[{name}] An error occurred: {e}")
+
+    exports = [(job['write_csv'] or annotation, save_csv), (job['write_excel'], save_excel),
+               (job['write_parquet'], save_parquet), (bool(job['clause_store_path']), save_clause_store)]
+    with timed(report.pipeline_timings, 'export'):
+        with ThreadPoolExecutor(max_workers=len(exports)) as pool:
+            for future in [pool.submit(export) for wanted, export in exports if wanted]:
+                future.result()
+
+    if annotation:
+        import createSubsetToAnnotate
+        with timed(report.pipeline_timings, 'annotation_subset'):
+            if annotation_sampler is not None:
+                createSubsetToAnnotate.save_subset(csv_file_path, annotation_subset)
+            else:
+                createSubsetToAnnotate.createSubsetToAnnotate(csv_file_path, job['annotation_percentage'], df=final_data,
+                                                              stratify_by=job['annotation_stratify_by'])
+
+    report_file_path = report.write(base_path + '_run_report.json')
+    animated_printer.safe_print(f"[{name}] {len(final_data)} quasi-sentences, {len(failed_pdfs)} failed resolutions"
+                                + (f" ({', '.join(failed_pdfs)})" if failed_pdfs else "")
+                                + f", run report: {report_file_path}")
+    return report_file_path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run several resolution processing jobs from a JSON config.")
+    parser.add_argument('config', help="batch config .json (see the top of batchRunner.py)")
+    parser.add_argument('--workers', type=int, help="extraction processes (default: the config's, else one per core)")
+    parser.add_argument('--only', help="comma separated job names to run (default: all)")
+    parser.add_argument('--no-cache', action='store_true', help="don't use (or fill) the extraction cache")
+    args = parser.parse_args(argv)
+
+    start_time = time.time()
+    config = load_config(args.config)
+    jobs = config['jobs']
+    if args.only:
+        wanted = args.only.split(',')
+        missing = set(wanted) - {job['name'] for job in jobs}
+        if missing:
+            parser.error(f"no such jobs: {', '.join(sorted(missing))}")
+        jobs = [job for job in jobs if job['name'] in wanted]
+    workers = args.workers or config.get('workers') or os.cpu_count() or 1
+    use_cache = config.get('use_extraction_cache', True) and not args.no_cache
+    cache = ExtractionCache.ExtractionCache() if use_cache else None
+    os.makedirs(config['output_folder'], exist_ok=True)
+    date_str = datetime.now().strftime('%Y_%m_%d_%I%M%p')
+
+    for job in jobs:
+        job['files'] = job_files(job)
+    animated_printer.safe_print(f"Extracting the resolutions of {len(jobs)} jobs on {workers} worker processes...")
+    extraction_start = time.time()
+    results, counts = extract_all(jobs, workers, cache, RunReport.profile_dir_from_env())
+    extraction_seconds = time.time() - extraction_start
+    animated_printer.safe_print(f"Parsed {counts['parsed']} pdfs ({counts['shared_parses']} for both annex settings at once), "
+                                f"reused {counts['cached']} cached extractions, in {format_elapsed_time(extraction_seconds)}.")
+
+    for job in jobs:
+        run_job(job, results, config['output_folder'], date_str, extraction_seconds)
+
+    animated_printer.safe_print(f"The batch took {format_elapsed_time(time.time() - start_time)} to run all jobs.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+UNResolutionProcessor: benchmarkChunker.py
+
+    micro-benchmark of the text-to-clauses step on long, annex-heavy (synthetic) resolutions:
+    - staged: ResolutionSlimmer.PDFslimDown -> PDFchunker.split_by_italics -> is_valid_clause -> collapse_and_trim_clause
+    - fused: PDFchunker.chunk_clauses on the marked-up text
+    - spans: PDFchunker.chunk_span_clauses on the Span stream (what the pipeline runs now)
+    checks all three give the same clauses, then prints the best time of each and the speedup over the staged path
+
+    run: python benchmarkChunker.py [operative clauses per res] [repeats]
+
+"""
+import sys
+import time
+import random
+import ResolutionSlimmer
+import PDFchunker
+from PDFextractor import Span
+from ReadAndProcessPDFs import is_valid_clause, collapse_and_trim_clause
+
+VERBS = ['Recalling', 'Reaffirming', 'Decides', 'Requests', 'Urges', 'Expresses', 'Welcomes', 'Calls upon']
+FILLER = ['the Secretary-General', 'all Member States', 'the Government of the Sudan', 'MINUSMA', 'its resolution 2374 (2017)',
+          'the Côte d’Ivoire authorities', 'the 1267/1989/2253 Committee', 'paragraph 12 (b) above', 'the Annex']
+
+def make_spans(num_clauses, seed=0):
+    # a long res as a Span stream: italic verbs, wrapped lines, numbered paragraphs, footnote digits, non-ascii quotes
+    rng = random.Random(seed)
+    spans = []
+    page = 0
+    for i in range(num_clauses):
+        if i and i % 25 == 0:
+            page += 1
+            spans.append(Span(str(page + 1), False, page)) # stray page number
+            spans.append(Span(" ", False, page))
+        spans.append(Span(f"{i + 1}.\t", False, page))
+        spans.append(Span(rng.choice(VERBS), True, page))
+        for _ in range(rng.randint(2, 6)):
+            spans.append(Span(" " + " ".join(rng.choice(FILLER) for _ in range(rng.randint(3, 8))), False, page))
+            spans.append(Span(" ", False, page)) # line break
+        spans.append(Span(rng.choice([",", ";", "."]), False, page))
+        spans.append(Span(" ", False, page))
+    return spans
+
+def to_text(spans):
+    return ''.join(f"<i>{span.text}</i>" if span.italic else span.text for span in spans)
+
+def staged(text):
+    reformatted_text = ResolutionSlimmer.PDFslimDown(text)
+    clauses = PDFchunker.split_by_italics(reformatted_text)
+    clauses = [clause for clause in clauses if is_valid_clause(clause)]
+    return [collapse_and_trim_clause([clause]) for clause in clauses]
+
+def best_time(function, argument, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        function(argument)
+        best = min(best, time.perf_counter() - start_time)
+    return best
+
+def main(num_clauses=2000, repeats=20):
+    spans = make_spans(num_clauses)
+    text = to_text(spans)
+
+    expected = staged(text)
+    assert PDFchunker.chunk_clauses(text) == expected, "fused engine differs from the staged path"
+    assert PDFchunker.chunk_span_clauses(spans) == expected, "span engine differs from the staged path"
+
+    staged_time = best_time(staged, text, repeats)
+    fused_time = best_time(PDFchunker.chunk_clauses, text, repeats)
+    spans_time = best_time(PDFchunker.chunk_span_clauses, spans, repeats)
+
+    print(f"{num_clauses} operative clauses, {len(text):,} characters, {len(expected)} quasi-sentences")
+    print(f"staged: {staged_time * 1000:8.2f} ms")
+    print(f"fused:  {fused_time * 1000:8.2f} ms ({staged_time / fused_time:.1f}x)")
+    print(f"spans:  {spans_time * 1000:8.2f} ms ({staged_time / spans_time:.1f}x)")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
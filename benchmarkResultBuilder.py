@@ -0,0 +1,63 @@
+"""
+UNResolutionProcessor: benchmarkResultBuilder.py
+
+    times the merge step of ReadAndProcessPDFs.process_all_files on synthetic per-res results:
+    - the old growing pd.concat loop (copies the whole frame every file, so cost grows with files x rows)
+    - the columnar ResultBuilder (appends to lists, builds the frame once, so cost grows with rows)
+    checks both produce the same frame, then prints the time per corpus size (and per clause) for each
+
+    run: python benchmarkResultBuilder.py [num_files ...]
+
+"""
+import sys
+import time
+from itertools import count
+import pandas as pd
+from ReadAndProcessPDFs import ResultBuilder
+
+CLAUSES_PER_RES = 30
+
+def make_results(num_files):
+    # fake per-res results, shaped like ReadAndProcessPDFs.extract_resolution output
+    results = []
+    for i in range(num_files):
+        clauses = [f"Reaffirms clause {j} of resolution {i}," for j in range(CLAUSES_PER_RES)]
+        results.append((clauses, 1293 + i, 2000 + i % 25, 'June', 1 + i % 28))
+    return results
+
+def merge_with_concat(results):
+    # the previous implementation
+    unique_clause_num = count(1)
+    final_data = pd.DataFrame(columns=ResultBuilder.columns)
+    for clauses, resID, year, month, day in results:
+        df = pd.DataFrame({'clause': clauses, 'resID': [resID] * len(clauses), 'year': [year] * len(clauses),
+                           'month': [month] * len(clauses), 'day': [day] * len(clauses)})
+        df['clauseID'] = [next(unique_clause_num) for _ in range(len(df))]
+        final_data = pd.concat([final_data, df], ignore_index=True)
+    return final_data
+
+def merge_with_builder(results):
+    builder = ResultBuilder()
+    for result in results:
+        builder.add(*result)
+    return builder.to_frame(compact=False) # the object layout the concat version produced
+
+def time_merge(merge, results):
+    start_time = time.perf_counter()
+    frame = merge(results)
+    return time.perf_counter() - start_time, frame
+
+def main(sizes):
+    print(f"{'files':>8} {'clauses':>9} {'concat (s)':>11} {'builder (s)':>12} {'concat us/clause':>17} {'builder us/clause':>18}")
+    for num_files in sizes:
+        results = make_results(num_files)
+        num_clauses = num_files * CLAUSES_PER_RES
+        concat_time, concat_frame = time_merge(merge_with_concat, results)
+        builder_time, builder_frame = time_merge(merge_with_builder, results)
+        pd.testing.assert_frame_equal(concat_frame.astype(object), builder_frame)
+        print(f"{num_files:>8} {num_clauses:>9} {concat_time:>11.3f} {builder_time:>12.3f} "
+              f"{concat_time / num_clauses * 1e6:>17.2f} {builder_time / num_clauses * 1e6:>18.2f}")
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [250, 500, 1000, 2000]
+    main(sizes)
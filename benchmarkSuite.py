@@ -0,0 +1,193 @@
+"""
+UNResolutionProcessor: benchmarkSuite.py
+
+    offline throughput benchmark of the whole pipeline -- no scraped corpus needed:
+    1. generates a synthetic corpus with SyntheticResolutions (or reuses a folder of res pdfs)
+    2. times every stage: open, date extraction, annex search, cut lines, span extraction and span chunking (what the
+       pipeline runs), merge, dedup, contextualization and Excel export, plus main.py's startup (dependency check and
+       core imports, best of a few fresh interpreters)
+       -- and, for reference, the older marked-up text path: italic extraction, slimming, chunking (staged and fused)
+    3. writes the results to a JSON file (one per run), and with --compare flags any stage that got slower than a
+       previous run by more than --threshold (exits 1 if so, so it can gate a change)
+
+    run: python benchmarkSuite.py [--files N] [--seed S] [--backend pdfplumber|pymupdf] [--include-annex]
+                                  [--corpus folder] [--output results.json] [--compare baseline.json] [--threshold 1.25]
+
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+import ResolutionSlimmer
+import PDFchunker
+import PDFextractor
+import GrabResID
+import duplicateRemover
+import clauseContextualizer
+import ToExcel
+from ReadAndProcessPDFs import ResultBuilder, is_valid_clause, collapse_and_trim_clause
+from ProcessHelpers import timed
+import SyntheticResolutions
+
+STAGES = ['startup', 'open', 'date', 'annex_search', 'cut_lines', 'span_extraction', 'span_chunking', 'italic_extraction',
+          'slimming', 'chunking', 'fused_chunking', 'merge', 'dedup', 'contextualization', 'excel_export']
+NOISE_FLOOR = 0.05 # seconds, stages faster than this in the baseline aren't compared
+
+def list_pdfs(folder_path):
+    return sorted(os.path.join(root, name)
+                  for root, _, names in os.walk(folder_path)
+                  for name in names if name.endswith(".pdf"))
+
+def run_stages(files, exclude_annex, backend, excel_dir):
+    # runs the pipeline stage by stage over the files, returns (timings, corpus counts)
+    timings = {stage: 0.0 for stage in STAGES}
+    counts = {'files': len(files), 'pages': 0, 'clauses': 0, 'bytes': sum(os.path.getsize(file) for file in files)}
+    builder = ResultBuilder()
+
+    for file in files:
+        with timed(timings, 'open'):
+            session = PDFextractor.DocumentSession(file)
+            session.layout_document(backend)
+            session.document
+        with session:
+            with timed(timings, 'date'):
+                day, month, year = session.date()
+            with timed(timings, 'annex_search'):
+                annex_index = session.annex_index(backend)
+            with timed(timings, 'cut_lines'):
+                bboxes, _ = session.main_content_bboxes(exclude_annex, backend)
+            # what the pipeline runs (ReadAndProcessPDFs.extract_resolution): the Span stream straight into the chunker
+            with timed(timings, 'span_extraction'):
+                spans = list(session.italic_spans(bboxes))
+            with timed(timings, 'span_chunking'):
+                clauses = PDFchunker.chunk_span_clauses(spans)
+            # reference: the marked-up text path the Span stream replaced
+            with timed(timings, 'italic_extraction'):
+                text = session.italic_text(bboxes)
+        counts['pages'] += annex_index['page_count']
+
+        with timed(timings, 'slimming'): # reference, staged
+            reformatted_text = ResolutionSlimmer.PDFslimDown(text)
+        with timed(timings, 'chunking'): # reference, staged
+            staged_clauses = PDFchunker.split_by_italics(reformatted_text)
+            staged_clauses = [collapse_and_trim_clause([clause]) for clause in staged_clauses if is_valid_clause(clause)]
+        with timed(timings, 'fused_chunking'): # reference, slimming + chunking of the marked-up text in one pass
+            PDFchunker.chunk_clauses(text)
+
+        with timed(timings, 'merge'):
+            builder.add(clauses, GrabResID.grab_resID(file), year, month, day)
+
+    with timed(timings, 'merge'):
+        final_data = builder.to_frame()
+    counts['clauses'] = len(final_data)
+
+    with timed(timings, 'dedup'):
+        final_data = duplicateRemover.remove_duplicates_and_adjust_ids(final_data, 'clause', 'clauseID')
+    with timed(timings, 'contextualization'):
+        final_data = clauseContextualizer.concatenate_quasi_sentences(final_data)
+    with timed(timings, 'excel_export'):
+        ToExcel.add_dataframe_to_excel(os.path.join(excel_dir, 'benchmark.xlsx'), 'Final PDF Data', final_data)
+
+    return timings, counts
+
+def time_startup(runs=3):
+    # main.startup() in fresh interpreters (nothing imported yet, as on a launch), best of runs
+    code = "import time; start = time.perf_counter(); import main; main.startup(); print(time.perf_counter() - start)"
+    seconds = []
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)))
+        seconds.append(float(completed.stdout.strip().splitlines()[-1]))
+    return min(seconds)
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return None
+
+def compare_runs(results, baseline, threshold):
+    # prints stage by stage ratios against the baseline, returns the stages that regressed
+    regressions = []
+    print(f"{'stage':<20} {'baseline (s)':>13} {'this run (s)':>13} {'ratio':>7}")
+    for stage in STAGES:
+        base = baseline['stages'].get(stage, {}).get('seconds')
+        current = results['stages'][stage]['seconds']
+        if base is None:
+            continue
+        ratio = current / base if base > 0 else float('inf')
+        flag = ''
+        if base >= NOISE_FLOOR and ratio > threshold:
+            regressions.append(stage)
+            flag = '  <-- slower'
+        print(f"{stage:<20} {base:>13.3f} {current:>13.3f} {ratio:>7.2f}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the resolution processing pipeline.")
+    parser.add_argument('--files', type=int, default=40, help="synthetic resolutions to generate")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--backend', choices=PDFextractor.LAYOUT_BACKENDS, default='pdfplumber')
+    parser.add_argument('--include-annex', action='store_true', help="process annexes (default excludes them)")
+    parser.add_argument('--corpus', help="folder of res pdfs to use (generated into if it has none)")
+    parser.add_argument('--output', help="results .json (default: benchmark_results/benchmark_<timestamp>.json)")
+    parser.add_argument('--compare', help="results .json of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=1.25, help="slowdown ratio that counts as a regression")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='unres_benchmark_')
+    try:
+        corpus_dir = args.corpus or os.path.join(work_dir, 'corpus')
+        if not list_pdfs(corpus_dir):
+            print(f"Generating {args.files} synthetic resolutions...")
+            SyntheticResolutions.generate_corpus(corpus_dir, args.files, args.seed)
+        files = list_pdfs(corpus_dir)
+
+        start_time = time.perf_counter()
+        timings, counts = run_stages(files, not args.include_annex, args.backend, work_dir)
+        total_seconds = time.perf_counter() - start_time
+        timings['startup'] = time_startup()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        'run': {'timestamp': datetime.now().isoformat(timespec='seconds'), 'commit': git_commit(),
+                'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count()},
+        'config': {'files': len(files), 'seed': args.seed, 'backend': args.backend, 'exclude_annex': not args.include_annex,
+                   'corpus': args.corpus},
+        'corpus': counts,
+        'stages': {stage: {'seconds': round(timings[stage], 6),
+                           'per_file_ms': round(timings[stage] / max(len(files), 1) * 1000, 3)} for stage in STAGES},
+        'total_seconds': round(total_seconds, 6),
+        'files_per_second': round(len(files) / total_seconds, 3) if total_seconds else None,
+    }
+
+    output_path = args.output or os.path.join('benchmark_results', f"benchmark_{datetime.now().strftime('%Y_%m_%d_%H%M%S')}.json")
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    for stage in STAGES:
+        print(f"{stage:<20} {timings[stage]:>9.3f}s {results['stages'][stage]['per_file_ms']:>10.2f} ms/file")
+    print(f"{counts['files']} files, {counts['pages']} pages, {counts['clauses']} clauses in {total_seconds:.2f}s "
+          f"({results['files_per_second']} files/s). Results written to {output_path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_runs(results, baseline, args.threshold)
+        if regressions:
+            print(f"Slower than {args.compare}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
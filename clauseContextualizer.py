@@ -3,39 +3,36 @@ UNResolutionProcessor: clauseContextualizer.py
 
     concatenates the former and successive quasi-sentences to each quasi-sentence -- contextualizes the quasi-sentence for
     the annotator (resets by res, handles bounds by taking the current + successive and former + current, respectively)
+    window sets how many quasi-sentences are taken on each side (1 by default); built from group-wise shifts, so it's
+    linear in the number of rows (loop_concatenate_quasi_sentences is the old row by row version, kept for reference)
 
-"""
 """
 import pandas as pd
 
-def concatenate_quasi_sentences(df, clause_col="clause", clause_id_col="clauseID", doc_id_col="resID", new_col_name="context_clause"):
+def concatenate_quasi_sentences(df, clause_col="clause", clause_id_col="clauseID", doc_id_col="resID", new_col_name="context_clause",
+                                window=1):
     # sort dataframe by res ID and clause ID
     df = df.sort_values(by=[doc_id_col, clause_id_col])
-    
-    # new column
-    df[new_col_name] = ''
-    
-    # process on res by res basis
-    for doc_id in df[doc_id_col].unique():
-        doc_df = df[df[doc_id_col] == doc_id]
-        for idx in doc_df.index:
-            if idx == doc_df.index[0]:  # beginning res boundary
-                concatenated = doc_df.loc[idx, clause_col] + ' ' + doc_df.loc[idx + 1, clause_col]
-            elif idx == doc_df.index[-1]:  # ending res boundary
-                concatenated = doc_df.loc[idx - 1, clause_col] + ' ' + doc_df.loc[idx, clause_col]
-            else:  # meat and potatoes
-                concatenated = (doc_df.loc[idx - 1, clause_col] + ' ' + 
-                                doc_df.loc[idx, clause_col] + ' ' + 
-                                doc_df.loc[idx + 1, clause_col])
-            
-            # trim fat and add to dataframe
-            df.at[idx, new_col_name] = concatenated.strip()
-    
+
+    # grow the context outwards one offset at a time, shifting within each res (shifts past a res boundary come back
+    # empty and are skipped, same as the bounds of the loop version)
+    clauses = df[clause_col].astype(object)
+    res_groups = clauses.groupby(df[doc_id_col], sort=False)
+    context = clauses
+    for offset in range(1, window + 1):
+        former = res_groups.shift(offset)
+        context = context.where(former.isna(), former + ' ' + context)
+        successive = res_groups.shift(-offset)
+        context = context.where(successive.isna(), context + ' ' + successive)
+
+    # trim fat and add to dataframe (rows without a res ID aren't contextualized, as before; added as a list so the
+    # column gets the same dtype the loop version's '' column did)
+    df[new_col_name] = context.str.strip().where(df[doc_id_col].notna(), '').tolist()
+
     return df
-"""
-import pandas as pd
 
-def concatenate_quasi_sentences(df, clause_col="clause", clause_id_col="clauseID", doc_id_col="resID", new_col_name="context_clause"):
+def loop_concatenate_quasi_sentences(df, clause_col="clause", clause_id_col="clauseID", doc_id_col="resID", new_col_name="context_clause"):
+    # reference: window of 1, one boolean mask over the whole frame per res (quadratic in the corpus size)
     # sort dataframe by res ID and clause ID
     df = df.sort_values(by=[doc_id_col, clause_id_col])
     
@@ -2,25 +2,131 @@
 UNResolutionProcessor: createSubsetToAnnotate.py
 
     creates a randomized (seed 42) sample of a dataframe (percentage variable) for annotation/verification
+    - takes the frame in memory (or reads the .csv), draws only the rows it keeps (no shuffle of the whole frame)
+    - optionally stratified by a column ('year', 'resID'): every group gets its proportional share of the sample
+    - ReservoirSampler draws a fixed-size sample from a stream of rows (e.g. while process_all_files is still producing
+      them), without ever holding the whole stream
+    - a streamed sample is keyed by (resID, ordinal) and matched back to the cleaned-up data afterwards, since
+      duplicate/phrase removal renumber clauseID and drop rows (stream_sampler, match_sample)
 
 """
 import pandas as pd
+import numpy as np
 import os
 import ToExcel
 
-def createSubsetToAnnotate(input_file, percentage):
-    # load dataframe
-    df = pd.read_csv(input_file)
-    
-    # shuffle based on 'clauseID'
-    df = df.sample(frac=1, random_state=42).reset_index(drop=True)
-    
-    # how many rows to keep?
-    retain_count = int(len(df) * (percentage / 100.0))
-    
-    # take subset
-    df_subset = df.iloc[:retain_count]
-    
+STREAM_COLUMNS = ['resID', 'ordinal', 'year'] # what process_all_files offers a sampler per clause
+RESERVOIR_OVERSAMPLE = 2 # kept rows per wanted row, so rows dropped by the clean-up can be made up for
+
+def allocate(group_sizes, total):
+    # splits total over the groups in proportion to their sizes (largest remainders get the leftover rows)
+    group_sizes = np.asarray(group_sizes, dtype=np.int64)
+    if total <= 0 or group_sizes.sum() == 0:
+        return np.zeros(len(group_sizes), dtype=np.int64)
+    shares = group_sizes * (total / group_sizes.sum())
+    counts = np.minimum(np.floor(shares).astype(np.int64), group_sizes)
+    leftover = total - counts.sum()
+    order = np.argsort(-(shares - counts), kind='stable')
+    for i in order:
+        if leftover == 0:
+            break
+        if counts[i] < group_sizes[i]:
+            counts[i] += 1
+            leftover -= 1
+    return counts
+
+def sample_frame(df, retain_count, stratify_by=None, seed=42):
+    # retain_count rows of df drawn without replacement, in random order
+    rng = np.random.default_rng(seed)
+    retain_count = min(retain_count, len(df))
+    if stratify_by is None:
+        positions = rng.choice(len(df), retain_count, replace=False)
+    else:
+        groups = list(df.groupby(stratify_by, sort=True, dropna=False).indices.values())
+        counts = allocate([len(group) for group in groups], retain_count)
+        positions = [rng.choice(group, count, replace=False) for group, count in zip(groups, counts) if count > 0]
+        positions = rng.permutation(np.concatenate(positions)) if positions else np.empty(0, dtype=np.int64)
+    return df.iloc[positions].reset_index(drop=True)
+
+class ReservoirSampler:
+    # uniform sample of up to size rows from a stream: every row gets a random key and the rows with the smallest keys
+    # are kept (pruned every time the kept rows double, so adding stays cheap)
+    # with stratify_by, each group keeps its own size smallest keys and sample() splits size over the groups in
+    # proportion to how many rows each one saw
+    def __init__(self, size, columns, stratify_by=None, seed=42):
+        self.size = size
+        self.columns = list(columns)
+        self.stratum_column = self.columns.index(stratify_by) if stratify_by is not None else None
+        self.rng = np.random.default_rng(seed)
+        self.kept = {} # stratum -> (keys, rows)
+        self.seen = {} # stratum -> rows offered
+
+    def add(self, rows):
+        # rows: tuples in the order of self.columns
+        rows = list(rows)
+        keys = self.rng.random(len(rows)).tolist()
+        for key, row in zip(keys, rows):
+            stratum = row[self.stratum_column] if self.stratum_column is not None else None
+            stratum_keys, stratum_rows = self.kept.setdefault(stratum, ([], []))
+            stratum_keys.append(key)
+            stratum_rows.append(row)
+            self.seen[stratum] = self.seen.get(stratum, 0) + 1
+            if len(stratum_keys) >= 2 * max(self.size, 1):
+                self.prune(stratum, self.size)
+
+    def add_frame(self, df):
+        self.add(df[self.columns].itertuples(index=False, name=None))
+
+    def prune(self, stratum, keep):
+        # keeps the keep smallest keys of the stratum, sorted
+        stratum_keys, stratum_rows = self.kept[stratum]
+        order = np.argsort(stratum_keys, kind='stable')[:keep]
+        self.kept[stratum] = ([stratum_keys[i] for i in order], [stratum_rows[i] for i in order])
+
+    def __len__(self):
+        return sum(self.seen.values())
+
+    def sample(self, size=None):
+        # the sample as a frame, in random order (size: fewer rows than the sampler was built for)
+        size = self.size if size is None else min(size, self.size)
+        strata = list(self.kept)
+        counts = allocate([self.seen[stratum] for stratum in strata], min(size, len(self)))
+        keys, rows = [], []
+        for stratum, count in zip(strata, counts):
+            self.prune(stratum, self.size)
+            keys.extend(self.kept[stratum][0][:count])
+            rows.extend(self.kept[stratum][1][:count])
+        order = np.argsort(keys, kind='stable')
+        return pd.DataFrame([rows[i] for i in order], columns=self.columns)
+
+def stream_sampler(size, stratify_by=None, seed=42):
+    # a ReservoirSampler for process_all_files(sampler=...) that keeps enough rows for match_sample to find size of them
+    # stratify_by: None, 'year' or 'resID'
+    return ReservoirSampler(size * RESERVOIR_OVERSAMPLE, STREAM_COLUMNS, stratify_by, seed)
+
+def match_sample(sampler, df, size):
+    # the first size sampled rows (in the sample's random order) that are still in df after the clean-up, with df's
+    # clauseID/context_clause etc.
+    # df: the data process_all_files returned (with its 'ordinal' column), deduplicated/cleaned however main does it
+    # with stratify_by, each stratum keeps its share of size (see ReservoirSampler.sample) out of the rows that survived
+    keys = sampler.sample()[['resID', 'ordinal']]
+    keys = keys.astype({'resID': df['resID'].dtype, 'ordinal': df['ordinal'].dtype})
+    columns = [column for column in df.columns if column != 'ordinal']
+    df_subset = keys.merge(df, on=['resID', 'ordinal'], how='inner')[columns]
+    if sampler.stratum_column is None:
+        df_subset = df_subset.head(size)
+    else:
+        stratify_by = sampler.columns[sampler.stratum_column]
+        strata = list(sampler.seen)
+        counts = dict(zip(strata, allocate([sampler.seen[stratum] for stratum in strata], min(size, len(sampler)))))
+        rank = df_subset.groupby(stratify_by, sort=False, observed=True).cumcount()
+        df_subset = df_subset[rank < df_subset[stratify_by].map(lambda stratum: counts.get(stratum, 0))]
+    if len(df_subset) < size:
+        print(f"Only {len(df_subset)} of the {size} sampled rows survived the clean-up")
+    return df_subset.reset_index(drop=True)
+
+def save_subset(input_file, df_subset):
+    # writes annotated_<input_file>.xlsx and annotated_<input_file> (.csv) next to input_file
     # create filename based on input filename
     base_name = os.path.basename(input_file)
     dir_name = os.path.dirname(input_file)
@@ -28,12 +134,27 @@ def createSubsetToAnnotate(input_file, percentage):
     new_file_path = os.path.join(dir_name, new_file_name)
 
     # save to .xlsx
-    excel_file_name = f'{new_file_name}.xlsx' 
+    excel_file_name = f'{new_file_name}.xlsx'
     excel_file_path = os.path.join(dir_name, excel_file_name)
     ToExcel.add_dataframe_to_excel(excel_file_path, 'Pre-Annotated Data', df_subset)
     print(f"Created new Excel file: {excel_file_path}")
-    
+
     # save to .csv
     df_subset.to_csv(new_file_path, index=False)
-    
+
     print(f"Pre-annotated subset saved to {new_file_path} as an .xlsx and .csv")
+
+def createSubsetToAnnotate(input_file, percentage, df=None, stratify_by=None, seed=42):
+    # input_file: the .csv the data was saved to (the subset is named after it), read only when df isn't given
+    # stratify_by: None, or a column to sample proportionally across (e.g. 'year' or 'resID')
+    # load dataframe
+    if df is None:
+        df = pd.read_csv(input_file)
+
+    # how many rows to keep?
+    retain_count = int(len(df) * (percentage / 100.0))
+
+    # take subset
+    df_subset = sample_frame(df, retain_count, stratify_by, seed)
+
+    save_subset(input_file, df_subset)
@@ -0,0 +1,298 @@
+"""
+UNResolutionProcessor: downloaderChecks.py
+
+    runs ResDownloader against a local stand-in of the UN website (http.server on 127.0.0.1, any free port), no network
+    - rate: requests from several threads are spaced out by the shared rate limiter
+    - retry_after: a 429 is retried once its Retry-After has passed
+    - backoff: 5xx responses are retried with growing delays, and raise once the retries run out
+    - streaming: a document is written to a '.part' file while it comes in and renamed when complete, a truncated one
+      leaves nothing behind
+    - stop_rules: without a manifest the scrape stops at S/RES/1292, or at the first res already in the folder
+    - year_failure: a year whose index page fails is reported and skipped, the other years still get scraped
+    - not_modified: a rerun with the manifest gets 304s for the index page and the documents, and rewrites nothing
+    prints each check's problems (if any), exits 1 when a check failed
+
+    run: python downloaderChecks.py [--check name ...]
+
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import ResDownloader
+
+class StandInSite:
+    # path -> route(handler), served on a free local port; every request is logged as (time, path, headers)
+    def __init__(self):
+        self.routes = {}
+        self.log = []
+        self.lock = threading.Lock()
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with site.lock:
+                    site.log.append((time.monotonic(), self.path, dict(self.headers)))
+                route = site.routes.get(self.path)
+                if route is None:
+                    send(self, 404, b'not found', 'text/plain')
+                else:
+                    route(self)
+
+            def log_message(self, *args):
+                pass # quiet
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def requests_to(self, path):
+        with self.lock:
+            return [(when, headers) for when, logged_path, headers in self.log if logged_path == path]
+
+def send(handler, status, body=b'', content_type='text/html', headers=None):
+    handler.send_response(status)
+    handler.send_header('Content-Type', content_type)
+    handler.send_header('Content-Length', str(len(body)))
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
+    handler.end_headers()
+    handler.wfile.write(body)
+
+def static(body, content_type='text/html', etag=None):
+    # a route serving body, answering a matching If-None-Match with a 304
+    def route(handler):
+        if etag is not None and handler.headers.get('If-None-Match') == etag:
+            handler.send_response(304)
+            handler.send_header('ETag', etag)
+            handler.end_headers()
+            return
+        send(handler, 200, body, content_type, {'ETag': etag} if etag is not None else None)
+    return route
+
+def sequence(*routes):
+    # a route answering with the given routes in turn (the last one from then on)
+    calls = []
+    def route(handler):
+        calls.append(1)
+        routes[min(len(calls), len(routes)) - 1](handler)
+    return route
+
+def status(code, headers=None):
+    return lambda handler: send(handler, code, b'', 'text/plain', headers)
+
+def pdf_bytes(name, size=4096):
+    # passes ScrapeManifest.is_intact_pdf: pdf header up front, end-of-file marker at the end
+    return b'%PDF-1.4\n% ' + name.encode() + b'\n' + b'0' * size + b'\n%%EOF\n'
+
+def add_year(site, year, resolution_strings, etag=True):
+    # year index page -> res pages (english link) -> pdfs, the way the UN site chains them
+    links = ''.join(f'<li><a href="/res/S/RES/{res}">S/RES/{res}</a></li>' for res in resolution_strings)
+    site.routes[f'/index-{year}'] = static(f'<html><body><ul>{links}</ul></body></html>'.encode(),
+                                           etag=f'"index-{year}"' if etag else None)
+    for res in resolution_strings:
+        site.routes[f'/res/S/RES/{res}'] = static(f'<html><body><a href="/pdf/{res}">English</a></body></html>'.encode())
+        site.routes[f'/pdf/{res}'] = static(pdf_bytes(res), 'application/pdf', etag=f'"{res}"' if etag else None)
+
+def make_downloader(site, directory, **options):
+    settings = {'base_url': f"{site.url}/index-", 'requests_per_second': None, 'backoff_base': 0.05, 'timeout': 5,
+                'use_browser_fallback': False, 'first_year': 2001, 'last_year': 2001}
+    settings.update(options)
+    return ResDownloader.ResDownloader(directory, **settings)
+
+def check_rate(site, directory):
+    site.routes['/ping'] = static(b'ok', 'text/plain')
+    downloader = make_downloader(site, directory, requests_per_second=20, max_workers=4)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda _: downloader.get(f"{site.url}/ping").close(), range(8)))
+    times = sorted(when for when, _ in site.requests_to('/ping'))
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    if min(gaps) < 0.04: # 1/20s apart, with some room for the server's clock
+        return [f"requests only {min(gaps):.3f}s apart at 20 requests/s"]
+    return []
+
+def check_retry_after(site, directory):
+    site.routes['/busy'] = sequence(status(429, {'Retry-After': '1'}), static(b'ok', 'text/plain'))
+    response = make_downloader(site, directory).get(f"{site.url}/busy")
+    times = [when for when, _ in site.requests_to('/busy')]
+    problems = []
+    if response.status_code != 200 or len(times) != 2:
+        problems.append(f"expected one retry ending in a 200, got {len(times)} requests and a {response.status_code}")
+    elif times[1] - times[0] < 0.9:
+        problems.append(f"retried {times[1] - times[0]:.2f}s after a 'Retry-After: 1'")
+    return problems
+
+def check_backoff(site, directory):
+    problems = []
+    site.routes['/flaky'] = sequence(status(503), status(503), static(b'ok', 'text/plain'))
+    response = make_downloader(site, directory, backoff_base=0.2).get(f"{site.url}/flaky")
+    times = [when for when, _ in site.requests_to('/flaky')]
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    if response.status_code != 200 or len(times) != 3:
+        problems.append(f"expected two retries ending in a 200, got {len(times)} requests and a {response.status_code}")
+    elif gaps[0] < 0.1 or gaps[1] < 0.2: # backoff_base * 2 ** attempt, jittered down to half
+        problems.append(f"retries {gaps[0]:.2f}s and {gaps[1]:.2f}s apart, expected at least 0.1s then 0.2s")
+
+    site.routes['/down'] = status(503)
+    try:
+        make_downloader(site, directory, max_retries=2).get(f"{site.url}/down")
+        problems.append("a server that keeps answering 503 didn't raise")
+    except requests.HTTPError:
+        if len(site.requests_to('/down')) != 3:
+            problems.append(f"expected 3 tries before giving up, got {len(site.requests_to('/down'))}")
+    return problems
+
+def check_streaming(site, directory):
+    problems = []
+    body = pdf_bytes('stream', 300000)
+    release = threading.Event()
+
+    def slow(handler):
+        # the first part, then wait until the check has looked at the folder
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'application/pdf')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body[:150000])
+        handler.wfile.flush()
+        release.wait(10)
+        handler.wfile.write(body[150000:])
+
+    def truncated(handler):
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'application/pdf')
+        handler.send_header('Content-Length', str(len(body) + 1000))
+        handler.end_headers()
+        handler.wfile.write(body)
+        handler.close_connection = True
+
+    site.routes['/pdf/slow'] = slow
+    site.routes['/pdf/truncated'] = truncated
+    downloader = make_downloader(site, directory)
+
+    save_path = os.path.join(directory, 'slow.pdf')
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        fetch = pool.submit(downloader.fetch_document, f"{site.url}/pdf/slow", save_path)
+        deadline = time.monotonic() + 5
+        while not os.path.exists(save_path + '.part') and time.monotonic() < deadline:
+            time.sleep(0.01)
+        if not os.path.exists(save_path + '.part'):
+            problems.append("no .part file while the document was coming in")
+        if os.path.exists(save_path):
+            problems.append("the document was at its final name before it was complete")
+        release.set()
+        saved = fetch.result()[0]
+    if saved != save_path or not os.path.exists(save_path) or open(save_path, 'rb').read() != body:
+        problems.append("the complete document wasn't renamed into place intact")
+    if os.path.exists(save_path + '.part'):
+        problems.append("the .part file was left behind")
+
+    save_path = os.path.join(directory, 'truncated.pdf')
+    try:
+        downloader.fetch_document(f"{site.url}/pdf/truncated", save_path)
+        problems.append("a truncated download didn't raise")
+    except (IOError, requests.RequestException):
+        pass
+    if os.path.exists(save_path) or os.path.exists(save_path + '.part'):
+        problems.append("a truncated download left a file behind")
+    return problems
+
+def check_stop_rules(site, directory):
+    problems = []
+    add_year(site, 2001, ['1294(2000)', '1293(2000)', '1292(2000)', '1291(2000)'])
+    add_year(site, 2000, ['1290(2000)'])
+
+    # S/RES/1292: everything before it, nothing from it on, no older years
+    first = os.path.join(directory, 'stop_1292')
+    make_downloader(site, first, incremental=False, last_year=2000).run()
+    if sorted(os.listdir(first)) != ['1293(2000).pdf', '1294(2000).pdf']:
+        problems.append(f"stopping at S/RES/1292 left {sorted(os.listdir(first))}")
+    if site.requests_to('/index-2000'):
+        problems.append("kept going into older years after S/RES/1292")
+
+    # a res already in the folder: only the newer ones are fetched
+    second = os.path.join(directory, 'stop_existing')
+    os.makedirs(second)
+    with open(os.path.join(second, '1293(2000).pdf'), 'wb') as f:
+        f.write(pdf_bytes('1293(2000)'))
+    fetched_before = len(site.requests_to('/pdf/1294(2000)'))
+    make_downloader(site, second, incremental=False, last_year=2000).run()
+    if len(site.requests_to('/pdf/1294(2000)')) != fetched_before + 1 or len(site.requests_to('/res/S/RES/1293(2000)')) != 1:
+        problems.append("an existing res didn't stop the scrape right before it")
+    if site.requests_to('/index-2000'):
+        problems.append("kept going into older years after an existing res")
+    return problems
+
+def check_year_failure(site, directory):
+    # 2002 has no index page (yet), 2001 does
+    add_year(site, 2001, ['1294(2000)', '1293(2000)'])
+    downloader = make_downloader(site, directory, incremental=False, first_year=2002)
+    downloaded = downloader.run()
+    problems = []
+    if sorted(os.path.basename(path) for path in downloaded) != ['1293(2000).pdf', '1294(2000).pdf']:
+        problems.append(f"after a failed year only got {downloaded}")
+    if f"{site.url}/index-2002" not in downloader.failed:
+        problems.append(f"the failed year isn't in failed: {downloader.failed}")
+    return problems
+
+def check_not_modified(site, directory):
+    problems = []
+    add_year(site, 2001, ['1295(2000)', '1294(2000)'])
+    first = make_downloader(site, directory)
+    if len(first.run()) != 2:
+        problems.append(f"the first run downloaded {first.downloaded}")
+    mtimes = {name: os.stat(os.path.join(directory, name)).st_mtime_ns for name in os.listdir(directory) if name.endswith('.pdf')}
+
+    rerun = make_downloader(site, directory, revalidate_after_days=0)
+    rerun.run()
+    if rerun.downloaded or rerun.not_modified != 3:
+        problems.append(f"the rerun downloaded {rerun.downloaded} and got {rerun.not_modified} 304s (expected 3)")
+    if {name: os.stat(os.path.join(directory, name)).st_mtime_ns for name in mtimes} != mtimes:
+        problems.append("the rerun rewrote pdfs")
+    if site.requests_to('/index-2001')[-1][1].get('If-None-Match') != '"index-2001"':
+        problems.append("the rerun's index request wasn't conditional")
+    return problems
+
+CHECKS = {'rate': check_rate, 'retry_after': check_retry_after, 'backoff': check_backoff, 'streaming': check_streaming,
+          'stop_rules': check_stop_rules, 'year_failure': check_year_failure, 'not_modified': check_not_modified}
+
+def main(names=None):
+    failed = 0
+    for name in names or CHECKS:
+        directory = tempfile.mkdtemp(prefix=f'downloader_{name}_')
+        try:
+            with StandInSite() as site:
+                problems = CHECKS[name](site, directory)
+        except Exception as e:
+            problems = [f"raised {type(e).__name__}: {e}"]
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        print(f"{name}: {'ok' if not problems else 'FAILED'}")
+        for problem in problems:
+            print(f"    {problem}")
+        failed += bool(problems)
+    print(f"{len(names or CHECKS) - failed} of {len(names or CHECKS)} checks passed.")
+    return failed == 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check ResDownloader against a local stand-in of the UN website.")
+    parser.add_argument('--check', nargs='+', choices=list(CHECKS), help="checks to run (default: all)")
+    args = parser.parse_args()
+    sys.exit(0 if main(args.check) else 1)
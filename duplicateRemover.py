@@ -2,9 +2,24 @@
 UNResolutionProcessor: duplicateRemover.py
 
     removes duplicates and adjusts clause IDs to be concurrent, keeps all other columns intact
+    near-duplicates (boilerplate repeated with small edits -- dates, numbers, country names) are found with MinHash/LSH:
+    - each quasi-sentence becomes a set of character shingles (lowercased, whitespace collapsed), hashed with numpy
+    - a MinHash signature per quasi-sentence estimates the Jaccard similarity of any two of them
+    - signatures are cut into bands and bucketed (locality sensitive hashing), only quasi-sentences sharing a bucket are
+      compared, so it scales roughly linearly (no all-pairs comparison over the corpus; within a bucket every pair is,
+      up to MAX_BUCKET_NEIGHBOURS apart)
+    - pairs at or above the similarity threshold are joined into clusters (cluster IDs numbered by first appearance),
+      optionally keeping only the first quasi-sentence of each cluster
 
 """
 import pandas as pd
+import numpy as np
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+SHINGLE_BASE = np.uint64(1099511628211) # FNV prime, mixes the characters of a shingle
+CHUNK_CHARACTERS = 1 << 15 # characters hashed per numpy pass (bounds the (shingles x permutations) matrix)
+MAX_BUCKET_NEIGHBOURS = 64 # in a bigger bucket each text is only compared with the next this many (bounds the pairs)
 
 def remove_duplicates_and_adjust_ids(df, column_name, id_column):
     # remove duplicates
@@ -14,3 +29,119 @@ def remove_duplicates_and_adjust_ids(df, column_name, id_column):
     df[id_column] = range(1, len(df) + 1)
     
     return df
+
+def normalize_for_shingles(text, shingle_size):
+    # lowercased, whitespace collapsed, padded so even the shortest quasi-sentence has one shingle
+    text = ' '.join(str(text).lower().split())
+    return text.ljust(shingle_size, '\x01')
+
+def minhash_signatures(texts, num_perm=128, shingle_size=5, seed=0):
+    # (len(texts), num_perm) uint32 MinHash signatures over the character shingles of each text
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+    b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+    encoded = [normalize_for_shingles(text, shingle_size).encode('utf-8') for text in texts]
+    signatures = np.empty((len(encoded), num_perm), dtype=np.uint32)
+
+    start = 0
+    while start < len(encoded):
+        # take texts until the chunk holds CHUNK_CHARACTERS (at least one text)
+        stop, characters = start + 1, len(encoded[start])
+        while stop < len(encoded) and characters + len(encoded[stop]) <= CHUNK_CHARACTERS:
+            characters += len(encoded[stop])
+            stop += 1
+        chunk = encoded[start:stop]
+        data = np.frombuffer(b''.join(chunk), dtype=np.uint8).astype(np.uint64)
+        lengths = np.fromiter((len(text) for text in chunk), dtype=np.int64, count=len(chunk))
+        text_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+        # polynomial hash of every window of shingle_size bytes (numpy wraps on overflow, which is fine for hashing)
+        num_windows = len(data) - shingle_size + 1
+        window_hashes = np.zeros(num_windows, dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            for i in range(shingle_size):
+                window_hashes = window_hashes * SHINGLE_BASE + data[i:i + num_windows]
+
+        # keep the windows that don't cross into the next text
+        shingle_counts = lengths - shingle_size + 1
+        shingle_offsets = np.concatenate(([0], np.cumsum(shingle_counts)[:-1]))
+        positions = np.arange(shingle_counts.sum()) - np.repeat(shingle_offsets - text_starts, shingle_counts)
+        shingle_hashes = window_hashes[positions] >> np.uint64(29) # top bits, the low ones mix poorly
+
+        # universal hashing per permutation, min over each text's shingles
+        with np.errstate(over='ignore'):
+            permuted = (shingle_hashes[:, None] * a[None, :] + b[None, :]) % MERSENNE_PRIME
+        signatures[start:stop] = np.minimum.reduceat(permuted & MAX_HASH, shingle_offsets, axis=0)
+        start = stop
+    return signatures
+
+def lsh_parameters(threshold, num_perm):
+    # (bands, rows) with bands * rows = num_perm, whose S-curve turns at the similarity threshold
+    # (a pair with Jaccard s becomes a candidate with probability 1 - (1 - s^rows)^bands)
+    options = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    return min(options, key=lambda option: abs((1 / option[0]) ** (1 / option[1]) - threshold))
+
+def near_duplicate_clusters(texts, threshold=0.8, num_perm=128, shingle_size=5, seed=0):
+    # cluster ID per text (1, 2, ... by first appearance), texts with estimated Jaccard >= threshold share one
+    if len(texts) == 0:
+        return np.empty(0, dtype=np.int64)
+    signatures = minhash_signatures(texts, num_perm, shingle_size, seed)
+    bands, rows = lsh_parameters(threshold, num_perm)
+    return signature_clusters(signatures, threshold, bands, rows)
+
+def signature_clusters(signatures, threshold, bands, rows):
+    # cluster ID per signature row (see near_duplicate_clusters), comparing the pairs that share a bucket in any band
+    num_texts = len(signatures)
+
+    # union-find over the texts (a list, numpy scalar access is slow)
+    parent = list(range(num_texts))
+    def find(i):
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    for band in range(bands):
+        # bucket the texts by this band of their signature; sorted by bucket, the members of a bucket sit next to each
+        # other, so comparing every text with the one offset places on (offset = 1, 2, ...) covers all pairs in a bucket
+        band_signatures = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        keys = band_signatures.view(np.dtype((np.void, band_signatures.itemsize * rows))).ravel()
+        _, bucket = np.unique(keys, return_inverse=True)
+        bucket = bucket.ravel()
+        order = np.argsort(bucket, kind='stable')
+        sorted_bucket = bucket[order]
+        largest_bucket = np.bincount(bucket).max()
+        for offset in range(1, min(largest_bucket, MAX_BUCKET_NEIGHBOURS + 1)):
+            same = np.flatnonzero(sorted_bucket[:-offset] == sorted_bucket[offset:])
+            if len(same) == 0:
+                break
+            first, second = order[same], order[same + offset]
+            similarity = (signatures[first] == signatures[second]).mean(axis=1)
+            matched = similarity >= threshold
+            for i, j in zip(first[matched].tolist(), second[matched].tolist()):
+                root_i, root_j = find(i), find(j)
+                if root_i != root_j:
+                    parent[max(root_i, root_j)] = min(root_i, root_j) # the earliest text is the root
+
+    # a cluster's root is its earliest text, so numbering the roots in order numbers clusters by first appearance
+    roots = np.fromiter((find(i) for i in range(num_texts)), dtype=np.int64, count=num_texts)
+    _, cluster = np.unique(roots, return_inverse=True)
+    return cluster.ravel() + 1
+
+def remove_near_duplicates_and_adjust_ids(df, column_name, id_column, threshold=0.8, drop=True, cluster_column='near_dup_cluster',
+                                          num_perm=128, shingle_size=5, seed=0):
+    # adds the near-duplicate cluster IDs as cluster_column; with drop, keeps the first quasi-sentence of each cluster
+    # and adjusts IDs (exact duplicates always end up in the same cluster)
+    df = df.reset_index(drop=True)
+    df[cluster_column] = near_duplicate_clusters(df[column_name].tolist(), threshold, num_perm, shingle_size, seed)
+
+    if drop:
+        # remove near-duplicates
+        df = df.drop_duplicates(subset=[cluster_column]).reset_index(drop=True)
+
+        # adjust IDs
+        df[id_column] = range(1, len(df) + 1)
+
+    return df
@@ -1,18 +1,106 @@
+"""
+UNResolutionProcessor: installer.py
+
+    dependency check run at the start of main.py
+    - macOS: runs install.sh (homebrew, LibreOffice, unoconv, the python packages)
+    - elsewhere (e.g. linux workers): checks the python packages with importlib.metadata and pip installs any missing ones
+      (LibreOffice/unoconv are only needed to convert .doc resolutions, so their absence is a warning)
+    a passed check leaves a stamp ('.install_stamp.json') keyed on requirements.txt, install.sh and the interpreter, so
+    later launches only re-check the package metadata (milliseconds) until one of those changes
+    set UNRES_SKIP_INSTALL=1 to skip the check altogether, or pass force=True to redo it
+
+"""
 import subprocess
 import os
+import re
+import sys
+import json
+import shutil
+import hashlib
+import platform
+from importlib import metadata
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REQUIREMENTS_PATH = os.path.join(SCRIPT_DIR, 'requirements.txt')
+STAMP_PATH = os.path.join(SCRIPT_DIR, '.install_stamp.json')
+SKIP_ENV = 'UNRES_SKIP_INSTALL'
+
+def requirement_names(requirements_path=REQUIREMENTS_PATH):
+    # distribution names from requirements.txt (comments, versions and extras dropped)
+    names = []
+    with open(requirements_path) as f:
+        for line in f:
+            name = re.split(r'[\s#<>=!~;\[]', line.strip(), maxsplit=1)[0]
+            if name:
+                names.append(name)
+    return names
 
-def run_install_script():
-    # define the path to install.sh
-    install_script_path = os.path.join(os.path.dirname(__file__), 'install.sh')
-    
+def missing_packages(names):
+    missing = []
+    for name in names:
+        try:
+            metadata.version(name)
+        except metadata.PackageNotFoundError:
+            missing.append(name)
+    return missing
+
+def stamp_key():
+    # what a passed check depends on: the requirements, the install script and the interpreter running them
+    digest = hashlib.sha256()
+    for path in (REQUIREMENTS_PATH, os.path.join(SCRIPT_DIR, 'install.sh')):
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    digest.update(f"{sys.executable}|{sys.version}|{platform.system()}|{platform.machine()}".encode())
+    return digest.hexdigest()
+
+def stamp_is_current():
     try:
-        # make sure install.sh is executable
-        subprocess.run(['chmod', '+x', install_script_path], check=True)
-        
-        # run install.sh
-        subprocess.run([install_script_path], check=True)
-        print("install.sh executed successfully.")
-        
-    except subprocess.CalledProcessError as e:
-        print(f"Failed to execute install.sh: {e}")
-        exit(1)
+        with open(STAMP_PATH) as f:
+            return json.load(f).get('key') == stamp_key()
+    except (OSError, ValueError):
+        return False
+
+def write_stamp():
+    with open(STAMP_PATH, 'w') as f:
+        json.dump({'key': stamp_key(), 'python': sys.executable, 'platform': platform.platform()}, f, indent=1)
+
+def run_install_script(force=False):
+    if os.environ.get(SKIP_ENV):
+        return
+
+    # stamp from an earlier passed check: only make sure no package went missing since
+    if not force and stamp_is_current() and not missing_packages(requirement_names()):
+        print("Dependencies already checked (delete .install_stamp.json or pass force=True to re-check).")
+        return
+
+    if platform.system() == 'Darwin':
+        # define the path to install.sh
+        install_script_path = os.path.join(SCRIPT_DIR, 'install.sh')
+
+        try:
+            # make sure install.sh is executable
+            subprocess.run(['chmod', '+x', install_script_path], check=True)
+
+            # run install.sh (it reads requirements.txt from the working directory)
+            subprocess.run([install_script_path], check=True, cwd=SCRIPT_DIR)
+            print("install.sh executed successfully.")
+
+        except subprocess.CalledProcessError as e:
+            print(f"Failed to execute install.sh: {e}")
+            exit(1)
+    else:
+        missing = missing_packages(requirement_names())
+        if missing:
+            print(f"Installing missing Python packages: {', '.join(missing)}")
+            try:
+                subprocess.run([sys.executable, '-m', 'pip', 'install', '-r', REQUIREMENTS_PATH], check=True)
+            except subprocess.CalledProcessError as e:
+                print(f"Failed to install the Python packages: {e}")
+                exit(1)
+        else:
+            print("All Python packages from requirements.txt are already installed.")
+        if shutil.which('unoconv') is None:
+            print("NOTE: unoconv (and LibreOffice) not found, scraped .doc resolutions can't be converted to pdf.")
+
+    write_stamp()
@@ -0,0 +1,127 @@
+"""
+UNResolutionProcessor: layoutParity.py
+
+    checks the fast layout code in PDFextractor against the reference implementation, over a folder of res pdfs
+    - cutlines: get_cut_lines (occupancy profile) vs scan_cut_lines (row by row crops via detect_any_content), per page
+    - backends: the 'pymupdf' layout backend vs the 'pdfplumber' one -- anchor, annex page and every bbox, per res
+    prints the differences (and the time spent by each side), optionally writing them to a .csv report, and exits 1
+    when any file differs (so it can gate a switch of layout_backend)
+
+    run: python layoutParity.py <pdf folder> [--check cutlines|backends] [--max-files N] [--report report.csv]
+         [--tolerance points]
+
+"""
+import os
+import sys
+import csv
+import time
+import argparse
+import pdfplumber
+import PDFextractor
+
+def check_cut_lines(file_path):
+    # returns (differences, profile seconds, reference seconds) for one res pdf
+    differences = []
+    fast_time = 0.0
+    reference_time = 0.0
+    with pdfplumber.open(file_path) as pdf:
+        resolution_x, resolution_y = None, None
+        for i, page in enumerate(pdf.pages):
+            if i == 0:
+                resolution_x, resolution_y = PDFextractor.find_resolution_position(page)
+
+            start_time = time.perf_counter()
+            fast = PDFextractor.get_cut_lines(page, resolution_x, resolution_y)
+            fast_time += time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            reference = PDFextractor.scan_cut_lines(page, resolution_x, resolution_y)
+            reference_time += time.perf_counter() - start_time
+
+            if fast != reference:
+                differences.append({'page': i + 1, 'field': 'cut lines', 'fast': fast, 'reference': reference})
+    return differences, fast_time, reference_time
+
+def layout_summary(file_path, backend):
+    # anchor, annex page and annex-inclusive bboxes from one backend
+    with PDFextractor.opened_or_open(None, file_path, backend) as pdf:
+        pages = list(PDFextractor.layout_pages(pdf, backend))
+        anchor = PDFextractor.find_resolution_position(pages[0]) if pages else (None, None)
+        annex_page = PDFextractor.search_annex_bold_in_all_pages(file_path, pdf=pdf, backend=backend)
+        bboxes, _ = PDFextractor.get_main_content_bboxes(file_path, False, pdf=pdf, backend=backend)
+    return anchor, annex_page, bboxes
+
+def check_backends(file_path, tolerance=1.0):
+    # returns (differences, pymupdf seconds, pdfplumber seconds) for one res pdf
+    start_time = time.perf_counter()
+    fast_anchor, fast_annex, fast_bboxes = layout_summary(file_path, 'pymupdf')
+    fast_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    reference_anchor, reference_annex, reference_bboxes = layout_summary(file_path, 'pdfplumber')
+    reference_time = time.perf_counter() - start_time
+
+    differences = []
+    # only the anchor's x feeds the cut lines (fitz word tops sit on the font ascender, pdfminer's on the font size)
+    if not close(fast_anchor[0], reference_anchor[0], tolerance) or (fast_anchor[1] is None) != (reference_anchor[1] is None):
+        differences.append({'page': 1, 'field': 'anchor', 'fast': fast_anchor, 'reference': reference_anchor})
+    if fast_annex != reference_annex:
+        differences.append({'page': None, 'field': 'annex page', 'fast': fast_annex, 'reference': reference_annex})
+    if len(fast_bboxes) != len(reference_bboxes):
+        differences.append({'page': None, 'field': 'page count', 'fast': len(fast_bboxes), 'reference': len(reference_bboxes)})
+    for i, (fast, reference) in enumerate(zip(fast_bboxes, reference_bboxes)):
+        if any(not close(a, b, tolerance) for a, b in zip(fast, reference)):
+            differences.append({'page': i + 1, 'field': 'bbox', 'fast': fast, 'reference': reference})
+    return differences, fast_time, reference_time
+
+def close(a, b, tolerance):
+    if a is None or b is None:
+        return a is b
+    return abs(float(a) - float(b)) <= tolerance
+
+def main(folder_path, check='cutlines', max_files=None, report_path=None, tolerance=1.0):
+    files = sorted(os.path.join(root, name)
+                   for root, _, names in os.walk(folder_path)
+                   for name in names if name.endswith(".pdf"))
+    if max_files is not None:
+        files = files[:max_files]
+
+    rows = []
+    total_fast = 0.0
+    total_reference = 0.0
+    mismatched_files = 0
+    for file_path in files:
+        if check == 'cutlines':
+            differences, fast_time, reference_time = check_cut_lines(file_path)
+        else:
+            differences, fast_time, reference_time = check_backends(file_path, tolerance)
+        total_fast += fast_time
+        total_reference += reference_time
+        if differences:
+            mismatched_files += 1
+        for difference in differences:
+            difference['file'] = os.path.basename(file_path)
+            rows.append(difference)
+            print(f"{difference['file']} page {difference['page']} {difference['field']}: "
+                  f"fast {difference['fast']} != reference {difference['reference']}")
+
+    if report_path:
+        with open(report_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['file', 'page', 'field', 'fast', 'reference'])
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Wrote {len(rows)} differences to {report_path}")
+
+    print(f"Checked {len(files)} files ({check}), {mismatched_files} with differences.")
+    print(f"Time: fast {total_fast:.2f}s, reference {total_reference:.2f}s")
+    return mismatched_files == 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the fast layout code against the reference implementation.")
+    parser.add_argument('folder', help="folder of res pdfs")
+    parser.add_argument('--check', choices=['cutlines', 'backends'], default='cutlines')
+    parser.add_argument('--max-files', type=int)
+    parser.add_argument('--report', help="write the differences to this .csv")
+    parser.add_argument('--tolerance', type=float, default=1.0, help="allowed bbox/anchor difference in points (backends)")
+    args = parser.parse_args()
+    sys.exit(0 if main(args.folder, args.check, args.max_files, args.report, args.tolerance) else 1)
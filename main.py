@@ -8,17 +8,28 @@ UNResolutionProcessor: main.py
               first run
 
 Modules:
+    - ClauseSchema: compact column types for the clause data (arrow strings, small ints, categorical month), memory report
+    - ClauseStore: optional SQLite store of the data with a full-text (FTS5) index, upserted res by res every run
+    - DocConverter: converts scraped .doc resolutions to pdf through long-lived LibreOffice listeners
+    - ExtractionCache: on-disk cache of extracted resolutions, so unchanged pdfs are never re-parsed
     - GrabResID: grabs the res id from a pdf file
     - PDFchunker: splits processed text (with italic markings) into quasi-sentences
     - PDFextractor: processes res pdf files, reading them to text
     - ProcessHelpers: some basic input/animation/time/etc helper functions
     - ReadAndProcessPDFs: processes all the res pdf files in a directory and outputs the dataframe
+    - ResDownloader: scrapes res pdf files from the UN website over pooled http connections, concurrently (selenium only as fallback)
     - ResFisher: uses selenium to scrape res pdf files from the UN website, storing them in a directory
     - ResolutionSlimmer: some basic text cleaning functions
+    - RunReport: per-stage/per-res timings written as a JSON run report next to the .csv (opt-in cProfile via UNRES_PROFILE_DIR)
+    - ScrapeManifest: records scraped resolutions (validators, size, checksum) so rescrapes only fetch what changed
     - ToExcel: exports processed data to Excel
+    - ToParquet: exports processed data as a year-partitioned Parquet dataset and a memory-mappable Arrow file
+    - batchRunner: runs several jobs (corpora, annex settings, year slices) from a JSON config without prompts, sharing
+      one worker pool and one parse per pdf across them
     - clauseContextualizer: preceding and following quasi-sentences are concatenated around each quasi-sentence, new column
     - createSubsetToAnnotate: makes new data randomized around the quasi-sentences, sampled at some percent of the total data
-    - duplicateRemover: removes any quasi-sentence dups
+      (optionally stratified by year/res, or drawn from a stream with ReservoirSampler)
+    - duplicateRemover: removes any quasi-sentence dups (optionally near-dups too, via MinHash/LSH)
     - phraseRemover: helpful for removing redundant quasi-sentences
 
 System-Level Dependencies:
@@ -27,37 +38,59 @@ System-Level Dependencies:
 
 Other Dependencies
     - pandas, re, os, itertools, time, pdfplumber, pymupdf, fitz, string, unidecode, docx2pdf,
-      pickle, openpyxl, requests, bs4, selenium, datetime, logging, io, contextlib
+      pickle, openpyxl, pyarrow, requests, bs4, selenium, datetime, logging, io, contextlib, concurrent.futures, sqlite3
 
 Usage:
     Run the script in a Python environment with internet access to install missing packages, respond to prompts, 
     wait, enjoy data
+    (for unattended runs over several corpora/settings: python batchRunner.py <config.json>)
 """
 # Developer Mode: used to bypass user-input prompting
 #   NOTE: if 'True', fill out lines 59-68 with your selections (or run the default)
 dev_mode = False
 
-def main():
-    # installation of system-level and other dependencies for the whole res processor
+def startup():
+    # dependency check plus the modules every run needs, returns (seconds taken, seconds of that in the dependency check);
+    # the scrapers, the Excel/Parquet writers, the clause store and the annotation sampler are only imported when their
+    # stage runs (benchmarkSuite times this in a fresh interpreter, 'startup' stage)
+    import time
+    start_time = time.perf_counter()
+
+    # installation of system-level and other dependencies for the whole res processor (skipped while its stamp is current)
     import installer
     installer.run_install_script()
+    install_seconds = time.perf_counter() - start_time
+
+    import ProcessHelpers
+    import ReadAndProcessPDFs
+    import ExtractionCache
+    import RunReport
+    import ClauseSchema
+    import duplicateRemover
+    import phraseRemover
+    import clauseContextualizer
+    return time.perf_counter() - start_time, install_seconds
+
+def main():
+    startup_seconds, install_seconds = startup()
 
-    # import modules and other dependencies
+    # import modules and other dependencies (already loaded by startup)
     import ProcessHelpers
     from ProcessHelpers import animated_printer
     import os
     import time 
     from datetime import datetime
-    from ToExcel import add_dataframe_to_excel 
+    from concurrent.futures import ThreadPoolExecutor
     import ReadAndProcessPDFs
-    import ResFisher
+    import ExtractionCache
+    import RunReport
+    import ClauseSchema
+    from ProcessHelpers import timed
     import duplicateRemover
-    import createSubsetToAnnotate
     import clauseContextualizer
-    import duplicateRemover
     import phraseRemover
 
-    animated_printer.safe_print("Imports complete. Running the program...")
+    animated_printer.safe_print(f"Imports complete ({startup_seconds:.2f}s). Running the program...")
 
     if dev_mode:
         pullNewPDFs = False # pull new res toggle
@@ -65,11 +98,24 @@ def main():
         folder_path = os.path.join(os.path.dirname(__file__), folder_path_input)
         exclude_annex = True # exclude annex toggle
         remove_duplicates = True # remove duplicates toggle
+        near_duplicate_threshold = None # e.g. 0.8 to also drop near-duplicates (MinHash/LSH similarity), None for exact only
         strings_to_remove = ['The Security Council,', 'Decides to remain seized of the matter.', 
                             'Decides to remain actively seized of the matter.'] # fill out list of phrases to remove
         remove_phrases = True # remove phrases toggle
+        phrases_file = None # optional .txt of more phrases to remove (one per line, '#' comments)
+        phrase_removal_mode = 'row' # 'row' (drop exact matches), 'prefix' or 'substring' (strip the phrases from clauses)
         create_subset_for_annotation = True # create annotation data toggle
+        annotation_percentage = 10 # percent of the data sampled for annotation
+        annotation_stratify_by = None # None, 'year' or 'resID' (sample each year/res in proportion to its size)
+        annotation_reservoir_size = None # e.g. 2000 to draw that many rows while the pdfs are read (percentage unused)
         contextualize_for_annotation = True # concatenate clause context toggle
+        context_window = 1 # quasi-sentences of context taken on each side of a quasi-sentence
+        num_workers = os.cpu_count() or 1 # parallel extraction processes (1 runs serially)
+        use_extraction_cache = True # reuse extractions of unchanged pdfs (clear with 'python ExtractionCache.py --clear')
+        layout_backend = 'pdfplumber' # 'pdfplumber' (reference) or 'pymupdf' (faster, check with layoutParity.py; known gap in PDFextractor)
+        scrape_mode = 'http' # 'http' (ResDownloader, concurrent, browser only as fallback) or 'browser' (ResFisher, selenium)
+        write_parquet = True # also save a year-partitioned Parquet dataset and an Arrow file next to the .csv/.xlsx
+        clause_store_path = None # e.g. 'UNResolutionData/clauses.sqlite' to keep a searchable store (python ClauseStore.py "<query>")
         animated_printer.safe_print("Developer Mode activated...")
     else: 
         # if true, this prompts the use of selenium to scrape new resolutions from the UN website
@@ -100,11 +146,14 @@ def main():
         
         # remove dups?
         remove_duplicates = ProcessHelpers.get_user_input("Would you like to remove duplicates in the data?")
+        near_duplicate_threshold = None # similarity (e.g. 0.8) at which near-duplicates are dropped too, None for exact only
         
         # remove phrases?
         strings_to_remove = ['The Security Council,', 'Decides to remain seized of the matter.', 
                             'Decides to remain actively seized of the matter.'] # specify phrases
         remove_phrases = ProcessHelpers.get_user_input("Would you like to remove select phrases in the data?")
+        phrases_file = None # optional .txt of more phrases to remove (one per line, '#' comments)
+        phrase_removal_mode = 'row' # 'row' (drop exact matches), 'prefix' or 'substring' (strip the phrases from clauses)
 
         # create subset for annotation/verification? contextualize quasi-sentences?
         create_subset_for_annotation = ProcessHelpers.get_user_input("Would you like to create a subset for annotation? (this reshuffles the data at random, then removes all but a specified percentage)")
@@ -119,8 +168,30 @@ def main():
                         print("Error: Percentage must be between 0 and 100.")
                 except ValueError:
                     print("Error: Input must be an integer.")
+        annotation_stratify_by = None # None, 'year' or 'resID' (sample each year/res in proportion to its size)
+        annotation_reservoir_size = None # e.g. 2000 to draw that many rows while the pdfs are read (percentage unused)
         contextualize_for_annotation = ProcessHelpers.get_user_input("Would you like to contextualize the clauses for annotation? (this concatenates the preceding and following clauses to the clause to contextualize annotation, adding it to a new column)")
+        context_window = 1 # quasi-sentences of context taken on each side (e.g. 2 for wider BERT inputs)
+
+        # number of processes used to extract the resolutions (one per core by default, set to 1 to run serially)
+        num_workers = os.cpu_count() or 1
 
+        # reuse the extractions of pdfs that haven't changed since the last run (clear with 'python ExtractionCache.py --clear')
+        use_extraction_cache = True
+
+        # library used to find the headers/footers/annex: 'pdfplumber' (reference) or 'pymupdf' (faster, check with layoutParity.py,
+        # which exits 1 on any difference; the known gap is noted in PDFextractor)
+        layout_backend = 'pdfplumber'
+
+        # how new resolutions are scraped: 'http' (ResDownloader, concurrent, browser only as fallback) or 'browser' (ResFisher, selenium)
+        scrape_mode = 'http'
+
+        # also save the data as a Parquet dataset (one folder per year) and an Arrow file, for analysis jobs
+        write_parquet = True
+
+        # keep a persistent, full-text searchable store of the data across runs (None for off), e.g.
+        # 'UNResolutionData/clauses.sqlite'; query it with python ClauseStore.py "<query>"
+        clause_store_path = None
 
     # recording program runtime
     start_time = time.time() 
@@ -129,7 +200,12 @@ def main():
     if pullNewPDFs:
         animated_printer.safe_print("This could take a while! Leave your computer on, open, and connected to Wi-Fi.")
         animated_printer.animate(True) 
-        ResFisher.resFisher(folder_path)
+        if scrape_mode == 'http':
+            import ResDownloader
+            ResDownloader.resDownloader(folder_path)
+        else:
+            import ResFisher
+            ResFisher.resFisher(folder_path)
         animated_printer.animate(False) 
         animated_printer.safe_print("Completed scraping the resolutions from the UN website. Creating new data now...")
     else:
@@ -140,24 +216,63 @@ def main():
     animated_printer.animate(True) 
     failed_pdfs = []
     annex_pdfs = []
-    final_data = ReadAndProcessPDFs.process_all_files(folder_path, failed_pdfs, exclude_annex, annex_pdfs)
+    extraction_cache = ExtractionCache.ExtractionCache() if use_extraction_cache else None
+    run_stats = {}
+    profile_dir = RunReport.profile_dir_from_env() # set UNRES_PROFILE_DIR to cProfile every parsed res
+    report = RunReport.RunReport({'folder_path': folder_path, 'exclude_annex': exclude_annex, 'workers': num_workers,
+                                  'extraction_cache': use_extraction_cache, 'layout_backend': layout_backend,
+                                  'profile_dir': profile_dir})
+    report.pipeline_timings['startup'] = startup_seconds
+    report.pipeline_timings['install_check'] = install_seconds
+    # reservoir mode: the annotation rows are drawn as the pdfs are read, then matched back to the cleaned-up data
+    annotation_sampler = None
+    if create_subset_for_annotation and annotation_reservoir_size:
+        import createSubsetToAnnotate
+        annotation_sampler = createSubsetToAnnotate.stream_sampler(annotation_reservoir_size, annotation_stratify_by)
+    with timed(report.pipeline_timings, 'extraction'):
+        final_data = ReadAndProcessPDFs.process_all_files(folder_path, failed_pdfs, exclude_annex, annex_pdfs, 
+                                                          workers=num_workers, cache=extraction_cache, layout_backend=layout_backend,
+                                                          run_stats=run_stats, report=report, profile_dir=profile_dir,
+                                                          sampler=annotation_sampler, ordinals=bool(clause_store_path))
     animated_printer.animate(False) 
     animated_printer.safe_print("Finished creating data.")
+    if extraction_cache is not None:
+        animated_printer.safe_print(f"Reused {extraction_cache.hits} cached extractions, parsed {extraction_cache.misses} new or changed resolutions.")
 
     # removing duplicates from dataframe (if true)
     if remove_duplicates:
         animated_printer.safe_print("Removing duplicates...")
-        final_data = duplicateRemover.remove_duplicates_and_adjust_ids(final_data, 'clause', 'clauseID')
+        with timed(report.pipeline_timings, 'dedup'):
+            final_data = duplicateRemover.remove_duplicates_and_adjust_ids(final_data, 'clause', 'clauseID')
+            if near_duplicate_threshold is not None:
+                final_data = duplicateRemover.remove_near_duplicates_and_adjust_ids(final_data, 'clause', 'clauseID',
+                                                                                    near_duplicate_threshold)
 
     # removing phrases from dataframe (if true)
     if remove_phrases:
         animated_printer.safe_print("Removing phrases...")
-        final_data = phraseRemover.remove_strings_and_adjust_ids(final_data, 'clause', strings_to_remove, 'clauseID')
+        with timed(report.pipeline_timings, 'phrase_removal'):
+            if phrases_file:
+                strings_to_remove = strings_to_remove + phraseRemover.load_phrases(phrases_file)
+            final_data = phraseRemover.remove_strings_and_adjust_ids(final_data, 'clause', strings_to_remove, 'clauseID',
+                                                                     mode=phrase_removal_mode)
 
     # removing phrases from dataframe (if true)
     if contextualize_for_annotation:
         animated_printer.safe_print("Adding context column...")
-        final_data = clauseContextualizer.concatenate_quasi_sentences(final_data)
+        with timed(report.pipeline_timings, 'contextualization'):
+            final_data = clauseContextualizer.concatenate_quasi_sentences(final_data, window=context_window)
+
+    # back to the compact column types (the steps above rebuild some columns as python objects), report the memory taken
+    final_data = ClauseSchema.compact(final_data)
+    if annotation_sampler is not None:
+        annotation_subset = createSubsetToAnnotate.match_sample(annotation_sampler, final_data, annotation_reservoir_size)
+    # the extraction ordinals are for the clause store (and the sample above), the exported files go without them
+    store_data = final_data
+    if 'ordinal' in final_data.columns:
+        final_data = final_data.drop(columns='ordinal')
+    report.memory = ClauseSchema.memory_report(final_data)
+    animated_printer.safe_print(f"Data in memory: {ClauseSchema.format_memory_report(report.memory)}")
 
     # saving dataframe as timestamped .csv and .xlsx files
     folder_name = 'UNResolutionData' # i've decided on this folder name, feel free to change it
@@ -168,28 +283,75 @@ def main():
     now = datetime.now() 
     date_str = now.strftime('%Y_%m_%d_%I%M%p')
 
-    # save dataframe to .csv
+    # save dataframe to .csv, .xlsx and (if true) a year-partitioned parquet dataset with an arrow file and the clause
+    # store, all at once
+    # (the writers spend much of their time compressing and on disk, so they overlap well in threads)
     csv_file_name = f'UNResolutionData_{date_str}.csv'
     csv_file_path = os.path.join(folder_name, csv_file_name)
-    final_data.to_csv(csv_file_path, index=False)
-    animated_printer.safe_print(f"Created new CSV file: {csv_file_path}")
-
-    # save dataframe to .xlsx
     excel_file_name = f'UNResolutionData_{date_str}.xlsx' 
     excel_file_path = os.path.join(folder_name, excel_file_name)
-    add_dataframe_to_excel(excel_file_path, 'Final PDF Data', final_data)
-    animated_printer.safe_print(f"Created new Excel file: {excel_file_path}")
+
+    def save_csv():
+        with timed(report.pipeline_timings, 'csv_export'):
+            final_data.to_csv(csv_file_path, index=False)
+        animated_printer.safe_print(f"Created new CSV file: {csv_file_path}")
+
+    def save_excel():
+        from ToExcel import add_dataframe_to_excel
+        with timed(report.pipeline_timings, 'excel_export'):
+            add_dataframe_to_excel(excel_file_path, 'Final PDF Data', final_data)
+        animated_printer.safe_print(f"Created new Excel file: {excel_file_path}")
+
+    def save_parquet():
+        import ToParquet
+        parquet_path = os.path.join(folder_name, f'UNResolutionData_{date_str}_parquet')
+        arrow_file_path = os.path.join(folder_name, f'UNResolutionData_{date_str}.arrow')
+        with timed(report.pipeline_timings, 'parquet_export'):
+            ToParquet.write_parquet_and_arrow(final_data, parquet_path, arrow_file_path)
+
+    def save_clause_store():
+        import ClauseStore
+        try:
+            with timed(report.pipeline_timings, 'clause_store'), ClauseStore.ClauseStore(clause_store_path) as store:
+                changes = store.upsert(store_data)
+            animated_printer.safe_print(f"Updated the clause store {clause_store_path}: {changes['resolutions_written']} "
+                                        f"resolutions written, {changes['resolutions_unchanged']} unchanged.")
+        except Exception as e:
+            animated_printer.safe_print(f"An error occurred: {e}")
+
+    with timed(report.pipeline_timings, 'export'):
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            exports = [pool.submit(save_csv), pool.submit(save_excel)] + ([pool.submit(save_parquet)] if write_parquet else [])
+            exports += [pool.submit(save_clause_store)] if clause_store_path else []
+            for export in exports:
+                export.result() # re-raises an export's error here
 
     # save subset dataframe to .csv (open in excel to annotate)
     if create_subset_for_annotation:
         animated_printer.safe_print("Creating subset for annotation...")
-        createSubsetToAnnotate.createSubsetToAnnotate(csv_file_path, annotation_percentage)
+        import createSubsetToAnnotate
+        with timed(report.pipeline_timings, 'annotation_subset'):
+            if annotation_sampler is not None:
+                createSubsetToAnnotate.save_subset(csv_file_path, annotation_subset)
+            else:
+                createSubsetToAnnotate.createSubsetToAnnotate(csv_file_path, annotation_percentage, df=final_data,
+                                                              stratify_by=annotation_stratify_by)
         animated_printer.safe_print(f"Created a subset for annotation at {csv_file_path}.")
 
     # recording program runtime
     end_time = time.time() 
     elapsed_time = end_time - start_time 
 
+    # save the run report (stage timings, page/clause counts, slowest resolutions) next to the .csv
+    report.pipeline_timings['total'] = elapsed_time
+    report_file_path = report.write(os.path.join(folder_name, f'UNResolutionData_{date_str}_run_report.json'))
+    animated_printer.safe_print(f"Created run report: {report_file_path}")
+    for record in report.slowest(5):
+        animated_printer.safe_print(f"Slow resolution: {record['file']} ({record['pages']} pages, {record['clauses']} clauses) "
+                                    f"took {record['seconds']:.2f}s")
+    if profile_dir:
+        animated_printer.safe_print(f"Profiles written to {profile_dir} (combine with 'python RunReport.py {profile_dir}').")
+
     # list failed pdfs and print num failed pdfs
     if len(failed_pdfs) > 0:
         animated_printer.safe_print("Some resolutions failed to process. ")
@@ -203,6 +365,7 @@ def main():
         # NOTE: include the below to print out the list of resolutions with annexes
         # ProcessHelpers.safe_print("List of resolutions with annexes processed: " + str(annex_pdfs))
         animated_printer.safe_print("Number of resolutions with annexes (annexes removed): " + str(len(annex_pdfs)))
+        animated_printer.safe_print("Number of annex pages removed: " + str(run_stats.get('annex_pages', 0)))
     elif (len(annex_pdfs) == 0) and exclude_annex:
         animated_printer.safe_print("No resolutions processed had annexes.")
 
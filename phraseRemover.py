@@ -2,13 +2,90 @@
 UNResolutionProcessor: phraseRemover.py
 
     removes phrases and adjusts clause IDs to be concurrent, keeps all other columns intact
+    the phrase list is compiled once (PhraseFilter) into a single regex built from a trie of the phrases, so matching
+    stays one pass over the clause column however long the list gets (phrases can be loaded from a file, see load_phrases)
+    - 'row': drops rows whose whole quasi-sentence is one of the phrases (the original behaviour)
+    - 'prefix': strips a phrase glued to the start of a quasi-sentence ('The Security Council, Recalling ...')
+    - 'substring': strips the phrases wherever they occur
+    quasi-sentences left empty by stripping are dropped
 
 """
+import re
 import pandas as pd
 
-def remove_strings_and_adjust_ids(df, column_name, strings_to_remove, id_column):
-    # remove rows containing the specified strings
-    df = df[~df[column_name].isin(strings_to_remove)].reset_index(drop=True)
+MODES = ('row', 'prefix', 'substring')
+
+def load_phrases(file_path):
+    # one phrase per line, blank lines and lines starting with '#' are skipped
+    with open(file_path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+def trie_pattern(phrases):
+    # regex matching any of the phrases, shaped like a trie (shared prefixes are matched once, longest phrase wins);
+    # phrases ending in a word character must end on a word boundary
+    # NOTE: the longest phrase only wins if no two branches of a node can match the same text, so for a case-insensitive
+    # regex the phrases have to come in lowercased (else 'D...' and 'd...' are two branches that both match 'D')
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for character in phrase:
+            node = node.setdefault(character, {})
+        node[''] = r'(?!\w)' if re.match(r'\w', phrase[-1]) else ''
+
+    def build(node):
+        branches = [re.escape(character) + build(child) for character, child in sorted(node.items()) if character != '']
+        if '' not in node:
+            return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if not branches:
+            return node['']
+        if node[''] == '':
+            return '(?:' + '|'.join(branches) + ')?'
+        return '(?:' + '|'.join(branches + [node['']]) + ')'
+
+    return build(trie) if trie else None
+
+class PhraseFilter:
+    def __init__(self, phrases, mode='row', case_sensitive=True):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, not {mode!r}")
+        self.mode = mode
+        self.phrases = list(dict.fromkeys(phrase for phrase in phrases if phrase))
+        self.exact = set(self.phrases) if case_sensitive else {phrase.lower() for phrase in self.phrases}
+        self.case_sensitive = case_sensitive
+
+        # phrases starting with a word character only match at a word boundary
+        flags = 0 if case_sensitive else re.IGNORECASE
+        trie_phrases = self.phrases if case_sensitive else list(dict.fromkeys(phrase.lower() for phrase in self.phrases))
+        word_start = trie_pattern([phrase for phrase in trie_phrases if re.match(r'\w', phrase)])
+        other_start = trie_pattern([phrase for phrase in trie_phrases if not re.match(r'\w', phrase)])
+        alternatives = ([r'(?<!\w)' + word_start] if word_start else []) + ([other_start] if other_start else [])
+        self.pattern = None
+        if alternatives:
+            any_phrase = '(?:' + '|'.join(alternatives) + ')'
+            if mode == 'prefix':
+                self.pattern = re.compile(r'^\s*' + any_phrase + r'\s*', flags)
+            else:
+                self.pattern = re.compile(r'\s*' + any_phrase, flags)
+
+    def apply(self, clauses):
+        # returns (kept mask, clauses with the phrases stripped) for a Series of quasi-sentences
+        if self.mode == 'row' or self.pattern is None:
+            keys = clauses if self.case_sensitive else clauses.str.lower()
+            return ~keys.isin(self.exact), clauses
+        stripped = clauses.str.replace(self.pattern, '', regex=True)
+        changed = stripped != clauses
+        stripped[changed] = stripped[changed].str.strip()
+        return ~(changed & (stripped == '')), stripped
+
+def remove_strings_and_adjust_ids(df, column_name, strings_to_remove, id_column, mode='row', case_sensitive=True):
+    # strings_to_remove: list of phrases or a compiled PhraseFilter (reuse one across calls)
+    phrase_filter = strings_to_remove if isinstance(strings_to_remove, PhraseFilter) else PhraseFilter(strings_to_remove, mode, case_sensitive)
+
+    # remove rows containing the specified strings (strip them first in the prefix/substring modes)
+    keep, clauses = phrase_filter.apply(df[column_name])
+    if phrase_filter.mode != 'row':
+        df = df.assign(**{column_name: clauses})
+    df = df[keep].reset_index(drop=True)
     
     # adjust IDs
     df[id_column] = range(1, len(df) + 1)
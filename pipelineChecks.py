@@ -0,0 +1,132 @@
+"""
+UNResolutionProcessor: pipelineChecks.py
+
+    regression checks for the extraction pipeline and its clean-up, on small pdfs written locally with PyMuPDF or on
+    hand-made data (no scraped corpus needed)
+    - undated_workers: res pdfs without a date, read by a process pool while the animated printer is running, finish
+      (a forked worker used to wait forever on the printer's lock for its "Date not found" message)
+    - near_duplicate_bucket: A~B and B~C (but not A~C) in one LSH bucket end up in one cluster, even though C is only
+      similar enough to a member that isn't the first of the bucket
+    - phrase_prefix: where one phrase is a prefix of another, the prefix/substring modes strip the longer one, with or
+      without case sensitivity
+    prints each check's problems (if any), exits 1 when a check failed
+
+    run: python pipelineChecks.py [--check name ...]
+
+"""
+import os
+import sys
+import shutil
+import signal
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import fitz  # or 'PyMuPDF'
+import pandas as pd
+import duplicateRemover
+import phraseRemover
+
+CHILD_TIMEOUT = 120 # seconds a check's child process gets before it counts as hung
+
+def write_undated_pdfs(directory, resIDs):
+    # one-page res pdfs named like the scraper names them, with no date anywhere on the page
+    for resID in resIDs:
+        document = fitz.open()
+        page = document.new_page()
+        page.insert_text((100, 100), f"Resolution {resID} without a distribution date")
+        document.save(os.path.join(directory, f"{resID}(2020).pdf"))
+        document.close()
+
+def run_child(code):
+    # runs code in a fresh interpreter from the repo folder, returns (returncode, output) or (None, '') when it hung
+    # (a hung child is killed along with its pool workers, which share its process group)
+    child = subprocess.Popen([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                             stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, start_new_session=True)
+    try:
+        output, _ = child.communicate(timeout=CHILD_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        os.killpg(child.pid, signal.SIGKILL)
+        child.communicate()
+        return None, ''
+    return child.returncode, output
+
+def check_undated_workers(directory):
+    problems = []
+    write_undated_pdfs(directory, [2001, 2002, 2003])
+    returncode, output = run_child(
+        "import ReadAndProcessPDFs\n"
+        "from ProcessHelpers import animated_printer\n"
+        "failed_pdfs = []\n"
+        "animated_printer.animate(True)\n"
+        f"data = ReadAndProcessPDFs.process_all_files({directory!r}, failed_pdfs, True, [], workers=2)\n"
+        "animated_printer.animate(False)\n"
+        "print(f'rows={len(data)}')\n")
+    if returncode is None:
+        problems.append(f"process_all_files(workers=2) with the printer running hung for over {CHILD_TIMEOUT}s")
+    elif returncode != 0:
+        problems.append(f"process_all_files(workers=2) exited with {returncode}: {output.strip()[-500:]}")
+    elif output.count("Date not found") != 3:
+        problems.append(f"expected 3 'Date not found' messages from the workers, got {output.count('Date not found')}")
+    return problems
+
+def check_near_duplicate_bucket(directory):
+    problems = []
+    # 4 permutations in 2 bands of 2: all three share the band 0 bucket, none share a band 1 bucket;
+    # A~B and B~C agree on 3 of 4 values, A and C on 2 of 4 (threshold 0.75)
+    signatures = np.array([[1, 1, 1, 1], [1, 1, 1, 2], [1, 1, 2, 2]], dtype=np.uint32)
+    clusters = duplicateRemover.signature_clusters(signatures, 0.75, bands=2, rows=2).tolist()
+    if clusters != [1, 1, 1]:
+        problems.append(f"A~B, B~C in one bucket gave clusters {clusters}, expected [1, 1, 1]")
+    # same, with C first in the bucket: C~B, B~A still chain up
+    clusters = duplicateRemover.signature_clusters(signatures[::-1].copy(), 0.75, bands=2, rows=2).tolist()
+    if clusters != [1, 1, 1]:
+        problems.append(f"C~B, B~A in one bucket gave clusters {clusters}, expected [1, 1, 1]")
+    # and A, C alone stay apart
+    clusters = duplicateRemover.signature_clusters(signatures[[0, 2]].copy(), 0.75, bands=2, rows=2).tolist()
+    if clusters != [1, 2]:
+        problems.append(f"A, C (2 of 4 values equal) gave clusters {clusters}, expected [1, 2]")
+    return problems
+
+def check_phrase_prefix(directory):
+    problems = []
+    clauses = pd.Series(['Decides, further, to extend the mandate', 'Decides, to extend the mandate',
+                         'Noting that the Council, further, decides, further, to act'])
+    cases = [('prefix', True, ['Decides,', 'Decides, further,'],
+              ['to extend the mandate', 'to extend the mandate', clauses[2]]),
+             ('prefix', False, ['Decides,', 'decides, further,'],
+              ['to extend the mandate', 'to extend the mandate', clauses[2]]),
+             ('substring', False, ['decides,', 'Decides, further,'],
+              ['to extend the mandate', 'to extend the mandate', 'Noting that the Council, further, to act'])]
+    for mode, case_sensitive, phrases, expected in cases:
+        keep, stripped = phraseRemover.PhraseFilter(phrases, mode, case_sensitive).apply(clauses)
+        if stripped.tolist() != expected or not keep.all():
+            problems.append(f"{mode} (case_sensitive={case_sensitive}) with {phrases} gave {stripped.tolist()}, "
+                            f"expected {expected}")
+    return problems
+
+CHECKS = {'undated_workers': check_undated_workers, 'near_duplicate_bucket': check_near_duplicate_bucket,
+          'phrase_prefix': check_phrase_prefix}
+
+def main(names=None):
+    failed = 0
+    for name in names or CHECKS:
+        directory = tempfile.mkdtemp(prefix=f'pipeline_{name}_')
+        try:
+            problems = CHECKS[name](directory)
+        except Exception as e:
+            problems = [f"raised {type(e).__name__}: {e}"]
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        print(f"{name}: {'ok' if not problems else 'FAILED'}")
+        for problem in problems:
+            print(f"    {problem}")
+        failed += bool(problems)
+    print(f"{len(names or CHECKS) - failed} of {len(names or CHECKS)} checks passed.")
+    return failed == 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Regression checks for the extraction pipeline.")
+    parser.add_argument('--check', nargs='+', choices=list(CHECKS), help="checks to run (default: all)")
+    args = parser.parse_args()
+    sys.exit(0 if main(args.check) else 1)